@@ -0,0 +1,158 @@
+import logging
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from app.db.mongo import db, removal_jobs, virtual_tryons
+from app.db.session_repository import session_filter
+from app.utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+TTL_INDEX_NAME = "updated_at_ttl"
+UNIQUE_INDEX_NAME = "guest_session_unique"
+
+
+class DuplicateSessionsError(Exception):
+    pass
+
+
+def virtual_tryon_indexes() -> list[IndexModel]:
+    return [
+        # Every repository read/write filters on this pair
+        IndexModel(
+            [("guest_id", ASCENDING), ("session_id", ASCENDING)],
+            name=UNIQUE_INDEX_NAME,
+            unique=True
+        ),
+        # Abandoned sessions expire SESSION_TTL_DAYS after their last update
+        IndexModel(
+            [("updated_at", ASCENDING)],
+            name=TTL_INDEX_NAME,
+            expireAfterSeconds=settings.SESSION_TTL_DAYS * 24 * 3600
+        ),
+    ]
+
+
+# Filters the repository issues, checked with explain()
+def repository_query_shapes() -> dict:
+    return {
+        "find_session": session_filter("explain_guest", "explain_session"),
+        "get_face_height": session_filter(
+            "explain_guest", "explain_session", **{"status.measurements_done": True}
+        ),
+    }
+
+
+async def _sync_ttl(expire_after_seconds: int):
+    # create_indexes cannot change an existing TTL; collMod can
+    await db.command(
+        "collMod",
+        virtual_tryons.name,
+        index={"name": TTL_INDEX_NAME, "expireAfterSeconds": expire_after_seconds}
+    )
+
+
+async def duplicate_sessions(limit: int = 5) -> list[dict]:
+    """(guest_id, session_id) pairs stored more than once (block the unique index)."""
+    cursor = virtual_tryons.aggregate([
+        {"$group": {"_id": {"guest_id": "$guest_id", "session_id": "$session_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": limit}
+    ], allowDiskUse=True)
+    return await cursor.to_list(limit)
+
+
+async def _create_index(index: IndexModel) -> str:
+    name = index.document["name"]
+    try:
+        await virtual_tryons.create_indexes([index])
+    except OperationFailure as e:
+        if name != TTL_INDEX_NAME or e.code not in (85, 86):  # IndexOptionsConflict / IndexKeySpecsConflict
+            raise
+        await _sync_ttl(settings.SESSION_TTL_DAYS * 24 * 3600)
+    return name
+
+
+async def ensure_indexes():
+    """
+    Build each index on its own, so one failure (e.g. duplicates blocking
+    the unique index) does not skip the others. Raises afterwards if any
+    failed; DuplicateSessionsError when the unique index is blocked.
+    """
+    names, failures = [], {}
+    for index in virtual_tryon_indexes():
+        try:
+            names.append(await _create_index(index))
+        except OperationFailure as e:
+            failures[index.document["name"]] = e
+    logger.info("virtual_tryons indexes ready: %s", names)
+
+    unique_failure = failures.pop(UNIQUE_INDEX_NAME, None)
+    if unique_failure is not None and unique_failure.code == 11000:  # DuplicateKey
+        duplicates = await duplicate_sessions()
+        raise DuplicateSessionsError(
+            f"Unique index {UNIQUE_INDEX_NAME} cannot be built: virtual_tryons has duplicate "
+            f"(guest_id, session_id) documents, e.g. {[d['_id'] for d in duplicates]}. "
+            "Merge or delete the duplicates, then restart."
+        )
+    if unique_failure is not None:
+        failures[UNIQUE_INDEX_NAME] = unique_failure
+    if failures:
+        raise Exception(f"virtual_tryons index build failed: {failures}")
+    return names
+
+
+def _stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+async def assert_no_collscan():
+    """Raise if any repository query shape would scan the whole collection."""
+    offenders = []
+    for name, query in repository_query_shapes().items():
+        explain = await virtual_tryons.find(query).explain()
+        winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in set(_stages(winning)):
+            offenders.append(name)
+
+    if offenders:
+        raise Exception(
+            f"virtual_tryons queries doing a COLLSCAN: {', '.join(offenders)}. "
+            "Run ensure_indexes() or add an index for them."
+        )
+
+
+async def ensure_job_indexes():
+    # Finished or abandoned removal jobs expire on their own
+    return await removal_jobs.create_indexes([
+        IndexModel(
+            [("created_at", ASCENDING)],
+            name="created_at_ttl",
+            expireAfterSeconds=int(settings.REMOVAL_JOB_TTL_SECONDS)
+        )
+    ])
+
+
+async def manage_indexes():
+    """Startup hook: create/refresh indexes, then optionally verify query plans."""
+    if settings.MONGO_MANAGE_INDEXES:
+        try:
+            await ensure_indexes()
+        except DuplicateSessionsError:
+            # Without the unique index, upserts keep creating duplicates: refuse to start
+            raise
+        except Exception:
+            logger.exception("Creating virtual_tryons indexes failed")
+
+        if settings.REMOVAL_JOB_STORE == "mongo":
+            try:
+                await ensure_job_indexes()
+            except Exception:
+                logger.exception("Creating removal_jobs indexes failed")
+
+    if settings.MONGO_EXPLAIN_CHECK:
+        await assert_no_collscan()
@@ -0,0 +1,57 @@
+import copy
+from datetime import datetime, timedelta
+from app.db.mongo import removal_jobs
+from app.utils.settings import settings
+
+TERMINAL = ("done", "failed")
+
+
+class MemoryJobStore:
+    """Jobs in this process only; finished jobs are dropped after `ttl_seconds`."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl = ttl_seconds
+        self._jobs = {}  # job_id -> job
+
+    def _prune(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        for job_id in [k for k, job in self._jobs.items() if job["status"] in TERMINAL and job["updated_at"] < cutoff]:
+            del self._jobs[job_id]
+
+    async def create(self, job: dict):
+        self._prune()
+        self._jobs[job["job_id"]] = copy.deepcopy(job)
+
+    async def get(self, job_id: str) -> dict | None:
+        job = self._jobs.get(job_id)
+        return copy.deepcopy(job) if job is not None else None
+
+    async def update(self, job_id: str, fields: dict):
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.update(copy.deepcopy(fields))
+
+
+class MongoJobStore:
+    """Jobs in the removal_jobs collection, so any worker can answer a poll."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def create(self, job: dict):
+        await self.collection.insert_one({"_id": job["job_id"], **job})
+
+    async def get(self, job_id: str) -> dict | None:
+        return await self.collection.find_one({"_id": job_id}, {"_id": 0})
+
+    async def update(self, job_id: str, fields: dict):
+        await self.collection.update_one({"_id": job_id}, {"$set": fields})
+
+
+def build_job_store():
+    if settings.REMOVAL_JOB_STORE == "mongo":
+        return MongoJobStore(removal_jobs)
+    return MemoryJobStore(settings.REMOVAL_JOB_TTL_SECONDS)
+
+
+job_store = build_job_store()
@@ -18,3 +18,4 @@ db = client[settings.MONGODB_DB_NAME]
 # ✅ Collections
 guest_sessions = db["guest_sessions"]
 virtual_tryons = db["virtual_tryons"]
+removal_jobs = db["removal_jobs"]
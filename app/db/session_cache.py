@@ -0,0 +1,118 @@
+import asyncio
+import copy
+import logging
+import time
+from collections import OrderedDict
+from app.utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SessionCache:
+    """
+    In-process TTL + LRU cache of virtual_tryons documents keyed by
+    (guest_id, session_id). Writes invalidate; a per-key generation
+    counter stops a read that raced a write from caching the old doc.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()  # key -> (doc, expires_at)
+        self._generations = {}         # key -> int, bumped on invalidate
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._watch_task = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def generation(self, key) -> int:
+        return self._generations.get(key, 0)
+
+    def get(self, key):
+        """Cached document (a copy) or None. Missing sessions are never cached."""
+        entry = self._entries.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return copy.deepcopy(entry[0])
+
+    def set(self, key, doc, generation: int):
+        if not self.enabled or doc is None or self.generation(key) != generation:
+            return
+        self._entries[key] = (copy.deepcopy(doc), time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+        self._generations[key] = self._generations.get(key, 0) + 1
+        self._invalidations += 1
+
+        # Keep the generation map bounded; forgetting a key only means a
+        # racing read may skip caching, or (rarely) cache for one TTL
+        if len(self._generations) > 4 * max(self.max_entries, 1):
+            self._generations = {k: v for k, v in self._generations.items() if k in self._entries}
+
+    # =========================
+    # CROSS-WORKER INVALIDATION (optional)
+    # =========================
+    def start_change_stream(self, collection):
+        """Invalidate on writes made by other workers (needs a replica set)."""
+        if self._watch_task is None:
+            self._watch_task = asyncio.get_running_loop().create_task(self._watch(collection))
+
+    async def _watch(self, collection):
+        pipeline = [
+            {"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}},
+            {"$project": {"fullDocument.guest_id": 1, "fullDocument.session_id": 1}}
+        ]
+        while True:
+            try:
+                async with collection.watch(pipeline, full_document="updateLookup") as stream:
+                    async for change in stream:
+                        doc = change.get("fullDocument") or {}
+                        if "guest_id" in doc and "session_id" in doc:
+                            self.invalidate((doc["guest_id"], doc["session_id"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Cannot tell what changed while disconnected: drop everything
+                logger.warning("Session cache change stream error, retrying: %s", e)
+                self._entries.clear()
+                await asyncio.sleep(5)
+
+    async def stop_change_stream(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    def stats(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "invalidations": self._invalidations,
+            "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            "change_stream": self._watch_task is not None
+        }
+
+
+session_cache = SessionCache(
+    ttl_seconds=settings.SESSION_CACHE_TTL_SECONDS,
+    max_entries=settings.SESSION_CACHE_MAX_ENTRIES
+)
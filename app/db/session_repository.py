@@ -0,0 +1,211 @@
+from datetime import datetime
+from pymongo import ReturnDocument
+from app.db.mongo import virtual_tryons
+from app.db.session_cache import session_cache
+from app.db.write_behind import write_behind as write_buffer
+
+
+def session_filter(guest_id: str, session_id: str, **extra) -> dict:
+    return {"guest_id": guest_id, "session_id": session_id, **extra}
+
+
+class SessionUpdate:
+    """
+    Collects every mutation a request makes to one virtual_tryons document
+    and applies them in a single round trip.
+
+        update = SessionUpdate(guest_id, session_id)
+        update.set({"glasses.detected": True})
+        update.set({"images.original.bucket_path": path})
+        await update.commit(upsert=True)
+    """
+
+    def __init__(self, guest_id: str, session_id: str):
+        self.guest_id = guest_id
+        self.session_id = session_id
+        self._set = {}
+        self._set_on_insert = {}
+
+    @property
+    def key(self) -> tuple:
+        return (self.guest_id, self.session_id)
+
+    def set(self, fields: dict) -> "SessionUpdate":
+        self._set.update(fields)
+        return self
+
+    def set_on_insert(self, fields: dict) -> "SessionUpdate":
+        self._set_on_insert.update(fields)
+        return self
+
+    def drop_on_insert(self, *fields: str) -> "SessionUpdate":
+        """Remove `fields` from $setOnInsert (e.g. when $set writes below them)."""
+        for field in fields:
+            self._set_on_insert.pop(field, None)
+        return self
+
+    def __bool__(self) -> bool:
+        return bool(self._set or self._set_on_insert)
+
+    def to_update(self, now: datetime | None = None) -> dict:
+        update = {"$set": {**self._set, "updated_at": now or datetime.utcnow()}}
+        if self._set_on_insert:
+            update["$setOnInsert"] = self._set_on_insert
+        return update
+
+    async def commit(self, upsert: bool = False, buffered: bool = True, **extra_filter):
+        """
+        One update_one; returns the UpdateResult.
+        With the write-behind buffer enabled, unconditional updates are
+        queued instead and None is returned.
+        """
+        update = self.to_update()
+        session_cache.invalidate(self.key)
+
+        if write_buffer is not None:
+            if buffered and not extra_filter:
+                write_buffer.enqueue(
+                    self.guest_id, self.session_id,
+                    update["$set"], update.get("$setOnInsert"), upsert
+                )
+                return None
+            await write_buffer.flush_key(self.guest_id, self.session_id)
+
+        result = await virtual_tryons.update_one(
+            session_filter(self.guest_id, self.session_id, **extra_filter),
+            update,
+            upsert=upsert
+        )
+        # Again after the write: a read that started mid-write may have cached the old doc
+        session_cache.invalidate(self.key)
+        return result
+
+    async def commit_and_get(self, projection: dict, upsert: bool = False, **extra_filter):
+        """
+        One find_one_and_update; returns the updated document (projected),
+        or None when no document matched `extra_filter`.
+        """
+        session_cache.invalidate(self.key)
+        if write_buffer is not None:
+            await write_buffer.flush_key(self.guest_id, self.session_id)
+
+        doc = await virtual_tryons.find_one_and_update(
+            session_filter(self.guest_id, self.session_id, **extra_filter),
+            self.to_update(),
+            projection={"_id": 0, **projection},
+            upsert=upsert,
+            return_document=ReturnDocument.AFTER
+        )
+        session_cache.invalidate(self.key)
+        return doc
+
+
+async def find_session(guest_id: str, session_id: str, projection: dict | None = None, **extra_filter):
+    buffered = write_buffer is not None and write_buffer.has_pending(guest_id, session_id)
+    if buffered and (projection or extra_filter):
+        # Filters / projections must see pending writes: write them first
+        await write_buffer.flush_key(guest_id, session_id)
+        buffered = False
+
+    doc = await virtual_tryons.find_one(
+        session_filter(guest_id, session_id, **extra_filter),
+        {"_id": 0, **(projection or {})}
+    )
+    if buffered:
+        doc = write_buffer.overlay(guest_id, session_id, doc)
+    return doc
+
+
+# =========================
+# REQUEST-LEVEL OPERATIONS
+# =========================
+def detection_update(
+    guest_id: str,
+    session_id: str,
+    glasses_detected: bool,
+    confidence: float
+) -> SessionUpdate:
+    """First write of a session: upserts the document with detection results."""
+    return SessionUpdate(guest_id, session_id).set_on_insert({
+        "guest_id": guest_id,
+        "session_id": session_id,
+        "measurements": {},
+        "created_at": datetime.utcnow()
+    }).set({
+        "glasses.detected": glasses_detected,
+        "glasses.confidence": confidence,
+        "status.inserted": True,
+        "status.glasses_removed": False,
+        "status.measurements_done": False
+    })
+
+
+async def save_detection(
+    guest_id: str,
+    session_id: str,
+    glasses_detected: bool,
+    confidence: float,
+    original_path: str | None = None
+):
+    update = detection_update(guest_id, session_id, glasses_detected, confidence)
+    if original_path:
+        update.set({"images.original.bucket_path": original_path})
+    return await update.commit(upsert=True)
+
+
+async def save_analysis(
+    guest_id: str,
+    session_id: str,
+    glasses_detected: bool,
+    confidence: float,
+    original_path: str | None = None,
+    mm: dict | None = None,
+    face_shape: str | None = None
+):
+    """Detection, original image and (if measured) measurements in one upsert."""
+    update = detection_update(guest_id, session_id, glasses_detected, confidence)
+    if original_path:
+        update.set({"images.original.bucket_path": original_path})
+    if mm is not None:
+        # $setOnInsert "measurements" would conflict with $set "measurements.mm"
+        update.drop_on_insert("measurements")
+        update.set({
+            "measurements.mm": mm,
+            "measurements.face_shape": face_shape,
+            "status.measurements_done": True
+        })
+    return await update.commit(upsert=True)
+
+
+async def select_frame(
+    guest_id: str,
+    session_id: str,
+    frame_id: str,
+    frame_name: str,
+    frame_dims: dict,
+    fitting_height: float,
+    frame_image_path: str
+):
+    """
+    Save the selected frame only if measurements are done.
+    Returns the session's face height, or None when measurements are
+    missing (nothing is written in that case).
+    """
+    doc = await SessionUpdate(guest_id, session_id).set({
+        "selected_frame": {
+            "frame_id": frame_id,
+            "frame_name": frame_name,
+            "dimensions": frame_dims,
+            "fitting_height": fitting_height,
+            "frame_image_path": frame_image_path,
+            "selected_at": datetime.utcnow()
+        },
+        "status.frame_selected": True
+    }).commit_and_get(
+        projection={"measurements.mm.face_height": 1},
+        **{"status.measurements_done": True}
+    )
+
+    if not doc:
+        return None
+    return doc["measurements"]["mm"]["face_height"]
@@ -1,6 +1,7 @@
 from datetime import datetime
-from fastapi import UploadFile, File
 from app.db.mongo import virtual_tryons
+from app.db.session_cache import session_cache
+from app.db.session_repository import SessionUpdate, find_session
 
 # 🔹 INSERT (ONLY ONCE)
 async def insert_tryon(
@@ -8,6 +9,7 @@ async def insert_tryon(
     session_id: str,
     detection: dict
 ):
+    session_cache.invalidate((guest_id, session_id))
     await virtual_tryons.insert_one({
         "guest_id": guest_id,
         "session_id": session_id,
@@ -26,6 +28,7 @@ async def insert_tryon(
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     })
+    session_cache.invalidate((guest_id, session_id))
 
 
 # 🔹 UPDATE HELPERS
@@ -34,13 +37,7 @@ async def update_tryon(
     session_id: str,
     update_data: dict
 ):
-    await virtual_tryons.update_one(
-        {"guest_id": guest_id, "session_id": session_id},
-        {
-            "$set": update_data,
-            "$currentDate": {"updated_at": True}
-        }
-    )
+    await SessionUpdate(guest_id, session_id).set(update_data).commit()
 
 
 async def update_measurements(
@@ -49,37 +46,26 @@ async def update_measurements(
     mm: dict,
     face_shape: str
 ):
-    now = datetime.utcnow()
-
-    await virtual_tryons.update_one(
-        {
-            "guest_id": guest_id,
-            "session_id": session_id
-        },
-        {
-            "$set": {
-                "measurements.mm": mm,
-                "measurements.face_shape": face_shape,
-                "status.measurements_done": True,
-                "updated_at": now
-            }
-        },
-        upsert=False  # detect API must run first
-    )
+    await SessionUpdate(guest_id, session_id).set({
+        "measurements.mm": mm,
+        "measurements.face_shape": face_shape,
+        "status.measurements_done": True
+    }).commit(upsert=False)  # detect API must run first
 
 async def get_virtual_tryon_by_session(
     guest_id: str,
     session_id: str
 ):
-    return await virtual_tryons.find_one(
-        {
-            "guest_id": guest_id,
-            "session_id": session_id
-        },
-        {
-            "_id": 0  # hide mongo id
-        }
-    )
+    # Read-through: the frontend polls this during the try-on flow
+    key = (guest_id, session_id)
+    doc = session_cache.get(key)
+    if doc is not None:
+        return doc
+
+    generation = session_cache.generation(key)
+    doc = await find_session(guest_id, session_id)
+    session_cache.set(key, doc, generation)
+    return doc
 
 async def save_selected_frame(
     guest_id: str,
@@ -88,30 +74,19 @@ async def save_selected_frame(
     frame_name: str,
     frame_dims: dict,
     fitting_height: float,
-    frame_image_url: str
+    frame_image_path: str
 ):
-    now = datetime.utcnow()
-
-    result = await virtual_tryons.update_one(
-        {
-            "guest_id": guest_id,
-            "session_id": session_id
+    result = await SessionUpdate(guest_id, session_id).set({
+        "selected_frame": {
+            "frame_id": frame_id,
+            "frame_name": frame_name,
+            "dimensions": frame_dims,
+            "fitting_height": fitting_height,
+            "frame_image_path": frame_image_path,
+            "selected_at": datetime.utcnow()
         },
-        {
-            "$set": {
-                "selected_frame": {
-                    "frame_id": frame_id,
-                    "frame_name": frame_name,
-                    "dimensions": frame_dims,
-                    "fitting_height": fitting_height,
-                    "frame_image_url": frame_image_url,
-                    "selected_at": now
-                },
-                "status.frame_selected": True,
-                "updated_at": now
-            }
-        }
-    )
+        "status.frame_selected": True
+    }).commit(buffered=False)  # caller needs matched_count
 
     return result.matched_count > 0
 
@@ -119,16 +94,17 @@ async def get_face_height(
     guest_id: str,
     session_id: str
 ):
-    doc = await virtual_tryons.find_one(
-        {
-            "guest_id": guest_id,
-            "session_id": session_id,
-            "status.measurements_done": True
-        },
-        {
-            "_id": 0,
-            "measurements.mm.face_height": 1
-        }
+    cached = session_cache.get((guest_id, session_id))
+    if cached is not None:
+        if not (cached.get("status") or {}).get("measurements_done"):
+            return None
+        return cached["measurements"]["mm"]["face_height"]
+
+    doc = await find_session(
+        guest_id,
+        session_id,
+        {"measurements.mm.face_height": 1},
+        **{"status.measurements_done": True}
     )
 
     if not doc:
@@ -0,0 +1,241 @@
+import asyncio
+import copy
+import logging
+from pymongo import UpdateOne
+from app.db.mongo import virtual_tryons
+from app.db.session_cache import session_cache
+from app.utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_FLUSH_ATTEMPTS = 3
+
+
+def _conflicts(a: str, b: str) -> bool:
+    """True when two dotted paths overlap (equal, or one is a parent of the other)."""
+    return a == b or a.startswith(b + ".") or b.startswith(a + ".")
+
+
+def merge_set(target: dict, fields: dict):
+    """
+    Merge $set fields into `target` so the result is still a valid $set:
+    a newer parent path replaces older children, a newer child path is
+    written into an older parent's value.
+    """
+    for path, value in fields.items():
+        for existing in [k for k in target if k.startswith(path + ".")]:
+            del target[existing]
+
+        parent = next((k for k in target if path.startswith(k + ".")), None)
+        if parent is not None and isinstance(target[parent], dict):
+            set_path(target[parent], path[len(parent) + 1:], copy.deepcopy(value))
+        else:
+            target[path] = value
+
+
+def set_path(doc: dict, path: str, value):
+    keys = path.split(".")
+    for key in keys[:-1]:
+        child = doc.get(key)
+        if not isinstance(child, dict):
+            child = doc[key] = {}
+        doc = child
+    doc[keys[-1]] = value
+
+
+class _Pending:
+    __slots__ = ("set", "set_on_insert", "upsert", "ops", "attempts")
+
+    def __init__(self):
+        self.set = {}
+        self.set_on_insert = {}
+        self.upsert = False
+        self.ops = 0
+        self.attempts = 0
+
+    def add(self, set_fields: dict, set_on_insert: dict, upsert: bool):
+        merge_set(self.set, set_fields)
+        for path, value in set_on_insert.items():
+            self.set_on_insert.setdefault(path, value)
+        self.upsert = self.upsert or upsert
+        self.ops += 1
+
+    def to_update(self) -> dict:
+        update = {"$set": self.set}
+        # $setOnInsert may not touch a path that $set also writes
+        on_insert = {
+            path: value for path, value in self.set_on_insert.items()
+            if not any(_conflicts(path, p) for p in self.set)
+        }
+        if on_insert:
+            update["$setOnInsert"] = on_insert
+        return update
+
+
+class WriteBehindBuffer:
+    """
+    Coalesces virtual_tryons updates per (guest_id, session_id) and writes
+    them with one unordered bulk_write every `flush_interval_ms` or once
+    `max_ops` updates are buffered. Pending updates are flushed on shutdown.
+    """
+
+    def __init__(self, collection, flush_interval_ms: int, max_ops: int):
+        self.collection = collection
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_ops = max_ops
+
+        self._pending = {}  # (guest_id, session_id) -> _Pending
+        self._inflight = {}  # the batch bulk_write is writing right now (one at a time)
+        self._pending_ops = 0
+        self._task = None
+        self._wake = None
+        self._flush_lock = None
+        self._closed = False
+
+        self._enqueued = 0
+        self._flushed_ops = 0
+        self._flushed_docs = 0
+        self._batches = 0
+        self._errors = 0
+
+    def _ensure_started(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def enqueue(self, guest_id: str, session_id: str, set_fields: dict, set_on_insert: dict | None = None, upsert: bool = False):
+        if self._closed:
+            raise Exception("Write-behind buffer is closed")
+        self._ensure_started()
+
+        key = (guest_id, session_id)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = _Pending()
+        pending.add(set_fields, set_on_insert or {}, upsert)
+
+        self._enqueued += 1
+        self._pending_ops += 1
+        if self._pending_ops >= self.max_ops:
+            self._wake.set()
+
+    def has_pending(self, guest_id: str, session_id: str) -> bool:
+        key = (guest_id, session_id)
+        return key in self._pending or key in self._inflight
+
+    def overlay(self, guest_id: str, session_id: str, doc: dict | None) -> dict | None:
+        """Apply pending and in-flight (not yet acknowledged) updates to a document read from Mongo."""
+        key = (guest_id, session_id)
+        for pending in (self._inflight.get(key), self._pending.get(key)):
+            if pending is None:
+                continue
+
+            if doc is None:
+                if not pending.upsert:
+                    continue
+                doc = {"guest_id": guest_id, "session_id": session_id}
+                for path, value in pending.to_update().get("$setOnInsert", {}).items():
+                    set_path(doc, path, copy.deepcopy(value))
+
+            for path, value in pending.set.items():
+                set_path(doc, path, copy.deepcopy(value))
+        return doc
+
+    async def flush_key(self, guest_id: str, session_id: str):
+        """Write one session's pending updates now (before a conditional op on it)."""
+        if not self.has_pending(guest_id, session_id):
+            return
+        # Under the flush lock: waits for an in-flight batch holding this
+        # session to land, and keeps it from landing after this write
+        async with self._flush_lock:
+            pending = self._pending.pop((guest_id, session_id), None)
+            if pending is not None:
+                self._pending_ops -= pending.ops
+                await self._write({(guest_id, session_id): pending})
+
+    async def flush(self):
+        """Write everything pending. Callers hold the flush lock."""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self._pending_ops = 0
+        await self._write(batch)
+
+    async def _write(self, batch: dict):
+        requests = [
+            UpdateOne(
+                {"guest_id": guest_id, "session_id": session_id},
+                pending.to_update(),
+                upsert=pending.upsert
+            )
+            for (guest_id, session_id), pending in batch.items()
+        ]
+
+        self._inflight = batch
+        try:
+            await self.collection.bulk_write(requests, ordered=False)
+        except Exception as e:
+            self._errors += 1
+            logger.warning("Write-behind flush of %d sessions failed: %s", len(batch), e)
+            self._requeue(batch)
+            return
+        finally:
+            self._inflight = {}
+
+        self._batches += 1
+        self._flushed_docs += len(batch)
+        self._flushed_ops += sum(pending.ops for pending in batch.values())
+
+    def _requeue(self, batch: dict):
+        # Put failed updates back underneath anything written since
+        for key, failed in batch.items():
+            failed.attempts += 1
+            if failed.attempts >= MAX_FLUSH_ATTEMPTS:
+                logger.error("Dropping write-behind update for %s after %d attempts", key, failed.attempts)
+                # Reads may have cached a doc with these updates overlaid
+                session_cache.invalidate(key)
+                continue
+            added = failed.ops
+            newer = self._pending.get(key)
+            if newer is not None:
+                failed.add(newer.set, newer.set_on_insert, newer.upsert)
+                failed.ops += newer.ops - 1
+            self._pending[key] = failed
+            self._pending_ops += added
+
+    async def _run(self):
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            async with self._flush_lock:
+                await self.flush()
+
+    async def close(self):
+        self._closed = True
+        if self._task is not None:
+            self._wake.set()
+            await self._task
+            async with self._flush_lock:
+                await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending_sessions": len(self._pending),
+            "pending_ops": self._pending_ops,
+            "enqueued": self._enqueued,
+            "flushed_ops": self._flushed_ops,
+            "flushed_docs": self._flushed_docs,
+            "batches": self._batches,
+            "errors": self._errors
+        }
+
+
+write_behind = WriteBehindBuffer(
+    virtual_tryons,
+    flush_interval_ms=settings.WRITE_BEHIND_FLUSH_MS,
+    max_ops=settings.WRITE_BEHIND_MAX_OPS
+) if settings.WRITE_BEHIND_ENABLED else None
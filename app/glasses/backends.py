@@ -0,0 +1,205 @@
+import copy
+import os
+import tempfile
+import numpy as np
+import torch
+
+# Max abs difference in softmax probability vs. eager before a backend
+# is rejected. int8 shifts probabilities a little but rarely flips labels.
+DEFAULT_TOLERANCE = {
+    "eager": 0.0,
+    "torchscript": 1e-4,
+    "quantized_dynamic": 2e-2,
+    "quantized_static": 5e-2,
+    "onnx": 1e-4
+}
+
+
+class EagerBackend:
+    name = "eager"
+
+    def __init__(self, model: torch.nn.Module, device: str):
+        self.model = model
+        self.device = device
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        with torch.no_grad():
+            return self.model(batch.to(self.device)).cpu()
+
+
+class TorchScriptBackend:
+    """Traced + frozen graph, channels_last memory format, inference_mode."""
+    name = "torchscript"
+
+    def __init__(self, model: torch.nn.Module, device: str):
+        self.device = device
+        model = copy.deepcopy(model).to(device).to(memory_format=torch.channels_last).eval()
+        example = torch.zeros(1, 3, 224, 224, device=device).to(memory_format=torch.channels_last)
+
+        with torch.inference_mode():
+            traced = torch.jit.trace(model, example)
+            self.model = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        batch = batch.to(self.device).contiguous(memory_format=torch.channels_last)
+        with torch.inference_mode():
+            return self.model(batch).cpu()
+
+
+class QuantizedBackend:
+    """
+    int8 on CPU.
+    dynamic: only nn.Linear layers are quantized; in resnet18 that is the
+             512x2 fc head, so the conv trunk stays fp32 and the speedup
+             is negligible. Kept as a parity baseline, not for serving.
+    static:  whole network via FX graph mode, calibrated on `calibration` batches.
+    """
+
+    def __init__(self, model: torch.nn.Module, mode: str = "dynamic", calibration=None):
+        from torch.ao import quantization as tq
+
+        model = copy.deepcopy(model).cpu().eval()
+        self.name = f"quantized_{mode}"
+
+        if mode == "dynamic":
+            self.model = tq.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif mode == "static":
+            from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+            if not calibration:
+                # Activation ranges must come from real photos, not noise
+                raise Exception("Static quantization needs calibration face crops (GLASSES_CALIBRATION_DIR)")
+
+            example = torch.zeros(1, 3, 224, 224)
+            prepared = prepare_fx(model, tq.get_default_qconfig_mapping("x86"), (example,))
+            with torch.inference_mode():
+                for batch in calibration:
+                    prepared(batch)
+            self.model = convert_fx(prepared)
+        else:
+            raise ValueError(f"Unknown quantization mode: {mode}")
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        with torch.inference_mode():
+            return self.model(batch.cpu())
+
+
+class OnnxBackend:
+    """ONNX Runtime CPU session; the graph is exported once next to the .pth file."""
+    name = "onnx"
+
+    def __init__(self, model: torch.nn.Module, onnx_path: str):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise Exception("onnxruntime is not installed (pip install onnxruntime)")
+
+        if not os.path.isfile(onnx_path):
+            export_onnx(model, onnx_path)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        inputs = np.ascontiguousarray(batch.cpu().numpy(), dtype=np.float32)
+        logits = self.session.run(None, {self.input_name: inputs})[0]
+        return torch.from_numpy(logits)
+
+
+def export_onnx(model: torch.nn.Module, onnx_path: str):
+    model = copy.deepcopy(model).cpu().eval()
+    # Unique temp file per exporter: several worker processes may export at once
+    fd, tmp_path = tempfile.mkstemp(suffix=".onnx.tmp", dir=os.path.dirname(os.path.abspath(onnx_path)))
+    os.close(fd)
+    try:
+        torch.onnx.export(
+            model,
+            (torch.zeros(1, 3, 224, 224),),
+            tmp_path,
+            input_names=["input"],
+            output_names=["logits"],
+            dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=17,
+            dynamo=False
+        )
+        os.replace(tmp_path, onnx_path)  # atomic: readers see the old file or the whole new one
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def synthetic_batches(batches: int = 8, batch_size: int = 4):
+    """Random inputs: fine for timing, meaningless for calibration or parity."""
+    generator = torch.Generator().manual_seed(0)
+    for _ in range(batches):
+        yield torch.rand(batch_size, 3, 224, 224, generator=generator)
+
+
+def face_samples(images_dir: str, preprocess, limit: int = 64) -> torch.Tensor | None:
+    """
+    Preprocessed face crops from `images_dir` (N x 3 x 224 x 224), used to
+    calibrate static int8 and to check backends against eager on the kind
+    of input they will actually serve. None if the directory has no images.
+    """
+    from PIL import Image
+
+    if not images_dir or not os.path.isdir(images_dir):
+        return None
+
+    tensors = []
+    for name in sorted(os.listdir(images_dir)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
+            with Image.open(os.path.join(images_dir, name)) as image:
+                tensors.append(preprocess(image.convert("RGB")))
+        if len(tensors) == limit:
+            break
+    return torch.stack(tensors) if tensors else None
+
+
+def split_samples(samples: torch.Tensor, batch_size: int = 8) -> tuple[list, torch.Tensor]:
+    """Calibration batches and a held-out verification batch (every 4th crop)."""
+    if len(samples) < 2:
+        return [samples], samples
+    held_out = torch.zeros(len(samples), dtype=torch.bool)
+    held_out[::4] = True
+    calibration = samples[~held_out]
+    return list(calibration.split(batch_size)), samples[held_out]
+
+
+def build_backend(name: str, model: torch.nn.Module, device: str, model_path: str, calibration=None):
+    if name == "eager":
+        return EagerBackend(model, device)
+    if name == "torchscript":
+        return TorchScriptBackend(model, device)
+    if name == "quantized_dynamic":
+        return QuantizedBackend(model, "dynamic")
+    if name == "quantized_static":
+        return QuantizedBackend(model, "static", calibration)
+    if name == "onnx":
+        return OnnxBackend(model, os.path.splitext(model_path)[0] + ".onnx")
+    raise ValueError(f"Unknown glasses detector backend: {name}")
+
+
+def verify_backend(reference, candidate, batch: torch.Tensor, tolerance: float | None = None) -> dict:
+    """
+    Compare a backend's softmax output with the eager reference on `batch`.
+    """
+    if tolerance is None:
+        tolerance = DEFAULT_TOLERANCE.get(candidate.name, 1e-4)
+
+    expected = torch.softmax(reference(batch), dim=1)
+    actual = torch.softmax(candidate(batch), dim=1)
+
+    max_abs_diff = float((expected - actual).abs().max())
+    label_agreement = float((expected.argmax(dim=1) == actual.argmax(dim=1)).float().mean())
+
+    return {
+        "backend": candidate.name,
+        "max_abs_diff": max_abs_diff,
+        "label_agreement": label_agreement,
+        "tolerance": tolerance,
+        "ok": max_abs_diff <= tolerance
+    }
@@ -0,0 +1,105 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import torch
+from PIL import Image
+
+
+class GlassesBatcher:
+    """
+    Dynamic micro-batching in front of GlassesDetector.
+
+    Callers preprocess on their own thread and enqueue a tensor. A single
+    worker thread collects up to `max_batch_size` tensors (waiting at most
+    `max_wait_ms` after the first one arrives), runs one forward pass and
+    resolves each caller's future with its own result dict.
+    """
+
+    def __init__(self, detector, max_batch_size: int = 8, max_wait_ms: float = 5.0):
+        self.detector = detector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._largest_batch = 0
+
+        self._thread = threading.Thread(target=self._run, name="glasses-batcher", daemon=True)
+        self._thread.start()
+
+    def submit_tensor(self, tensor: torch.Tensor) -> Future:
+        future = Future()
+        self._queue.put((tensor, future))
+        return future
+
+    def submit(self, image: Image.Image) -> Future:
+        return self.submit_tensor(self.detector.preprocess(image))
+
+    def predict_tensor(self, tensor: torch.Tensor) -> dict:
+        return self.submit_tensor(tensor).result()
+
+    def predict(self, image: Image.Image) -> dict:
+        return self.submit(image).result()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish the current batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            futures = [future for _, future in batch]
+            try:
+                results = self.detector.predict_tensors(torch.stack([tensor for tensor, _ in batch]))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._largest_batch = max(self._largest_batch, len(batch))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queued": self._queue.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "largest_batch": self._largest_batch
+            }
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
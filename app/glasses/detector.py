@@ -1,12 +1,25 @@
-import os
+import logging
+import cv2
+import numpy as np
 import torch
 import torch.nn as nn
 from torchvision.models import resnet18
 from torchvision import transforms
 from PIL import Image
+from app.glasses.backends import EagerBackend, build_backend, face_samples, split_samples, verify_backend
+
+logger = logging.getLogger(__name__)
+
 
 class GlassesDetector:
-    def __init__(self, model_path):
+    def __init__(
+        self,
+        model_path,
+        backend: str = "eager",
+        preprocessing: str = "pil",
+        verify: bool = True,
+        calibration_dir: str | None = None
+    ):
         # Device FIRST to avoid errors
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
 
@@ -20,6 +33,9 @@ class GlassesDetector:
             transforms.Resize((224, 224)),
             transforms.ToTensor(),
         ])
+        self.preprocessing = preprocessing
+
+        self.backend = self._build_backend(backend, model_path, verify, calibration_dir)
 
     def _load_model(self, path):
         model = resnet18(weights=None)     # Better than torch.hub
@@ -30,25 +46,58 @@ class GlassesDetector:
 
         return model
 
-    def predict(self, image: Image.Image) -> dict:
-        # Preprocess
-        img_tensor = self.transform(image).unsqueeze(0).to(self.device)
+    def _build_backend(self, name, model_path, verify, calibration_dir):
+        eager = EagerBackend(self.model, self.device)
+        if name == "eager":
+            return eager
 
-        with torch.no_grad():
-            outputs = self.model(img_tensor)
-            probs = torch.softmax(outputs, dim=1)
+        # Real face crops: calibrate int8 on them and check parity on held-out ones
+        samples = face_samples(calibration_dir, self.preprocess)
+        if samples is None:
+            if verify or name == "quantized_static":
+                logger.warning("Glasses backend %s needs face crops in GLASSES_CALIBRATION_DIR; using eager", name)
+                return eager
+            return build_backend(name, self.model, self.device, model_path)
 
-            no_glasses_prob = float(probs[0, 0])
-            glasses_prob = float(probs[0, 1])
+        calibration, held_out = split_samples(samples)
+        backend = build_backend(name, self.model, self.device, model_path, calibration)
+        if verify:
+            # Fall back to eager rather than serve a backend that disagrees with it
+            report = verify_backend(eager, backend, held_out)
+            if not report["ok"]:
+                logger.warning("Glasses backend %s failed verification (%s); using eager", name, report)
+                return eager
+        return backend
 
-        glasses_detected = glasses_prob > 0.5
+    def preprocess(self, image) -> torch.Tensor:
+        # 3x224x224 tensor, ready to be stacked into a batch
+        if isinstance(image, np.ndarray) or self.preprocessing == "numpy":
+            return self.preprocess_array(np.asarray(image))
+        return self.transform(image)
 
-        return {
-            "glasses_detected": glasses_detected,
-            "confidence": round(glasses_prob if glasses_detected else no_glasses_prob, 3)
-        }
+    @staticmethod
+    def preprocess_array(rgb: np.ndarray) -> torch.Tensor:
+        """OpenCV resize + scale to [0, 1]; equivalent to Resize + ToTensor without PIL."""
+        h, w = rgb.shape[:2]
+        interpolation = cv2.INTER_AREA if h > 224 or w > 224 else cv2.INTER_LINEAR
+        resized = cv2.resize(rgb, (224, 224), interpolation=interpolation)
+        return torch.from_numpy(resized).permute(2, 0, 1).float().div_(255.0)
 
+    def predict_tensors(self, batch: torch.Tensor) -> list[dict]:
+        probs = torch.softmax(self.backend(batch), dim=1)
 
-# Create global instance only if model file exists (so server can start without it)
-_model_path = os.path.join(os.path.dirname(__file__), "..", "models", "glasses_detector_resnet18.pth")
-detector = GlassesDetector(_model_path) if os.path.isfile(_model_path) else None
+        results = []
+        for no_glasses_prob, glasses_prob in probs.tolist():
+            glasses_detected = glasses_prob > 0.5
+            results.append({
+                "glasses_detected": glasses_detected,
+                "confidence": round(glasses_prob if glasses_detected else no_glasses_prob, 3)
+            })
+        return results
+
+    def predict_batch(self, images: list[Image.Image]) -> list[dict]:
+        batch = torch.stack([self.preprocess(image) for image in images])
+        return self.predict_tensors(batch)
+
+    def predict(self, image: Image.Image) -> dict:
+        return self.predict_batch([image])[0]
@@ -1,17 +1,59 @@
 import os
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from app.routes.analyze import router as analyze_router
 from app.routes.glasses_detector import router as glasses_router
 from app.routes.landmark_detector import router as landmark_router
 from app.routes.virtual_tryon import virtual_tryon
+from app.db.indexes import manage_indexes
+from app.db.mongo import virtual_tryons
+from app.db.session_cache import session_cache
+from app.db.write_behind import write_behind
+from app.services.gemini_gateway import gemini_gateway
+from app.services.inference_workers import inference_workers
+from app.services.model_registry import registry
+from app.services.removal_jobs import removal_jobs
+from app.services.result_cache import result_cache
+from app.services.signed_url_service import signed_url_service
+from app.utils.deadline import deadline_scope
+from app.utils.executors import executor_stats, shutdown_executors
+from app.utils.settings import settings
+from app.utils.system import process_memory
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# --------------------------------------------------
+# LIFESPAN
+# --------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.MODEL_PRELOAD:
+        # Load models in parallel off the event loop; /ready gates traffic
+        registry.start_background_load()
+    await manage_indexes()
+    if settings.SESSION_CACHE_CHANGE_STREAM and session_cache.enabled:
+        session_cache.start_change_stream(virtual_tryons)
+    if inference_workers is not None:
+        inference_workers.start()
+    removal_jobs.start()
+    yield
+    await removal_jobs.stop()
+    if inference_workers is not None:
+        inference_workers.shutdown()
+    await session_cache.stop_change_stream()
+    # Let in-flight inference / uploads finish before the worker exits
+    shutdown_executors(wait=True)
+    if write_behind is not None:
+        await write_behind.close()
+    await gemini_gateway.aclose()
+
 # --------------------------------------------------
 # FASTAPI APP
 # --------------------------------------------------
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # --------------------------------------------------
 # CORS CONFIGURATION
@@ -43,12 +85,27 @@ app.add_middleware(
     expose_headers=["*"],            # Expose all headers to the frontend
 )
 
+# --------------------------------------------------
+# REQUEST DEADLINE
+# --------------------------------------------------
+@app.middleware("http")
+async def request_deadline(request: Request, call_next):
+    # Downstream calls (Gemini) only spend what is left of this budget
+    budget = settings.REQUEST_DEADLINE_SECONDS
+    header = request.headers.get("x-request-timeout-ms")
+    if header and header.isdigit():
+        budget = min(budget, int(header) / 1000)
+
+    with deadline_scope(budget):
+        return await call_next(request)
+
 # --------------------------------------------------
 # ROUTES
 # --------------------------------------------------
 app.include_router(glasses_router)
 app.include_router(landmark_router)
 app.include_router(virtual_tryon)  # from virtual_tryon.py
+app.include_router(analyze_router)
 
 # --------------------------------------------------
 # ROOT ENDPOINT
@@ -63,3 +120,37 @@ def root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "service": "vtob-api"}
+
+# --------------------------------------------------
+# READINESS ENDPOINT (use as Cloud Run startup probe)
+# --------------------------------------------------
+@app.get("/ready")
+def readiness_check():
+    ready = registry.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "models": registry.status()}
+    )
+
+# --------------------------------------------------
+# METRICS ENDPOINT
+# --------------------------------------------------
+def _pool_stats(component):
+    return component.stats() if component is not None else None
+
+@app.get("/metrics")
+def metrics():
+    return {
+        "executors": executor_stats(),
+        "models": registry.status(),
+        "landmarker_pool": _pool_stats(registry.peek("face_landmarker")),
+        "glasses_batcher": _pool_stats(registry.peek("glasses_batcher")),
+        "result_cache": result_cache.stats(),
+        "signed_urls": signed_url_service.stats(),
+        "write_behind": _pool_stats(write_behind),
+        "session_cache": session_cache.stats(),
+        "gemini": gemini_gateway.stats(),
+        "removal_jobs": removal_jobs.stats(),
+        "inference_workers": _pool_stats(inference_workers),
+        "process": {"pid": os.getpid(), "memory": process_memory()}
+    }
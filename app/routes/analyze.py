@@ -0,0 +1,34 @@
+from fastapi import APIRouter, UploadFile, File, Form
+from app.services.analysis_service import analyze
+
+router = APIRouter(
+    tags=["Analysis"]
+)
+
+@router.post("/analyze")
+async def analyze_face(
+    file: UploadFile = File(...),
+    guest_id: str = Form("temp_guest"),
+    session_id: str = Form("temp_session"),
+    credit_card: bool = Form(False),      # also measure against a credit card in the photo
+    gemini: bool = Form(False)            # also run the Gemini VTO analysis
+):
+    try:
+        image_bytes = await file.read()
+        ext = file.filename.split(".")[-1] if file.filename and "." in file.filename else "jpg"
+
+        # Glasses, landmarks, upload (+ optional stages) from one upload, one decode, one Mongo write
+        return await analyze(
+            image_bytes,
+            guest_id=guest_id,
+            session_id=session_id,
+            ext=ext,
+            credit_card=credit_card,
+            gemini=gemini
+        )
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, UploadFile, File
-from fastapi.responses import JSONResponse
+import asyncio
+import json
+from fastapi import APIRouter, UploadFile, File, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import base64
 from io import BytesIO
 from app.services.glasses_service import GlassesService
-from app.services.glasses_removal import remove_glasses_service
-from app.db.virtual_tryon_repo import update_tryon
-from app.db.tryon_insert import insert_on_detection
-from app.services.gcs_service import upload_image_and_get_url
+from app.services.removal_jobs import removal_jobs, run_removal
+from app.services.gemini_image_prep import mime_type_of, transcode
+from app.db.session_repository import save_detection
+from app.services.gcs_service import upload_image_async
+from app.utils.common import content_hash
+from app.utils.executors import run_cpu
+
+BINARY_TYPES = ("image/jpeg", "image/png", "image/webp")
 
 router = APIRouter(
     prefix="/glasses",
@@ -25,30 +31,25 @@ async def detect_glasses(
     try:
         image_bytes = await file.read()
 
-        # Upload ORIGINAL image
-        original_upload = upload_image_and_get_url(
-            file_bytes=image_bytes,
-            guest_id=guest_id,
-            session_id=session_id,
-            stage="original",
-            ext="jpg"
+        # Upload ORIGINAL image and detect glasses concurrently
+        original_upload, result = await asyncio.gather(
+            upload_image_async(
+                file_bytes=image_bytes,
+                guest_id=guest_id,
+                session_id=session_id,
+                stage="original",
+                ext="jpg"
+            ),
+            run_cpu(GlassesService.detect, image_bytes)
         )
-        # Detect glasses
-        result = GlassesService.detect(image_bytes)
 
-        await insert_on_detection(
+        # One upsert: detection result + original image path
+        await save_detection(
             guest_id=guest_id,
             session_id=session_id,
             glasses_detected=result["glasses_detected"],
-            confidence=result["confidence"]
-        )
-
-        # 4️⃣ Update original image path
-        await update_tryon(
-            guest_id=guest_id,
-            session_id=session_id,
-            update_data={
-                "images.original.bucket_path": original_upload["signed_url"]}
+            confidence=result["confidence"],
+            original_path=original_upload["bucket_path"]
         )
 
         return {
@@ -61,11 +62,39 @@ async def detect_glasses(
         return {"success": False, "error": str(e)}
 
 
+def negotiate_image_type(accept: str) -> str | None:
+    """
+    Image MIME type the client prefers over JSON, or None for the JSON body.
+    "image/*" means "whatever format the result is already in".
+    """
+    ranked = []
+    for position, item in enumerate(accept.split(",")):
+        media_type, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            ranked.append((-q, position, media_type.strip().lower()))
+
+    for _, _, media_type in sorted(ranked):
+        if media_type in BINARY_TYPES or media_type == "image/*":
+            return media_type
+        if media_type in ("application/json", "*/*"):
+            return None
+    return None
+
+
 # ------------------------
 # REMOVE API
 # ------------------------
 @router.post("/remove")
 async def remove_glasses(
+    request: Request,
     image: UploadFile = File(...),
     guest_id: str = "temp_guest",
     session_id: str = "temp_session"
@@ -73,28 +102,37 @@ async def remove_glasses(
     try:
         image_bytes = await image.read()
 
-        # Remove glasses
-        edited_bytes = remove_glasses_service(image_bytes)
+        # Accept: image/jpeg | image/png | image/webp | image/* -> raw body;
+        # anything else keeps the original base64 JSON shape
+        media_type = negotiate_image_type(request.headers.get("accept", ""))
 
-        # Upload glasses-removed image
-        removed_upload = upload_image_and_get_url(
-            file_bytes=edited_bytes,
-            guest_id=guest_id,
-            session_id=session_id,
-            stage="glasses_removed",
-            ext="jpg"
-        )
+        # Remove glasses, upload the result, update the try-on document.
+        # Always: the same photo may be re-sent for a different session.
+        result = await run_removal(image_bytes, guest_id, session_id)
+        edited_bytes = result["edited_bytes"]
 
-        # Update try-on document with removed image
-        await update_tryon(
-            guest_id=guest_id,
-            session_id=session_id,
-            update_data={
-                "images.glasses_removed.bucket_path": removed_upload["signed_url"]
-            }
-        )
+        if media_type:
+            if media_type == "image/*":
+                media_type = mime_type_of(edited_bytes)
+            else:
+                edited_bytes = await run_cpu(transcode, edited_bytes, media_type)
+
+            # Client already holds these exact bytes: skip the body, not the work
+            etag = f'"{content_hash(edited_bytes)}"'
+            if etag in request.headers.get("if-none-match", ""):
+                return Response(status_code=304, headers={"ETag": etag})
+
+            return Response(
+                content=edited_bytes,
+                media_type=media_type,
+                headers={
+                    "ETag": etag,
+                    "Cache-Control": "private, max-age=3600",
+                    "Vary": "Accept"
+                }
+            )
 
-        # Return base64 PNG
+        # Return base64 image (legacy JSON shape)
         edited_base64 = base64.b64encode(edited_bytes).decode("utf-8")
 
         return JSONResponse({
@@ -106,4 +144,61 @@ async def remove_glasses(
         return JSONResponse({
             "success": False,
             "error": str(e)
-        })
\ No newline at end of file
+        })
+
+
+# ------------------------
+# REMOVE JOBS (async)
+# ------------------------
+@router.post("/remove/jobs")
+async def submit_removal_job(
+    image: UploadFile = File(...),
+    guest_id: str = "temp_guest",
+    session_id: str = "temp_session"
+):
+    try:
+        image_bytes = await image.read()
+        job = await removal_jobs.submit(image_bytes, guest_id, session_id)
+
+        return {
+            "success": True,
+            "job_id": job["job_id"],
+            "status": job["status"]
+        }
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@router.get("/remove/jobs/{job_id}")
+async def get_removal_job(job_id: str):
+    try:
+        job = await removal_jobs.get(job_id)
+        if not job:
+            return {"success": False, "error": "Job not found"}
+
+        return {"success": True, "job": job}
+
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@router.get("/remove/jobs/{job_id}/events")
+async def stream_removal_job(job_id: str):
+    # Server-sent events: one "event: <status>" per change, stream ends when the job does
+    async def stream():
+        found = False
+        async for job in removal_jobs.events(job_id):
+            if job is None:
+                yield ": keepalive\n\n"
+                continue
+            found = True
+            yield f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
+        if not found:
+            yield f"event: error\ndata: {json.dumps({'error': 'Job not found'})}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
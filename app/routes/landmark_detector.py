@@ -1,8 +1,17 @@
-from fastapi import APIRouter, UploadFile, File
+import asyncio
+import logging
+from fastapi import APIRouter, UploadFile, File, WebSocket, WebSocketDisconnect
+from typing import List
 # from app.services.landmark_service import LandmarkService
 from app.services.iris_landmark_service import IrisLandmarkService
-from app.services.credit_card_measurement_service import CreditCardMeasurementService
 from app.db.virtual_tryon_repo import update_measurements
+from app.services.inference_workers import detect_landmarks as detect_landmarks_in_worker, run_inference
+from app.services.live_measurement import LiveMeasurementSession
+from app.utils.executors import ExecutorBusyError, cpu_executor
+from app.utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/landmarks",
     tags=["Landmark Detection"]
@@ -17,8 +26,8 @@ async def detect_landmarks(
     try:
         image_bytes = await file.read()
 
-        # Detect landmarks
-        result = IrisLandmarkService.detect_landmarks(image_bytes)
+        # Detect landmarks (process workers if enabled, else CPU thread pool)
+        result = await detect_landmarks_in_worker(image_bytes)
 
         # Persist required measurements
         await update_measurements(
@@ -40,11 +49,52 @@ async def detect_landmarks(
         }
   
 
+@router.post("/detect-batch")
+async def detect_landmarks_batch(
+    files: List[UploadFile] = File(...),
+    guest_id: str = "temp_guest",
+    session_id: str = "temp_session"
+):
+    try:
+        if len(files) > settings.LANDMARK_BATCH_MAX_IMAGES:
+            return {
+                "success": False,
+                "error": f"At most {settings.LANDMARK_BATCH_MAX_IMAGES} images per request"
+            }
+
+        images = [await file.read() for file in files]
+
+        # Landmark all images in parallel, then median/MAD aggregation
+        result = await IrisLandmarkService.detect_landmarks_batch(
+            images,
+            detect=lambda image: run_inference("points", image)
+        )
+
+        # Persist the aggregated measurement once
+        await update_measurements(
+            guest_id=guest_id,
+            session_id=session_id,
+            mm=result["mm"],
+            face_shape=result["face_shape"]
+        )
+
+        return {
+            "success": True,
+            "landmarks": result
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
 @router.post("/credit-card")
 async def measure_with_credit_card(file: UploadFile = File(...)):
     try:
         image_bytes = await file.read()
-        result = CreditCardMeasurementService.process(image_bytes)
+        result = await run_inference("credit_card", image_bytes)
 
         return {
             "success": True,
@@ -55,4 +105,118 @@ async def measure_with_credit_card(file: UploadFile = File(...)):
         return {
             "success": False,
             "error": str(e)
-        }
\ No newline at end of file
+        }
+
+
+# ------------------------
+# LIVE MEASUREMENT (WebSocket)
+# ------------------------
+_live_sessions = 0
+
+
+@router.websocket("/live")
+async def live_measurement(
+    websocket: WebSocket,
+    guest_id: str = "temp_guest",
+    session_id: str = "temp_session"
+):
+    """
+    Client sends webcam frames as binary messages (JPEG/WebP) and gets back
+    smoothed measurements as JSON. Only the newest frame is kept while one
+    is being processed; older ones are dropped, never queued.
+    Text message "save" persists the current smoothed measurements.
+    """
+    global _live_sessions
+    await websocket.accept()
+    if _live_sessions >= settings.LIVE_MAX_SESSIONS:
+        await websocket.close(code=1013, reason="Too many live sessions")
+        return
+
+    _live_sessions += 1
+    session = None
+    setup = None                 # cpu-pool future building the session
+    in_flight = None             # cpu-pool future of the frame being processed
+    latest = None                # newest unprocessed frame
+    frame_ready = asyncio.Event()
+    dropped = 0
+    closed = False
+
+    async def receive():
+        nonlocal latest, dropped, closed
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    if latest is not None:
+                        dropped += 1
+                    latest = message["bytes"]
+                    frame_ready.set()
+                elif message.get("text") == "save":
+                    try:
+                        await save()
+                    except Exception as e:
+                        logger.exception("Saving live measurements for %s/%s failed", guest_id, session_id)
+                        await websocket.send_json({"type": "error", "error": str(e)})
+        finally:
+            closed = True
+            frame_ready.set()
+
+    async def save():
+        smoothed = session.smoothed() if session else {}
+        if not smoothed:
+            await websocket.send_json({"type": "error", "error": "No measurement yet"})
+            return
+        await update_measurements(
+            guest_id=guest_id,
+            session_id=session_id,
+            mm=smoothed["mm"],
+            face_shape=smoothed["face_shape"]
+        )
+        await websocket.send_json({"type": "saved", **smoothed})
+
+    def close_session(_future=None):
+        if setup is not None and not setup.cancelled() and setup.exception() is None:
+            setup.result().close()
+
+    receiver = asyncio.create_task(receive())
+    try:
+        setup = in_flight = cpu_executor.submit(LiveMeasurementSession)
+        session = await asyncio.wrap_future(setup)
+
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            if closed:
+                break
+            frame, latest = latest, None
+
+            try:
+                in_flight = cpu_executor.submit(session.process_frame, frame)
+                update = await asyncio.wrap_future(in_flight)
+            except ExecutorBusyError:
+                dropped += 1
+                continue
+            except Exception as e:
+                await websocket.send_json({"type": "error", "error": str(e)})
+                continue
+
+            update["dropped"] = dropped
+            await websocket.send_json(update)
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        if not closed:
+            await websocket.send_json({"type": "error", "error": str(e)})
+            await websocket.close(code=1011)
+    finally:
+        receiver.cancel()
+        _live_sessions -= 1
+        if in_flight is not None and not in_flight.done():
+            # Cancelled mid-frame: the thread still uses the landmarker, close after it
+            in_flight.add_done_callback(close_session)
+        else:
+            close_session()
+
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, UploadFile, File, Form
-from app.db.virtual_tryon_repo import get_virtual_tryon_by_session, save_selected_frame, get_face_height
+from app.db import session_repository
+from app.db.virtual_tryon_repo import get_virtual_tryon_by_session
 
-from app.services.gcs_service import upload_image_and_get_url
+from app.services.gcs_service import upload_image_async
+from app.services.signed_url_service import signed_url_service
 from app.services.frame_utils import compute_fitting_height, parse_frame_dimensions
 from app.services.gemini_vto_service import GeminiVTOService
 
@@ -24,6 +26,9 @@ async def get_session_details(
                 "error": "Session not found"
             }
 
+        # Sign image paths now so clients always get live URLs
+        data = await signed_url_service.sign_session(data)
+
         return {
             "success": True,
             "data": data
@@ -47,8 +52,16 @@ async def select_frame(
     try:
         image_bytes = await selected_frame_image.read()
 
-        # 1️⃣ Upload frame image
-        upload_result = upload_image_and_get_url(
+        # 1️⃣ Parse frame dimensions
+        frame_dims = parse_frame_dimensions(dimensions)
+
+        # 2️⃣ Compute fitting height
+        fitting_height = compute_fitting_height(
+            lens_height=frame_dims["lens_height"]
+        )
+
+        # 3️⃣ Upload frame image
+        upload_result = await upload_image_async(
             file_bytes=image_bytes,
             guest_id=guest_id,
             session_id=session_id,
@@ -56,36 +69,26 @@ async def select_frame(
             ext=selected_frame_image.filename.split(".")[-1]
         )
 
-        # 2️⃣ Parse frame dimensions
-        frame_dims = parse_frame_dimensions(dimensions)
-
-        # 3️⃣ Get face height from DB
-        face_height = await get_face_height(guest_id, session_id)
-
-        if face_height is None:
-            return {
-                "success": False,
-                "error": "Measurements not completed yet"
-            }
-
-        # 4️⃣ Compute fitting height
-        fitting_height = compute_fitting_height(
-            lens_height=frame_dims["lens_height"]
-        )
-
-        # 5️⃣ Save selected frame
-        await save_selected_frame(
+        # 4️⃣ Save selected frame, only if measurements are done (one round trip)
+        face_height = await session_repository.select_frame(
             guest_id=guest_id,
             session_id=session_id,
             frame_id=frame_id,
             frame_name=frame_name,
             frame_dims=frame_dims,
             fitting_height=fitting_height,
-            frame_image_url=upload_result["signed_url"]  # ✅ URL, not UploadFile
+            frame_image_path=upload_result["bucket_path"]  # ✅ path; signed on read
         )
+
+        if face_height is None:
+            return {
+                "success": False,
+                "error": "Measurements not completed yet"
+            }
+
         return {
             "success": True,
-            "frame_image": upload_result["signed_url"],
+            "frame_image": await signed_url_service.sign_async(upload_result["bucket_path"]),
             "fitting_height": fitting_height
         }
 
@@ -98,7 +101,7 @@ async def gemini_analyze_face(
 ):
     try:
         image_bytes = await file.read()
-        analysis = GeminiVTOService.analyze_face_for_vto(image_bytes)
+        analysis = await GeminiVTOService.analyze_face_for_vto(image_bytes)
         
         return {
             "success": True,
@@ -0,0 +1,241 @@
+"""
+Production entrypoint: pre-fork uvicorn workers that share model weights.
+
+The master binds the socket, imports the inference libraries and loads the
+glasses weights once, then fork()s the workers. Pages the master filled are
+shared copy-on-write, so each worker only pays for what it allocates itself
+(MediaPipe graphs, request buffers, caches). The master restarts workers
+that die, forwards SIGTERM / SIGINT for a graceful shutdown, and logs each
+worker's RSS / PSS / shared / private memory for sizing instances.
+
+Usage:
+    python -m app.server
+    python -m app.server --port 8080 --workers 4
+    python -m app.server --plan        # print the worker plan and exit
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from app.utils.settings import settings
+from app.utils.system import cpu_count, memory_limit, process_memory
+
+logger = logging.getLogger("app.server")
+
+MB = 1024 * 1024
+
+
+def plan_workers(requested: int = 0) -> dict:
+    """
+    Workers = CPUs allowed by the cgroup quota, capped by how many fit in
+    the memory limit (shared memory once + private memory per worker).
+    Thread pools are split so workers don't oversubscribe the cores.
+    """
+    cpus = cpu_count()
+    limit_mb = memory_limit() // MB
+    available = limit_mb - settings.SERVER_MEMORY_RESERVE_MB - settings.SERVER_SHARED_MEMORY_MB
+    by_memory = max(available // settings.SERVER_WORKER_MEMORY_MB, 1)
+
+    workers = requested or max(min(cpus, by_memory), 1)
+    return {
+        "cpus": cpus,
+        "memory_limit_mb": limit_mb,
+        "workers_by_memory": by_memory,
+        "workers": workers,
+        "threads_per_worker": max(cpus // workers, 1)
+    }
+
+
+def configure_workers(plan: dict):
+    """
+    Adjust per-process settings for the worker plan. Runs in the master
+    before the modules that read them (executors, session cache) are imported.
+    """
+    # Split the per-process pools before app.utils.executors is first imported
+    if not settings.CPU_WORKERS:
+        settings.CPU_WORKERS = plan["threads_per_worker"]
+    if plan["workers"] > 1 and settings.REMOVAL_JOB_STORE == "memory":
+        # A poll answered by another worker would not find the job
+        logger.warning("REMOVAL_JOB_STORE=memory is per worker; using mongo for %d workers", plan["workers"])
+        settings.REMOVAL_JOB_STORE = "mongo"
+    if (plan["workers"] > 1 and not settings.SESSION_CACHE_CHANGE_STREAM
+            and settings.SESSION_CACHE_TTL_SECONDS > 0 and settings.SESSION_CACHE_MAX_ENTRIES > 0):
+        # A write in one worker can't invalidate another worker's copy, so
+        # reads would be up to SESSION_CACHE_TTL_SECONDS stale
+        logger.warning("Session cache disabled: %d workers without SESSION_CACHE_CHANGE_STREAM",
+                       plan["workers"])
+        settings.SESSION_CACHE_TTL_SECONDS = 0
+    if settings.INFERENCE_PROCESS_WORKERS:
+        logger.warning("INFERENCE_PROCESS_WORKERS=%d starts a process pool in every worker",
+                       settings.INFERENCE_PROCESS_WORKERS)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload_models():
+    import torch
+    # No OpenMP pool in the master: worker threads would not survive fork()
+    torch.set_num_threads(1)
+
+    from app.services.model_registry import load_shared
+    started = time.perf_counter()
+    try:
+        load_shared()
+    except Exception as e:
+        # Workers load on first use instead; they just won't share the weights
+        logger.warning("Pre-fork model load failed: %s", e)
+    logger.info("Models loaded in %.1fs; master memory %s", time.perf_counter() - started, process_memory())
+
+
+def run_worker(sock: socket.socket, args, threads: int):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    gc.enable()
+
+    import cv2
+    import torch
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+
+    import uvicorn
+    config = uvicorn.Config(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        log_level=args.log_level,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Master:
+    def __init__(self, sock: socket.socket, args, workers: int, threads: int):
+        self.sock = sock
+        self.args = args
+        self.workers = workers
+        self.threads = threads
+        self.children = {}   # pid -> (worker index, start time)
+        self.stopping = False
+
+    def spawn(self, index: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.sock, self.args, self.threads)
+            except BaseException:
+                logger.exception("Worker %d crashed", index)
+                code = 1
+            finally:
+                os._exit(code)
+
+        self.children[pid] = (index, time.monotonic())
+        logger.info("Worker %d started (pid %d)", index, pid)
+
+    def reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            index, started = self.children.pop(pid)
+            if self.stopping:
+                continue
+            logger.warning("Worker %d (pid %d) exited with %s after %.0fs; restarting",
+                           index, pid, os.waitstatus_to_exitcode(status), time.monotonic() - started)
+            if time.monotonic() - started < 5:
+                time.sleep(1)   # don't spin on a worker that dies at startup
+            self.spawn(index)
+
+    def report(self):
+        master = process_memory()
+        rows = {pid: process_memory(pid) for pid in self.children}
+        total_pss = sum(row["pss_mb"] for row in rows.values() if row) + (master["pss_mb"] if master else 0)
+        logger.info("Memory master pid %d: %s", os.getpid(), master)
+        for pid, row in sorted(rows.items()):
+            logger.info("Memory worker %d pid %d: %s", self.children[pid][0], pid, row)
+        logger.info("Memory total PSS %.1f MB for %d workers", total_pss, len(rows))
+
+    def stop(self, signum, _frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info("Received %s; stopping %d workers", signal.Signals(signum).name, len(self.children))
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for index in range(self.workers):
+            self.spawn(index)
+
+        next_report = time.monotonic() + min(settings.SERVER_MEMORY_REPORT_SECONDS, 60)
+        while not self.stopping:
+            time.sleep(1)
+            self.reap()
+            if settings.SERVER_MEMORY_REPORT_SECONDS > 0 and time.monotonic() >= next_report:
+                self.report()
+                next_report = time.monotonic() + settings.SERVER_MEMORY_REPORT_SECONDS
+
+        # Give workers the graceful timeout to drain, then kill the rest
+        deadline = time.monotonic() + settings.SERVER_GRACEFUL_TIMEOUT + 5
+        while self.children and time.monotonic() < deadline:
+            time.sleep(0.2)
+            self.reap()
+        for pid in self.children:
+            logger.warning("Worker pid %d did not exit in time; killing", pid)
+            os.kill(pid, signal.SIGKILL)
+        self.sock.close()
+        return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS, help="0 = derive from CPU / memory")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--plan", action="store_true", help="print the worker plan and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s [%(process)d] %(levelname)s %(message)s")
+
+    plan = plan_workers(args.workers)
+    logger.info("Worker plan: %s", plan)
+    if args.plan:
+        return 0
+
+    configure_workers(plan)
+    sock = bind_socket(args.host, args.port)
+
+    # Keep the GC from touching (and so copying) the preloaded objects in workers
+    gc.disable()
+    preload_models()
+    gc.freeze()
+
+    return Master(sock, args, plan["workers"], plan["threads_per_worker"]).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
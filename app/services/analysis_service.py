@@ -0,0 +1,126 @@
+from app.db.session_repository import save_analysis
+from app.services import face_geometry
+from app.services.credit_card_measurement_service import CreditCardMeasurementService
+from app.services.gcs_service import upload_image_async
+from app.services.gemini_vto_service import GeminiVTOService
+from app.services.glasses_service import GlassesService
+from app.services.iris_landmark_service import IrisLandmarkService
+from app.services.stage_graph import Stage, StageGraph
+from app.utils.preprocessing import as_decoded
+
+# =========================
+# STAGES
+# results["input"] = {"image_bytes", "guest_id", "session_id", "ext"}
+# =========================
+def decode(results):
+    decoded = as_decoded(results["input"]["image_bytes"])
+    decoded.rgb  # one full-resolution decode shared by every stage below
+    return decoded
+
+
+def classify_glasses(results):
+    return GlassesService.detect(results["decode"])
+
+
+def detect_landmarks(results):
+    points = IrisLandmarkService.detect_points(results["decode"])
+    return {
+        "points": points,
+        "response": IrisLandmarkService.to_response(face_geometry.measure(points))
+    }
+
+
+def credit_card_scale(results):
+    points = results["landmarks"]["points"]
+    card_width_px = CreditCardMeasurementService.detect_card_width(results["decode"], points)
+    return CreditCardMeasurementService.measure_points(results["landmarks"]["points"], card_width_px)
+
+
+async def upload_original(results):
+    request = results["input"]
+    return await upload_image_async(
+        file_bytes=request["image_bytes"],
+        guest_id=request["guest_id"],
+        session_id=request["session_id"],
+        stage="original",
+        ext=request["ext"]
+    )
+
+
+async def gemini_analyze(results):
+    # Reuse the decode and the landmarks for the face crop (full frame if no face)
+    landmarks = results.get("landmarks")
+    return await GeminiVTOService.analyze_face_for_vto(
+        results["decode"],
+        points=landmarks["points"] if landmarks else None
+    )
+
+
+async def persist(results):
+    request = results["input"]
+    glasses = results["glasses"]
+    landmarks = results.get("landmarks")
+
+    await save_analysis(
+        guest_id=request["guest_id"],
+        session_id=request["session_id"],
+        glasses_detected=glasses["glasses_detected"],
+        confidence=glasses["confidence"],
+        original_path=results["upload"]["bucket_path"],
+        mm=landmarks["response"]["mm"] if landmarks else None,
+        face_shape=landmarks["response"]["face_shape"] if landmarks else None
+    )
+
+
+ANALYSIS_GRAPH = StageGraph([
+    Stage("decode", decode),
+    Stage("glasses", classify_glasses, needs=("decode",)),
+    Stage("landmarks", detect_landmarks, needs=("decode",), optional=True),
+    Stage("credit_card", credit_card_scale, needs=("decode", "landmarks"), optional=True),
+    Stage("upload", upload_original),
+    Stage("gemini", gemini_analyze, needs=("decode",), after=("landmarks",), optional=True),
+    # One Mongo write once inference and upload are done; measurements only if a face was found
+    Stage("persist", persist, needs=("glasses", "upload"), after=("landmarks",)),
+])
+
+
+async def analyze(
+    image_bytes: bytes,
+    guest_id: str,
+    session_id: str,
+    ext: str = "jpg",
+    credit_card: bool = False,
+    gemini: bool = False
+) -> dict:
+    skip = set()
+    if not credit_card:
+        skip.add("credit_card")
+    if not gemini:
+        skip.add("gemini")
+
+    run = await ANALYSIS_GRAPH.run(
+        initial={"input": {
+            "image_bytes": image_bytes,
+            "guest_id": guest_id,
+            "session_id": session_id,
+            "ext": ext
+        }},
+        skip=skip
+    )
+
+    results = run.results
+    response = {
+        "success": run.ok,
+        "glasses": results.get("glasses"),
+        "landmarks": results["landmarks"]["response"] if "landmarks" in results else None,
+        "timings_ms": run.timings_ms
+    }
+    if credit_card:
+        response["credit_card"] = results.get("credit_card")
+    if gemini:
+        response["gemini_analysis"] = results.get("gemini")
+    if run.errors:
+        response["errors"] = run.errors
+    if not run.ok:
+        response["error"] = next(error for name, error in run.errors.items() if name in run.required)
+    return response
@@ -1,132 +1,185 @@
-import io
 import cv2
 import numpy as np
-from PIL import Image
-import mediapipe as mp
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
+from app.services import face_geometry
+from app.services.model_registry import face_landmarker_pool
+from app.utils.preprocessing import DecodedImage, as_decoded
 
 class CreditCardMeasurementService:
     CARD_WIDTH_MM = 85.6  # ISO standard credit card
 
-    _model_path = "app/models/face_landmarker.task"
-    _base_options = python.BaseOptions(model_asset_path=_model_path)
-    _options = vision.FaceLandmarkerOptions(
-        base_options=_base_options,
-        output_face_blendshapes=True,
-        output_facial_transformation_matrixes=True,
-        num_faces=1)
-    _detector = vision.FaceLandmarker.create_from_options(_options)
+    # Card aspect window and minimum area (full-resolution pixels)
+    MIN_ASPECT, MAX_ASPECT = 1.5, 1.7
+    MIN_AREA = 5000
 
-    @staticmethod
-    def _dist(p1, p2):
-        return ((p1[0]-p2[0])**2 + (p1[1]-p2[1])**2) ** 0.5
+    # Search on the pyramid level whose short side is at least this
+    SEARCH_MIN_SIDE = 720
 
     # -----------------------------
     # CREDIT CARD DETECTION
     # -----------------------------
     @staticmethod
-    def detect_credit_card_width_px(img):
-        gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+    def find_card_candidates(gray, min_area: float):
+        """
+        Candidate card rectangles in a grayscale image, as an (N, 5) array of
+        (cx, cy, w, h, angle) with MIN_ASPECT < aspect < MAX_ASPECT and
+        w * h > min_area.
+        """
         blur = cv2.GaussianBlur(gray, (5, 5), 0)
         edges = cv2.Canny(blur, 50, 150)
 
         contours, _ = cv2.findContours(
             edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
         )
+        if not contours:
+            return np.empty((0, 5), dtype=np.float32)
+
+        # Axis-aligned boxes of every contour in one pass; a rotated rect's
+        # area never exceeds its bounding box, so small boxes can be dropped
+        # before calling minAreaRect
+        lengths = np.fromiter((len(c) for c in contours), dtype=np.int64, count=len(contours))
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        flat = np.concatenate(contours).reshape(-1, 2)
+        lo = np.minimum.reduceat(flat, starts)
+        hi = np.maximum.reduceat(flat, starts)
+        box_area = (hi - lo).prod(axis=1).astype(np.float64)
+        survivors = np.flatnonzero(box_area > min_area)
+        if survivors.size == 0:
+            return np.empty((0, 5), dtype=np.float32)
+
+        rects = np.array(
+            [(*rect[0], *rect[1], rect[2]) for rect in (cv2.minAreaRect(contours[i]) for i in survivors)],
+            dtype=np.float32
+        )
+        w, h = rects[:, 2], rects[:, 3]
+        long_side, short_side = np.maximum(w, h), np.minimum(w, h)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            aspect = long_side / short_side
+
+        keep = (
+            (short_side > 0)
+            & (aspect > CreditCardMeasurementService.MIN_ASPECT)
+            & (aspect < CreditCardMeasurementService.MAX_ASPECT)
+            & (w * h > min_area)
+        )
+        return rects[keep]
 
-        best_width = None
-
-        for cnt in contours:
-            rect = cv2.minAreaRect(cnt)
-            (w, h) = rect[1]
-
-            if w == 0 or h == 0:
-                continue
-
-            aspect_ratio = max(w, h) / min(w, h)
-            area = w * h
-
-            # Credit card constraints
-            if 1.5 < aspect_ratio < 1.7 and area > 5000:
-                width_px = max(w, h)
-                if best_width is None or width_px > best_width:
-                    best_width = width_px
+    @staticmethod
+    def detect_credit_card_width_px(img, gray=None):
+        """Full-frame search: width in pixels of the widest card candidate."""
+        if gray is None:
+            gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
 
-        if best_width is None:
+        rects = CreditCardMeasurementService.find_card_candidates(gray, CreditCardMeasurementService.MIN_AREA)
+        if len(rects) == 0:
             raise Exception("Credit card not detected. Ensure full card visibility.")
 
-        return best_width
+        return float(np.maximum(rects[:, 2], rects[:, 3]).max())
 
-    # -----------------------------
-    # FACE SHAPE CLASSIFICATION
-    # -----------------------------
     @staticmethod
-    def classify_face_shape(width, height, chin_width):
-        ratio = width / height
-
-        if ratio > 0.9:
-            return "round"
-        elif 0.85 <= ratio <= 0.9:
-            return "square"
-        elif 0.75 <= ratio < 0.85:
-            return "oval"
-        elif chin_width < width * 0.7:
-            return "heart"
-        else:
-            return "rectangle"
+    def search_roi(points, size):
+        """
+        Region around the face and below the chin where a held card is
+        expected, clamped to the image; None when nothing of it is inside.
+        """
+        w, h = size
+        (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+        face_w, face_h = x1 - x0, y1 - y0
+        x0, x1 = np.clip([x0 - face_w, x1 + face_w], 0, w).astype(int)
+        y0, y1 = np.clip([y0 - 0.5 * face_h, y1 + 1.5 * face_h], 0, h).astype(int)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return int(x0), int(y0), int(x1), int(y1)
+
+    @staticmethod
+    def detect_card_width(image: bytes | DecodedImage, points=None) -> float:
+        """
+        Card width in full-resolution pixels.
+
+        Searches at the pyramid scale whose short side is >= SEARCH_MIN_SIDE,
+        then re-measures the widest candidate at full resolution inside its
+        box. With landmark `points` the face/chin ROI is searched first; its
+        card is used only if the full-resolution check confirms it, else the
+        whole frame is searched.
+        """
+        svc = CreditCardMeasurementService
+        decoded = as_decoded(image)
+        full_w, full_h = decoded.size
+        factor = 2 ** decoded.level_for(svc.SEARCH_MIN_SIDE)
+        gray = decoded.gray
+
+        def search(x0, y0, x1, y1):
+            """(coarse width, refined width or None) of the widest card in the region."""
+            # Downscale only the region searched (grayscale, integer factor)
+            region = gray[y0:y1, x0:x1]
+            small = cv2.resize(
+                region,
+                (max(region.shape[1] // factor, 1), max(region.shape[0] // factor, 1)),
+                interpolation=cv2.INTER_AREA
+            )
+            sx, sy = region.shape[1] / small.shape[1], region.shape[0] / small.shape[0]
+            rects = svc.find_card_candidates(small, svc.MIN_AREA / (sx * sy))
+            if len(rects) == 0:
+                return None, None
+
+            # Widest candidate, as in the full-frame search
+            best = rects[np.argmax(np.maximum(rects[:, 2], rects[:, 3]))]
+            box = cv2.boxPoints(((best[0], best[1]), (best[2], best[3]), best[4]))
+            box[:, 0] = box[:, 0] * sx + x0
+            box[:, 1] = box[:, 1] * sy + y0
+            coarse_width = max(best[2], best[3]) * (sx + sy) / 2
+
+            # Refine at full resolution, only inside the winning box (+ margin)
+            pad = int(max(sx, sy) * 4) + int(0.05 * coarse_width)
+            bx0, by0 = np.floor(box.min(axis=0)).astype(int) - pad
+            bx1, by1 = np.ceil(box.max(axis=0)).astype(int) + pad
+            bx0, by0 = max(bx0, 0), max(by0, 0)
+            bx1, by1 = min(bx1, full_w), min(by1, full_h)
+
+            refined = svc.find_card_candidates(gray[by0:by1, bx0:bx1], svc.MIN_AREA)
+            if len(refined) == 0:
+                return float(coarse_width), None
+            return float(coarse_width), float(np.maximum(refined[:, 2], refined[:, 3]).max())
+
+        roi = svc.search_roi(points, (full_w, full_h)) if points is not None else None
+        if roi is not None:
+            _, width = search(*roi)
+            if width is not None:
+                return width
+
+        coarse_width, width = search(0, 0, full_w, full_h)
+        if coarse_width is None:
+            raise Exception("Credit card not detected. Ensure full card visibility.")
+        return width if width is not None else coarse_width
 
     # -----------------------------
     # MAIN PROCESS
     # -----------------------------
     @staticmethod
-    def process(image_bytes: bytes):
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        img = np.array(image)
-        h, w, _ = img.shape
-
-        # ---- Credit card width ----
-        card_width_px = CreditCardMeasurementService.detect_credit_card_width_px(img)
-        mm_per_pixel = CreditCardMeasurementService.CARD_WIDTH_MM / card_width_px
-
-        # ---- Face landmarks ----
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=img)
-        result = CreditCardMeasurementService._detector.detect(mp_image)
+    def process(image: bytes | DecodedImage):
+        decoded = as_decoded(image)
+        w, h = decoded.size
+
+        # ---- Face landmarks (also bound the card search) ----
+        mp_image = decoded.mp_image
+        with face_landmarker_pool().detector() as detector:
+            result = detector.detect(mp_image)
         
         if not result.face_landmarks:
+            # A missing card is reported first, as the full-frame search did
+            CreditCardMeasurementService.detect_card_width(decoded)
             raise Exception("No face detected")
 
-        face = result.face_landmarks[0]
-        points = [(int(l.x * w), int(l.y * h)) for l in face]
-
-        # ---- Core points ----
-        left_eye = points[468]
-        right_eye = points[473]
-        nose = points[1]
-
-        # ---- PD ----
-        pd_px = CreditCardMeasurementService._dist(left_eye, right_eye)
-        pd_mm = pd_px * mm_per_pixel
-
-        pd_left = CreditCardMeasurementService._dist(left_eye, nose) * mm_per_pixel
-        pd_right = CreditCardMeasurementService._dist(right_eye, nose) * mm_per_pixel
+        points = face_geometry.landmarks_to_array(result.face_landmarks[0], w, h)
 
-        # ---- Face dimensions ----
-        jaw_left = points[234]
-        jaw_right = points[454]
-        chin = points[152]
-        forehead = points[10]
-
-        face_width_mm = CreditCardMeasurementService._dist(jaw_left, jaw_right) * mm_per_pixel
-        face_height_mm = CreditCardMeasurementService._dist(chin, forehead) * mm_per_pixel
-
-        chin_width_mm = CreditCardMeasurementService._dist(points[132], points[361]) * mm_per_pixel
+        # ---- Credit card width ----
+        card_width_px = CreditCardMeasurementService.detect_card_width(decoded, points)
+        return CreditCardMeasurementService.measure_points(points, card_width_px)
 
-        face_shape = CreditCardMeasurementService.classify_face_shape(
-            face_width_mm,
-            face_height_mm,
-            chin_width_mm
-        )
+    @staticmethod
+    def measure_points(points, card_width_px: float):
+        """Measurements from landmark points, scaled by the detected card width."""
+        mm_per_pixel = CreditCardMeasurementService.CARD_WIDTH_MM / card_width_px
+        m = face_geometry.measure(points, mm_per_pixel=mm_per_pixel, narrow_chin_heart=True)
 
         return {
             "scale": {
@@ -135,13 +188,13 @@ class CreditCardMeasurementService:
                 "mm_per_pixel": round(mm_per_pixel, 4)
             },
             "mm": {
-                "pd": round(pd_mm, 1),
-                "pd_left": round(pd_left, 1),
-                "pd_right": round(pd_right, 1),
-                "nose_left": round(pd_left, 1),
-                "nose_right": round(pd_right, 1),
-                "face_width": round(face_width_mm, 1),
-                "face_height": round(face_height_mm, 1)
+                "pd": round(m.pd, 1),
+                "pd_left": round(m.left_eye_nose, 1),
+                "pd_right": round(m.right_eye_nose, 1),
+                "nose_left": round(m.left_eye_nose, 1),
+                "nose_right": round(m.right_eye_nose, 1),
+                "face_width": round(m.face_width, 1),
+                "face_height": round(m.face_height, 1)
             },
-            "face_shape": face_shape
+            "face_shape": m.face_shape
         }
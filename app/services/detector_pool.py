@@ -0,0 +1,113 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+
+class DetectorPoolTimeout(Exception):
+    pass
+
+
+class DetectorPool:
+    """
+    Fixed-size pool of detector instances (e.g. MediaPipe FaceLandmarker).
+
+    A detector is used by one thread at a time: callers check one out,
+    run inference, and check it back in. Instances are created on demand
+    up to `size`; once all are busy, callers wait up to `timeout` seconds.
+    """
+
+    def __init__(self, name: str, factory, size: int, timeout: float = 10.0):
+        if size < 1:
+            raise ValueError("Detector pool size must be >= 1")
+
+        self.name = name
+        self.size = size
+        self.timeout = timeout
+
+        self._factory = factory
+        self._idle = queue.LifoQueue()  # LIFO keeps hot instances in use
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._waits = 0
+        self._timeouts = 0
+
+    def _try_create(self):
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+
+        try:
+            return self._factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def prefill(self, count: int | None = None):
+        """Create up to `count` (default: all) instances ahead of traffic."""
+        target = self.size if count is None else min(count, self.size)
+        while self._created < target:
+            detector = self._try_create()
+            if detector is None:
+                break
+            self._idle.put(detector)
+
+    def checkout(self, timeout: float | None = None):
+        try:
+            detector = self._idle.get_nowait()
+        except queue.Empty:
+            detector = self._try_create()
+
+            if detector is None:
+                with self._lock:
+                    self._waits += 1
+                wait = self.timeout if timeout is None else timeout
+                try:
+                    detector = self._idle.get(timeout=wait)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise DetectorPoolTimeout(
+                        f"No {self.name} detector available after {wait}s"
+                    )
+
+        with self._lock:
+            self._in_use += 1
+        return detector
+
+    def checkin(self, detector):
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(detector)
+
+    @contextmanager
+    def detector(self, timeout: float | None = None):
+        detector = self.checkout(timeout)
+        try:
+            yield detector
+        finally:
+            self.checkin(detector)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "waits": self._waits,
+                "timeouts": self._timeouts
+            }
+
+    def close(self):
+        while True:
+            try:
+                detector = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            close = getattr(detector, "close", None)
+            if close:
+                close()
+            with self._lock:
+                self._created -= 1
@@ -0,0 +1,210 @@
+import numpy as np
+
+# =========================
+# MEDIAPIPE FACE LANDMARKER (478 points) INDICES
+# =========================
+LEFT_IRIS_CENTER = 468
+RIGHT_IRIS_CENTER = 473
+NOSE_TIP = 1
+NOSE_BRIDGE = 168
+JAW_LEFT = 234
+JAW_RIGHT = 454
+CHIN = 152
+FOREHEAD = 10
+
+# Index pairs measured in one vectorized pass; column order = PAIR_NAMES
+PAIR_NAMES = (
+    "face_width",        # jaw left - jaw right
+    "face_height",       # chin - forehead
+    "left_iris",         # left iris horizontal diameter
+    "right_iris",        # right iris horizontal diameter
+    "pd",                # iris center - iris center
+    "left_eye_nose",     # left iris center - nose tip
+    "right_eye_nose",    # right iris center - nose tip
+    "nose_bridge_left",  # nose tip - left nostril
+    "nose_bridge_right", # nose tip - right nostril
+    "chin_width",        # lower jaw left - lower jaw right
+)
+PAIRS = np.array([
+    [JAW_LEFT, JAW_RIGHT],
+    [CHIN, FOREHEAD],
+    [474, 476],
+    [469, 471],
+    [LEFT_IRIS_CENTER, RIGHT_IRIS_CENTER],
+    [LEFT_IRIS_CENTER, NOSE_TIP],
+    [RIGHT_IRIS_CENTER, NOSE_TIP],
+    [NOSE_TIP, 94],
+    [NOSE_TIP, 331],
+    [132, 361],
+], dtype=np.intp)
+_COL = {name: i for i, name in enumerate(PAIR_NAMES)}
+
+# Reference iris diameters (mm) by face size class
+IRIS_MM = {"small": 10.5, "medium": 11.7, "large": 12.5}
+
+
+def landmarks_to_array(face_landmarks, width: int, height: int) -> np.ndarray:
+    """
+    MediaPipe NormalizedLandmark list -> (N, 2) float32 pixel coordinates,
+    truncated to whole pixels like the original int(l.x * w) so the mm
+    values match what the endpoints have always returned.
+    """
+    points = np.array([(l.x, l.y) for l in face_landmarks], dtype=np.float64)
+    points *= (width, height)
+    return np.trunc(points).astype(np.float32)
+
+
+def pair_distances(points: np.ndarray, pairs: np.ndarray = PAIRS) -> np.ndarray:
+    """
+    Euclidean distance for every index pair.
+    points: (..., N, 2)  ->  (..., len(pairs))
+    """
+    delta = points[..., pairs[:, 0], :] - points[..., pairs[:, 1], :]
+    return np.sqrt(np.einsum("...kd,...kd->...k", delta, delta))
+
+
+def classify_face_class(face_width_px):
+    return np.select(
+        [face_width_px < 120, face_width_px < 160],
+        ["small", "medium"],
+        "large"
+    )
+
+
+def classify_face_shape(width, height, chin_width, narrow_chin_heart: bool = False):
+    """
+    Face shape from the width / height ratio. Long faces (ratio < 0.75) are
+    "rectangle"; with narrow_chin_heart (the credit-card endpoint's rule)
+    a long face whose chin is < 70% of its width is "heart" instead.
+    """
+    ratio = np.asarray(width) / np.asarray(height)
+    heart = np.asarray(chin_width) < np.asarray(width) * 0.7 if narrow_chin_heart else False
+    return np.select(
+        [ratio > 0.90, ratio >= 0.85, ratio >= 0.75, heart],
+        ["round", "square", "oval", "heart"],
+        "rectangle"
+    )
+
+
+class FaceMeasurement:
+    """
+    Measurements for one face (Python scalars) or a stack of faces
+    (1-D arrays, one entry per face). Lengths are in mm.
+    """
+    __slots__ = (
+        "mm_per_pixel", "iris_diameter_px", "face_width_px", "face_class",
+        "pd", "pd_horizontal", "left_eye_nose", "right_eye_nose",
+        "face_width", "face_height", "chin_width",
+        "nose_bridge_left", "nose_bridge_right", "face_shape",
+    )
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values[name])
+
+    @property
+    def face_ratio(self):
+        return self.face_width / self.face_height
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def measure(points: np.ndarray, mm_per_pixel=None, narrow_chin_heart: bool = False) -> FaceMeasurement:
+    """
+    points: (478, 2) for one face or (F, 478, 2) for a stack.
+
+    With mm_per_pixel=None the scale comes from the iris diameter, using a
+    reference size picked from the face width class. Otherwise the given
+    scale (e.g. from a credit card; scalar or per-face array) is used.
+    narrow_chin_heart selects the face-shape rule (see classify_face_shape).
+    """
+    points = np.asarray(points, dtype=np.float64)
+    single = points.ndim == 2
+
+    d = pair_distances(points)
+    face_width_px = d[..., _COL["face_width"]]
+    face_class = classify_face_class(face_width_px)
+    iris_diameter_px = (d[..., _COL["left_iris"]] + d[..., _COL["right_iris"]]) / 2
+
+    if mm_per_pixel is None:
+        invalid = iris_diameter_px <= 0
+        if single and invalid:
+            raise Exception("Invalid iris detection")
+        iris_diameter_px = np.where(invalid, np.nan, iris_diameter_px)  # stacks: NaN row, not an error
+        iris_mm = np.select(
+            [face_class == "small", face_class == "medium"],
+            [IRIS_MM["small"], IRIS_MM["medium"]],
+            IRIS_MM["large"]
+        )
+        mm_per_pixel = iris_mm / iris_diameter_px
+    mm_per_pixel = np.asarray(mm_per_pixel, dtype=np.float64)
+
+    mm = d * mm_per_pixel[..., None]
+    pd_horizontal = np.abs(
+        points[..., LEFT_IRIS_CENTER, 0] - points[..., RIGHT_IRIS_CENTER, 0]
+    ) * mm_per_pixel
+
+    face_width = mm[..., _COL["face_width"]]
+    face_height = mm[..., _COL["face_height"]]
+    chin_width = mm[..., _COL["chin_width"]]
+
+    values = {
+        "mm_per_pixel": mm_per_pixel,
+        "iris_diameter_px": iris_diameter_px,
+        "face_width_px": face_width_px,
+        "face_class": face_class,
+        "pd": mm[..., _COL["pd"]],
+        "pd_horizontal": pd_horizontal,
+        "left_eye_nose": mm[..., _COL["left_eye_nose"]],
+        "right_eye_nose": mm[..., _COL["right_eye_nose"]],
+        "face_width": face_width,
+        "face_height": face_height,
+        "chin_width": chin_width,
+        "nose_bridge_left": mm[..., _COL["nose_bridge_left"]],
+        "nose_bridge_right": mm[..., _COL["nose_bridge_right"]],
+        "face_shape": classify_face_shape(face_width, face_height, chin_width, narrow_chin_heart),
+    }
+
+    if single:
+        values = {name: np.asarray(value).item() for name, value in values.items()}
+    return FaceMeasurement(**values)
+
+
+# =========================
+# ROBUST AGGREGATION (several photos of one face)
+# =========================
+MAD_SCALE = 1.4826  # MAD -> standard deviation for normal data
+_LABELS = ("face_class", "face_shape")
+
+
+def mad_inliers(values: np.ndarray, k: float = 3.0) -> np.ndarray:
+    """Mask of values within k robust standard deviations (median/MAD) of the median."""
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.isfinite(values)
+    if valid.sum() < 3:
+        return valid
+    median = np.median(values[valid])
+    mad = np.median(np.abs(values[valid] - median)) * MAD_SCALE
+    if mad == 0:
+        return valid & np.isclose(values, median)
+    return valid & (np.abs(values - median) <= k * mad)
+
+
+def aggregate(stack: FaceMeasurement, k: float = 3.0) -> tuple[FaceMeasurement, np.ndarray]:
+    """
+    One measurement from a stack: faces whose PD or face width is an
+    outlier (median/MAD) are dropped, the rest are combined by median.
+    Returns (measurement, inlier mask).
+    """
+    inliers = mad_inliers(stack.pd_horizontal, k) & mad_inliers(stack.face_width, k)
+    if not inliers.any():
+        raise Exception("No consistent measurement across images")
+
+    values = {
+        name: float(np.median(np.asarray(getattr(stack, name))[inliers]))
+        for name in FaceMeasurement.__slots__ if name not in _LABELS
+    }
+    values["face_class"] = str(classify_face_class(values["face_width_px"]))
+    values["face_shape"] = str(classify_face_shape(values["face_width"], values["face_height"], values["chin_width"]))
+    return FaceMeasurement(**values), inliers
@@ -1,6 +1,8 @@
+import io
 import os
 import uuid
 from datetime import timedelta
+from app.utils.executors import run_io
 from app.utils.settings import settings
 
 os.environ.setdefault(
@@ -27,26 +29,51 @@ CONTENT_TYPES = {
 # =========================
 _client = None
 
+def _build_http():
+    """
+    One AuthorizedSession with a connection pool sized for the io executor,
+    so concurrent uploads reuse TLS connections instead of reconnecting.
+    """
+    import google.auth
+    from google.auth.transport.requests import AuthorizedSession
+    from requests.adapters import HTTPAdapter
+
+    credentials, _ = google.auth.default(
+        scopes=["https://www.googleapis.com/auth/cloud-platform"]
+    )
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(
+        pool_connections=settings.GCS_HTTP_POOL_SIZE,
+        pool_maxsize=settings.GCS_HTTP_POOL_SIZE
+    )
+    session.mount("https://", adapter)
+    return credentials, session
+
 def _get_client():
     global _client
     if _client is None:
-        _client = storage.Client(project=settings.GCP_PROJECT_ID)
+        credentials, session = _build_http()
+        _client = storage.Client(
+            project=settings.GCP_PROJECT_ID,
+            credentials=credentials,
+            _http=session
+        )
     return _client
 
-def _get_bucket():
+def get_bucket():
     return _get_client().bucket(BUCKET_NAME, user_project=settings.GCP_PROJECT_ID)
 
 # =========================
 # UPLOAD FUNCTION
 # =========================
-def upload_image_and_get_url(
+def upload_image(
     file_bytes: bytes,
     guest_id: str,
     session_id: str,
     stage: str,
-    ext: str = "jpg",
-    expiry_minutes: int = 60
+    ext: str = "jpg"
 ):
+    """Upload only. Store the returned bucket_path; sign on read (signed_url_service)."""
     # Normalize extension
     ext = ext.lower().replace(".", "")
     if ext not in CONTENT_TYPES:
@@ -56,23 +83,68 @@ def upload_image_and_get_url(
     blob_path = f"{BASE_PATH}/{guest_id}/{session_id}/{stage}/{filename}"
     
     # Create the blob with user_project automatically
-    blob = _get_bucket().blob(blob_path)
+    blob = get_bucket().blob(blob_path)
 
-    # Upload image
-    blob.upload_from_string(
-        file_bytes,
-        content_type=CONTENT_TYPES[ext]
-    )
+    # Upload image: single multipart request for typical photos,
+    # chunked resumable upload for large files
+    if len(file_bytes) > settings.GCS_RESUMABLE_THRESHOLD:
+        blob.chunk_size = settings.GCS_CHUNK_SIZE
+        blob.upload_from_file(
+            io.BytesIO(file_bytes),
+            content_type=CONTENT_TYPES[ext],
+            size=len(file_bytes)
+        )
+    else:
+        blob.upload_from_string(
+            file_bytes,
+            content_type=CONTENT_TYPES[ext]
+        )
+
+    return {
+        "bucket_name": BUCKET_NAME,
+        "bucket_path": blob_path
+    }
+
+
+def upload_image_and_get_url(
+    file_bytes: bytes,
+    guest_id: str,
+    session_id: str,
+    stage: str,
+    ext: str = "jpg",
+    expiry_minutes: int = 60
+):
+    upload = upload_image(file_bytes, guest_id, session_id, stage, ext)
 
     # Generate signed URL
-    signed_url = blob.generate_signed_url(
+    signed_url = get_bucket().blob(upload["bucket_path"]).generate_signed_url(
         version="v4",
         expiration=timedelta(minutes=expiry_minutes),
         method="GET"
     )
 
     return {
-        "bucket_name": BUCKET_NAME,
-        "bucket_path": blob_path,
+        **upload,
         "signed_url": signed_url
     }
+
+
+async def upload_image_async(
+    file_bytes: bytes,
+    guest_id: str,
+    session_id: str,
+    stage: str,
+    ext: str = "jpg"
+):
+    """
+    Awaitable upload on the io executor. Routes gather it with inference
+    so latency is max(upload, inference) instead of the sum.
+    """
+    return await run_io(
+        upload_image,
+        file_bytes=file_bytes,
+        guest_id=guest_id,
+        session_id=session_id,
+        stage=stage,
+        ext=ext
+    )
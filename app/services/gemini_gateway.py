@@ -0,0 +1,473 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+import httpx
+from google import genai
+from google.genai import errors, types
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded
+from app.utils.settings import settings
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+MIN_ATTEMPT_SECONDS = 1.0  # don't start a retry with less budget than this
+
+
+class GeminiUnavailableError(Exception):
+    pass
+
+
+def _parse_model_limits(spec: str) -> dict:
+    """'gemini-2.5-flash-image=8,gemini-1.5-flash=16' -> {model: limit}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, limit = item.partition("=")
+        limits[model.strip()] = int(limit)
+    return limits
+
+
+def _is_retryable(e: Exception) -> bool:
+    if isinstance(e, errors.APIError):
+        return e.code in RETRYABLE_STATUS
+    return isinstance(e, httpx.TransportError)
+
+
+class CircuitBreaker:
+    """
+    Opens when the error rate over the last `window` calls reaches
+    `error_rate`; after `cooldown` seconds one probe call is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, window: int, min_calls: int, error_rate: float, cooldown: float):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+        self._probing = False
+        self._trips = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record(self, ok: bool):
+        with self._lock:
+            if self._probing:
+                self._probing = False
+                if ok:
+                    self._opened_at = None
+                else:
+                    self._opened_at = time.monotonic()
+                return
+
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.error_rate:
+                self._opened_at = time.monotonic()
+                self._trips += 1
+                self._outcomes.clear()
+
+    def release(self):
+        """Call abandoned without an outcome (e.g. client went away)."""
+        with self._lock:
+            self._probing = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "trips": self._trips}
+
+
+class GeminiGateway:
+    """
+    Shared async access to Gemini.
+
+    - one pooled httpx.AsyncClient for every call, whatever the API key
+    - a global concurrency semaphore plus one per model, so many calls can
+      be in flight per worker without exhausting sockets or quota
+    - request / response byte accounting
+    - every call runs inside the request deadline (utils/deadline.py):
+      jittered retries only while budget remains, an optional hedged
+      second request after the observed p95, and a per-model circuit
+      breaker that fails fast with GeminiUnavailableError
+    - images go in and come out as raw bytes (Part.from_bytes / inline_data),
+      never base64-encoded by us
+    """
+
+    def __init__(self, max_concurrency: int, default_model_concurrency: int, model_limits: dict, max_connections: int):
+        self.max_concurrency = max_concurrency
+        self.default_model_concurrency = default_model_concurrency
+        self.model_limits = model_limits
+        self.max_connections = max_connections
+
+        self._http = None
+        self._clients = {}       # api_key -> genai.Client
+        self._global = None
+        self._per_model = {}
+        self._lock = threading.Lock()
+
+        self._in_flight = 0
+        self._requests = 0
+        self._errors = 0
+        self._bytes_sent = 0
+        self._bytes_received = 0
+        self._models = {}        # model -> {"requests", "bytes_sent", "bytes_received"}
+        self._retries = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+        self._timeouts = 0
+        self._rejected = 0
+        self._latencies = {}     # model -> deque of successful attempt latencies
+        self._breakers = {}      # model -> CircuitBreaker
+
+    def _get_http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                timeout=httpx.Timeout(None, connect=10.0)
+            )
+        return self._http
+
+    def client(self, api_key: str | None = None):
+        api_key = api_key or settings.GEMINI_API_KEY or settings.GOOGLE_API_KEY
+        if not api_key:
+            raise Exception("Gemini API key not configured")
+
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is None:
+                client = self._clients[api_key] = genai.Client(
+                    api_key=api_key,
+                    http_options=types.HttpOptions(httpx_async_client=self._get_http())
+                )
+        return client.aio
+
+    def _semaphores(self, model: str):
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.max_concurrency)
+        semaphore = self._per_model.get(model)
+        if semaphore is None:
+            limit = self.model_limits.get(model, self.default_model_concurrency)
+            semaphore = self._per_model[model] = asyncio.Semaphore(limit)
+        return self._global, semaphore
+
+    # =========================
+    # PARTS
+    # =========================
+    @staticmethod
+    def image_part(data: bytes, mime_type: str) -> types.Part:
+        return types.Part.from_bytes(data=data, mime_type=mime_type)
+
+    @staticmethod
+    def _payload_bytes(contents) -> int:
+        total = 0
+        for item in contents if isinstance(contents, list) else [contents]:
+            if isinstance(item, str):
+                total += len(item.encode())
+            elif isinstance(item, types.Part):
+                if item.inline_data is not None and item.inline_data.data:
+                    total += len(item.inline_data.data)
+                if item.text:
+                    total += len(item.text.encode())
+        return total
+
+    @staticmethod
+    def iter_parts(response):
+        for candidate in response.candidates or []:
+            if candidate.content is None:
+                continue
+            for part in candidate.content.parts or []:
+                yield part
+
+    @staticmethod
+    def first_image(response) -> bytes | None:
+        for part in GeminiGateway.iter_parts(response):
+            if part.inline_data is not None and part.inline_data.data:
+                return part.inline_data.data
+        return None
+
+    def _response_bytes(self, response) -> int:
+        total = 0
+        for part in self.iter_parts(response):
+            if part.inline_data is not None and part.inline_data.data:
+                total += len(part.inline_data.data)
+            if part.text:
+                total += len(part.text.encode())
+        return total
+
+    def _account(self, model: str, sent: int, received: int, ok: bool):
+        with self._lock:
+            self._requests += 1
+            self._errors += 0 if ok else 1
+            self._bytes_sent += sent
+            self._bytes_received += received
+            counts = self._models.setdefault(model, {"requests": 0, "bytes_sent": 0, "bytes_received": 0})
+            counts["requests"] += 1
+            counts["bytes_sent"] += sent
+            counts["bytes_received"] += received
+
+    # =========================
+    # CALLS
+    # =========================
+    def _breaker(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = self._breakers[model] = CircuitBreaker(
+                    window=settings.GEMINI_BREAKER_WINDOW,
+                    min_calls=settings.GEMINI_BREAKER_MIN_CALLS,
+                    error_rate=settings.GEMINI_BREAKER_ERROR_RATE,
+                    cooldown=settings.GEMINI_BREAKER_COOLDOWN_SECONDS
+                )
+        return breaker
+
+    def _hedge_delay(self, model: str) -> float | None:
+        if not settings.GEMINI_HEDGE_ENABLED:
+            return None
+        samples = self._latencies.get(model)
+        if not samples or len(samples) < settings.GEMINI_HEDGE_MIN_SAMPLES:
+            return None
+        # Copy first: /metrics reads this from a threadpool thread while the loop appends
+        ordered = sorted(list(samples))
+        return ordered[int(settings.GEMINI_HEDGE_QUANTILE * (len(ordered) - 1))]
+
+    @staticmethod
+    def _with_timeout(config, timeout: float):
+        """Pass the remaining budget down to the HTTP request itself."""
+        config = config.model_copy() if config is not None else types.GenerateContentConfig()
+        http_options = config.http_options.model_copy() if config.http_options else types.HttpOptions()
+        http_options.timeout = max(1, int(timeout * 1000))
+        config.http_options = http_options
+        return config
+
+    async def _attempt(self, client, model: str, contents, config, sent: int, until: float):
+        timeout = until - time.monotonic()
+        if timeout <= 0:
+            raise DeadlineExceeded("Gemini call exceeded the request deadline")
+
+        async def call():
+            global_sem, model_sem = self._semaphores(model)
+            async with global_sem, model_sem:
+                self._in_flight += 1
+                started = time.monotonic()
+                try:
+                    response = await client.models.generate_content(
+                        model=model,
+                        contents=contents,
+                        config=self._with_timeout(config, until - time.monotonic())
+                    )
+                except Exception:
+                    self._account(model, sent, 0, ok=False)
+                    raise
+                finally:
+                    self._in_flight -= 1
+
+            self._latencies.setdefault(model, deque(maxlen=200)).append(time.monotonic() - started)
+            self._account(model, sent, self._response_bytes(response), ok=True)
+            return response
+
+        try:
+            return await asyncio.wait_for(call(), timeout)
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            if until - time.monotonic() > MIN_ATTEMPT_SECONDS:
+                raise
+            self._timeouts += 1
+            raise DeadlineExceeded("Gemini call exceeded the request deadline")
+
+    async def _hedged(self, client, model: str, contents, config, sent: int, until: float):
+        first = asyncio.ensure_future(self._attempt(client, model, contents, config, sent, until))
+        tasks = {first}
+        try:
+            delay = self._hedge_delay(model)
+            if delay is None or until - time.monotonic() <= delay + MIN_ATTEMPT_SECONDS:
+                return await first
+
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return first.result()
+
+            # Slower than p95: race a second identical request against it
+            self._hedges += 1
+            second = asyncio.ensure_future(self._attempt(client, model, contents, config, sent, until))
+            tasks.add(second)
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self._hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def generate_content(self, model: str, contents, config=None, api_key: str | None = None):
+        breaker = self._breaker(model)
+        if not breaker.allow():
+            with self._lock:
+                self._rejected += 1
+            raise GeminiUnavailableError(f"Gemini temporarily unavailable ({model})")
+
+        client = self.client(api_key)
+        sent = self._payload_bytes(contents)
+
+        budget = deadline.remaining()
+        if budget is None:
+            budget = settings.GEMINI_TIMEOUT_SECONDS
+        until = time.monotonic() + min(budget, settings.GEMINI_TIMEOUT_SECONDS)
+
+        recorded = False
+        try:
+            attempt = 0
+            while True:
+                try:
+                    response = await self._hedged(client, model, contents, config, sent, until)
+                except Exception as e:
+                    transient = _is_retryable(e) or isinstance(e, (asyncio.TimeoutError, DeadlineExceeded))
+                    if not transient or isinstance(e, DeadlineExceeded) or attempt >= settings.GEMINI_MAX_RETRIES:
+                        breaker.record(not transient)
+                        recorded = True
+                        raise
+
+                    # Full jitter; only retry if a useful attempt still fits the budget
+                    backoff = random.uniform(0, min(
+                        settings.GEMINI_RETRY_MAX_MS,
+                        settings.GEMINI_RETRY_BASE_MS * 2 ** attempt
+                    )) / 1000
+                    if time.monotonic() + backoff + MIN_ATTEMPT_SECONDS >= until:
+                        breaker.record(False)
+                        recorded = True
+                        raise
+
+                    attempt += 1
+                    with self._lock:
+                        self._retries += 1
+                    await asyncio.sleep(backoff)
+                    continue
+
+                breaker.record(True)
+                recorded = True
+                return response
+        finally:
+            if not recorded:
+                breaker.release()
+
+    async def stream_parts(self, model: str, contents, config=None, api_key: str | None = None):
+        """
+        Yield response parts as they arrive: (mime_type, bytes) for binary
+        parts, ("text/plain", str) for text. Not retried or hedged (parts
+        may already have been consumed), but bounded by the deadline and
+        gated by the circuit breaker. A consumer that stops early (break,
+        cancellation) leaves no outcome: the breaker slot is released.
+        """
+        breaker = self._breaker(model)
+        if not breaker.allow():
+            with self._lock:
+                self._rejected += 1
+            raise GeminiUnavailableError(f"Gemini temporarily unavailable ({model})")
+
+        sent = self._payload_bytes(contents)
+        received = 0
+        budget = deadline.remaining()
+        if budget is None:
+            budget = settings.GEMINI_TIMEOUT_SECONDS
+        until = time.monotonic() + min(budget, settings.GEMINI_TIMEOUT_SECONDS)
+
+        healthy = None   # None: abandoned by the consumer
+        try:
+            client = self.client(api_key)
+            global_sem, model_sem = self._semaphores(model)
+            async with global_sem, model_sem:
+                self._in_flight += 1
+                try:
+                    stream = await asyncio.wait_for(
+                        client.models.generate_content_stream(
+                            model=model,
+                            contents=contents,
+                            config=self._with_timeout(config, until - time.monotonic())
+                        ),
+                        until - time.monotonic()
+                    )
+                    async for chunk in stream:
+                        if time.monotonic() >= until:
+                            self._timeouts += 1
+                            raise DeadlineExceeded("Gemini call exceeded the request deadline")
+                        for part in self.iter_parts(chunk):
+                            if part.inline_data is not None and part.inline_data.data:
+                                received += len(part.inline_data.data)
+                                yield part.inline_data.mime_type, part.inline_data.data
+                            elif part.text:
+                                received += len(part.text.encode())
+                                yield "text/plain", part.text
+                finally:
+                    self._in_flight -= 1
+            healthy = True
+        except Exception as e:
+            healthy = not (_is_retryable(e) or isinstance(e, (asyncio.TimeoutError, DeadlineExceeded)))
+            self._account(model, sent, received, ok=False)
+            raise
+        finally:
+            if healthy is None:
+                breaker.release()
+            else:
+                breaker.record(healthy)
+
+        self._account(model, sent, received, ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "requests": self._requests,
+                "errors": self._errors,
+                "bytes_sent": self._bytes_sent,
+                "bytes_received": self._bytes_received,
+                "retries": self._retries,
+                "hedges": self._hedges,
+                "hedge_wins": self._hedge_wins,
+                "deadline_timeouts": self._timeouts,
+                "rejected_open_circuit": self._rejected,
+                "models": {model: dict(counts) for model, counts in self._models.items()},
+                "hedge_delay_s": {model: self._hedge_delay(model) for model in self._latencies},
+                "breakers": {model: breaker.stats() for model, breaker in self._breakers.items()}
+            }
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._clients.clear()
+
+
+gemini_gateway = GeminiGateway(
+    max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+    default_model_concurrency=settings.GEMINI_MODEL_CONCURRENCY,
+    model_limits=_parse_model_limits(settings.GEMINI_MODEL_LIMITS),
+    max_connections=settings.GEMINI_MAX_CONNECTIONS
+)
@@ -0,0 +1,142 @@
+import io
+from dataclasses import dataclass
+import numpy as np
+from PIL import Image, ImageFilter
+from app.services.iris_landmark_service import IrisLandmarkService
+from app.utils.preprocessing import DecodedImage, as_decoded
+from app.utils.settings import settings
+
+MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+# Every setting that changes what prepare_for_gemini sends
+PREP_SETTINGS = ("GEMINI_IMAGE_LONG_EDGE", "GEMINI_IMAGE_FORMAT", "GEMINI_IMAGE_QUALITY", "GEMINI_CROP_MARGIN")
+
+
+@dataclass
+class PreparedImage:
+    """What we actually send to Gemini, and where it came from."""
+    data: bytes
+    mime_type: str
+    box: tuple[int, int, int, int]   # (x0, y0, x1, y1) of the crop in the original
+    sent_size: tuple[int, int]
+    original: DecodedImage
+
+    @property
+    def cropped(self) -> bool:
+        return self.box != (0, 0, *self.original.size)
+
+    def to_original(self, x: float, y: float) -> tuple[float, float]:
+        """Normalized coords in the sent image -> normalized coords in the original."""
+        x0, y0, x1, y1 = self.box
+        w, h = self.original.size
+        return (x0 + x * (x1 - x0)) / w, (y0 + y * (y1 - y0)) / h
+
+
+def prep_version() -> str:
+    """The prep settings as "NAME=value|...", for result-cache versions and ETags."""
+    return "|".join(f"{name}={getattr(settings, name)}" for name in PREP_SETTINGS)
+
+
+def mime_type_of(image: bytes | DecodedImage) -> str:
+    return MIME_TYPES.get(as_decoded(image).format, "image/jpeg")
+
+
+def face_box(decoded: DecodedImage, margin: float, points=None) -> tuple[int, int, int, int]:
+    """
+    Landmark bounding box grown by `margin` x face size; full frame if no
+    face. Landmarks are detected only when the caller has no `points`.
+    """
+    w, h = decoded.size
+    if points is None:
+        try:
+            points = IrisLandmarkService.detect_points(decoded)
+        except Exception:
+            return 0, 0, w, h
+
+    (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+    pad_x, pad_y = (x1 - x0) * margin, (y1 - y0) * margin
+    return (
+        max(int(x0 - pad_x), 0),
+        max(int(y0 - pad_y * 1.5), 0),  # extra headroom for hair / frames
+        min(int(np.ceil(x1 + pad_x)), w),
+        min(int(np.ceil(y1 + pad_y)), h)
+    )
+
+
+def encode(image: Image.Image, fmt: str, quality: int) -> tuple[bytes, str]:
+    buffer = io.BytesIO()
+    if fmt == "webp":
+        image.save(buffer, format="WEBP", quality=quality, method=4)
+        return buffer.getvalue(), "image/webp"
+    if fmt == "png":
+        image.save(buffer, format="PNG")
+        return buffer.getvalue(), "image/png"
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue(), "image/jpeg"
+
+
+def transcode(data: bytes, mime_type: str, quality: int = 90) -> bytes:
+    """Re-encode image bytes as `mime_type` (no-op if already in that format)."""
+    if mime_type_of(data) == mime_type:
+        return data
+    fmt = {v: k for k, v in MIME_TYPES.items()}[mime_type].lower()
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    return encode(image, fmt, quality)[0]
+
+
+def prepare_for_gemini(image: bytes | DecodedImage, crop: bool = True, points=None) -> PreparedImage:
+    """
+    Crop to the face, downscale to GEMINI_IMAGE_LONG_EDGE and re-encode
+    (GEMINI_IMAGE_FORMAT). With GEMINI_IMAGE_LONG_EDGE = 0 the upload is
+    sent untouched, tagged with its real MIME type. Pass landmark `points`
+    already computed for this image to skip detecting them again.
+    """
+    decoded = as_decoded(image)
+    w, h = decoded.size
+
+    if settings.GEMINI_IMAGE_LONG_EDGE <= 0:
+        return PreparedImage(decoded.data, mime_type_of(decoded), (0, 0, w, h), (w, h), decoded)
+
+    box = face_box(decoded, settings.GEMINI_CROP_MARGIN, points) if crop else (0, 0, w, h)
+    box_w, box_h = box[2] - box[0], box[3] - box[1]
+
+    scale = min(settings.GEMINI_IMAGE_LONG_EDGE / max(box_w, box_h), 1.0)
+    size = (max(round(box_w * scale), 1), max(round(box_h * scale), 1))
+
+    region = decoded.pil.crop(box)
+    if size != region.size:
+        region = region.resize(size, Image.LANCZOS)
+
+    data, mime_type = encode(region, settings.GEMINI_IMAGE_FORMAT, settings.GEMINI_IMAGE_QUALITY)
+    if len(data) >= len(decoded.data) and not (crop and box != (0, 0, w, h)):
+        # Re-encoding didn't help (already small): send the original
+        return PreparedImage(decoded.data, mime_type_of(decoded), (0, 0, w, h), (w, h), decoded)
+
+    return PreparedImage(data, mime_type, box, size, decoded)
+
+
+def paste_back(prepared: PreparedImage, edited: bytes) -> bytes:
+    """
+    Scale Gemini's edited crop back to the crop's original size and blend
+    it into the full-resolution upload (feathered edges hide the seam).
+    Returns JPEG bytes at the original resolution.
+    """
+    original = prepared.original
+    x0, y0, x1, y1 = prepared.box
+    box_size = (x1 - x0, y1 - y0)
+
+    patch = Image.open(io.BytesIO(edited)).convert("RGB")
+    if patch.size != box_size:
+        patch = patch.resize(box_size, Image.LANCZOS)
+
+    if prepared.cropped:
+        result = original.pil.copy()
+        feather = max(min(box_size) // 40, 2)
+        mask = Image.new("L", box_size, 0)
+        mask.paste(255, (feather, feather, box_size[0] - feather, box_size[1] - feather))
+        mask = mask.filter(ImageFilter.GaussianBlur(feather / 2))
+        result.paste(patch, (x0, y0), mask)
+    else:
+        result = patch
+
+    data, _ = encode(result, "jpeg", settings.GEMINI_PASTE_QUALITY)
+    return data
@@ -1,23 +1,18 @@
-import io
 import json
-import base64
-from PIL import Image
-from google import genai
 from google.genai import types
+from app.services import face_geometry
+from app.services.gemini_gateway import GeminiUnavailableError, gemini_gateway
+from app.services.gemini_image_prep import prep_version, prepare_for_gemini
+from app.services.iris_landmark_service import IrisLandmarkService
+from app.services.result_cache import result_cache
+from app.utils.common import content_hash
+from app.utils.executors import run_cpu
+from app.utils.preprocessing import DecodedImage, as_decoded
 from app.utils.settings import settings
 
 class GeminiVTOService:
-    client = genai.Client(api_key=settings.GEMINI_API_KEY) if settings.GEMINI_API_KEY else None
-
-    @staticmethod
-    def analyze_face_for_vto(image_bytes: bytes):
-        if not GeminiVTOService.client:
-            raise Exception("Gemini API key not configured")
-
-        # Encode image to base64
-        img = Image.open(io.BytesIO(image_bytes))
-        
-        prompt = """
+    MODEL = "gemini-1.5-flash"
+    ANALYZE_PROMPT = """
         Analyze this face for virtual glasses try-on. 
         Provide the exact coordinates (x, y) for:
         1. Left pupil center
@@ -27,20 +22,81 @@ class GeminiVTOService:
         Return the result as a JSON object with keys: "left_pupil", "right_pupil", "nose_bridge".
         Coordinates should be normalized from 0.0 to 1.0 (top-left is 0,0).
         Example: {"left_pupil": {"x": 0.45, "y": 0.4}, "right_pupil": {"x": 0.55, "y": 0.4}, "nose_bridge": {"x": 0.5, "y": 0.42}}
-        """
+    """
+
+    @staticmethod
+    def cache_version() -> str:
+        """What an analysis depends on besides the input (model, prompt, prep settings)."""
+        return "|".join((GeminiVTOService.MODEL, content_hash(GeminiVTOService.ANALYZE_PROMPT.encode())[:8], prep_version()))
+
+    @staticmethod
+    async def analyze_face_for_vto(image: bytes | DecodedImage, points=None):
+        """`points`: landmarks the caller already has for this image (not redetected)."""
+        if not settings.GEMINI_API_KEY:
+            raise Exception("Gemini API key not configured")
 
-        response = GeminiVTOService.client.models.generate_content(
-            model="gemini-1.5-flash",
+        decoded = as_decoded(image)
+        # Same photo re-submitted -> reuse the earlier analysis
+        try:
+            return await result_cache.get_or_compute_async(
+                "virtual_tryon.gemini_analyze",
+                GeminiVTOService.cache_version(),
+                decoded.digest,
+                lambda: GeminiVTOService._analyze(decoded, points)
+            )
+        except GeminiUnavailableError:
+            if not settings.GEMINI_LOCAL_FALLBACK:
+                raise
+            # Circuit open: answer from MediaPipe instead (not cached)
+            return await run_cpu(GeminiVTOService._analyze_locally, decoded, points)
+
+    @staticmethod
+    def _analyze_locally(decoded: DecodedImage, points=None):
+        w, h = decoded.size
+        if points is None:
+            points = IrisLandmarkService.detect_points(decoded)
+
+        def normalized(index):
+            return {"x": round(float(points[index, 0]) / w, 4), "y": round(float(points[index, 1]) / h, 4)}
+
+        # Same convention as the Gemini prompt: "left" is the image-left pupil
+        left, right = sorted(
+            (face_geometry.LEFT_IRIS_CENTER, face_geometry.RIGHT_IRIS_CENTER),
+            key=lambda index: points[index, 0]
+        )
+        return {
+            "left_pupil": normalized(left),
+            "right_pupil": normalized(right),
+            "nose_bridge": normalized(face_geometry.NOSE_BRIDGE),
+            "source": "local"
+        }
+
+    @staticmethod
+    async def _analyze(decoded: DecodedImage, points=None):
+        # Face crop at GEMINI_IMAGE_LONG_EDGE; coordinates are mapped back below
+        prepared = await run_cpu(prepare_for_gemini, decoded, points=points)
+
+        response = await gemini_gateway.generate_content(
+            model=GeminiVTOService.MODEL,
             contents=[
-                types.Part.from_bytes(data=image_bytes, mime_type="image/jpeg"),
-                prompt
+                gemini_gateway.image_part(prepared.data, prepared.mime_type),
+                GeminiVTOService.ANALYZE_PROMPT
             ],
             config=types.GenerateContentConfig(
                 response_mime_type="application/json",
-            )
+            ),
+            api_key=settings.GEMINI_API_KEY
         )
 
         try:
-            return json.loads(response.text)
+            analysis = json.loads(response.text)
         except Exception as e:
             raise Exception(f"Failed to parse Gemini response: {str(e)}")
+
+        if prepared.cropped and isinstance(analysis, dict):
+            for point in analysis.values():
+                if isinstance(point, dict) and {"x", "y"} <= point.keys():
+                    x, y = prepared.to_original(float(point["x"]), float(point["y"]))
+                    point["x"], point["y"] = round(x, 4), round(y, 4)
+
+        return analysis
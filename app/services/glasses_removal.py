@@ -1,52 +1,63 @@
-import os
-import base64
-from google import genai
-
-def get_gemini_client():
-    api_key = os.getenv("GOOGLE_API_KEY")
-    return genai.Client(api_key=api_key)
-
-
-def png_to_base64(image_bytes: bytes) -> str:
-    """Encode image bytes to Base64 string."""
-    return base64.b64encode(image_bytes).decode("utf-8")
-
-
-def remove_glasses_service(image_bytes: bytes) -> str:
+from app.services.gemini_gateway import gemini_gateway
+from app.services.gemini_image_prep import paste_back, prep_version, prepare_for_gemini
+from app.services.result_cache import result_cache
+from app.utils.common import content_hash
+from app.utils.executors import run_cpu
+from app.utils.preprocessing import DecodedImage, as_decoded
+from app.utils.settings import settings
+
+REMOVAL_MODEL = "gemini-2.5-flash-image"
+REMOVAL_PROMPT = (
+    "Remove the eyeglasses from this face and naturally restore the eyes and eyebrows. "
+    "Preserve identity, skin texture, lighting, and facial structure."
+)
+
+
+async def remove_glasses_service(image: bytes | DecodedImage, points=None) -> bytes:
     """
     Sends image to Gemini to remove glasses.
-    Returns Base64 string directly for frontend display.
+    Results are cached by image content: this is the most expensive call we make.
+    `points`: landmarks the caller already has, so the face crop needn't redetect them.
     """
-    client = get_gemini_client()
-    base64_image = png_to_base64(image_bytes)
-
-    prompt = (
-        "Remove the eyeglasses from this face and naturally restore the eyes and eyebrows. "
-        "Preserve identity, skin texture, lighting, and facial structure."
+    decoded = as_decoded(image)
+    return await result_cache.get_or_compute_async(
+        "glasses.remove",
+        cache_version(),
+        decoded.digest,
+        lambda: _remove_glasses(decoded, points)
     )
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash-image",
-        contents=[{
-            "parts": [
-                {"text": prompt},
-                {"inlineData": {"mimeType": "image/png", "data": base64_image}}
-            ]
-        }]
+
+def cache_version() -> str:
+    """Identifies what a removal result depends on besides the input (cache keys, ETags)."""
+    return "|".join((
+        REMOVAL_MODEL,
+        content_hash(REMOVAL_PROMPT.encode())[:8],
+        prep_version(),
+        f"GEMINI_PASTE_QUALITY={settings.GEMINI_PASTE_QUALITY}"
+    ))
+
+
+async def _remove_glasses(decoded: DecodedImage, points=None) -> bytes:
+    # Send a face crop at GEMINI_IMAGE_LONG_EDGE instead of the full upload
+    prepared = await run_cpu(prepare_for_gemini, decoded, points=points)
+
+    # Raw bytes in, raw bytes out: the SDK does the only base64 step on the wire
+    response = await gemini_gateway.generate_content(
+        model=REMOVAL_MODEL,
+        contents=[
+            REMOVAL_PROMPT,
+            gemini_gateway.image_part(prepared.data, prepared.mime_type)
+        ],
+        api_key=settings.GOOGLE_API_KEY
     )
 
-    # Extract the edited image Base64
-    edited_base64 = None
-    for part in response.candidates[0].content.parts:
-        if getattr(part, "inlineData", None):
-            edited_base64 = part.inlineData.data
-            break
-        elif getattr(part, "inline_data", None):
-            edited_base64 = part.inline_data.data
-            break
-
-    if not edited_base64:
+    edited_bytes = gemini_gateway.first_image(response)
+    if not edited_bytes:
         raise Exception("Gemini did not return an edited image")
 
-    # Return Base64 string directly — do not use Pillow
-    return edited_base64
+    if settings.GEMINI_IMAGE_LONG_EDGE <= 0:
+        return edited_bytes
+
+    # Back to the original resolution, outside the crop untouched
+    return await run_cpu(paste_back, prepared, edited_bytes)
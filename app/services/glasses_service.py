@@ -1,16 +1,43 @@
-from app.glasses.detector import detector
-from PIL import Image
-import io
+from app.services.model_registry import glasses_detector, glasses_batcher
+from app.utils.preprocessing import CLASSIFIER_DECODE, CLASSIFIER_SIZE, DecodedImage, as_decoded
 from app.services.glasses_removal import remove_glasses_service
+from app.services.result_cache import result_cache
 
 class GlassesService:
 
     @staticmethod
-    def detect(image_bytes: bytes):
+    def cache_version(detector) -> str:
+        # The backend actually loaded: a failed one falls back to eager
+        return f"resnet18/{detector.backend.name}/{detector.preprocessing}/{CLASSIFIER_DECODE}"
+
+    @staticmethod
+    def detect(image: bytes | DecodedImage):
+        detector = glasses_detector()
         if detector is None:
             return {"glasses_detected": False, "confidence": 0.0}
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        result = detector.predict(image)
+
+        decoded = as_decoded(image)
+        return result_cache.get_or_compute(
+            "glasses.detect",
+            GlassesService.cache_version(detector),
+            decoded.digest,
+            lambda: GlassesService._predict(detector, decoded)
+        )
+
+    @staticmethod
+    def _predict(detector, decoded: DecodedImage):
+        # Only a ~224px view is decoded, never the full-resolution photo
+        if detector.preprocessing == "numpy":
+            tensor = detector.preprocess_array(decoded.pyramid(decoded.level_for(CLASSIFIER_SIZE)))
+        else:
+            tensor = decoded.classifier_tensor
+
+        # Concurrent requests share one forward pass when batching is on
+        batcher = glasses_batcher()
+        if batcher is not None:
+            result = batcher.predict_tensor(tensor)
+        else:
+            result = detector.predict_tensors(tensor.unsqueeze(0))[0]
 
         return {
             "glasses_detected": result["glasses_detected"],
@@ -18,5 +45,5 @@ class GlassesService:
         }
 
     @staticmethod
-    def remove_glasses(image_bytes: bytes):
-        return remove_glasses_service(image_bytes)  # raw bytes
+    async def remove_glasses(image_bytes: bytes):
+        return await remove_glasses_service(image_bytes)  # raw bytes
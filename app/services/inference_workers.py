@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from app.services import face_geometry
+from app.services.credit_card_measurement_service import CreditCardMeasurementService
+from app.services.glasses_service import GlassesService
+from app.services.iris_landmark_service import IrisLandmarkService
+from app.services.result_cache import result_cache
+from app.utils.executors import ExecutorBusyError, cpu_executor, run_cpu
+from app.utils.preprocessing import DecodedImage, as_decoded
+from app.utils.settings import settings
+from app.utils.system import shm_free
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+# =========================
+# TASKS (run in a worker process, or on the CPU thread pool when disabled)
+# Each takes a DecodedImage and returns a small result (dict or landmark array).
+# =========================
+def _landmarks(decoded: DecodedImage) -> dict:
+    points = IrisLandmarkService.detect_points(decoded)
+    return IrisLandmarkService.to_response(face_geometry.measure(points))
+
+
+def _card_width(decoded: DecodedImage) -> dict:
+    return {"card_width_px": CreditCardMeasurementService.detect_card_width(decoded)}
+
+
+TASKS = {
+    "points": IrisLandmarkService.detect_points,     # (478, 2) float32, ~4 KB
+    "landmarks": _landmarks,
+    "credit_card": CreditCardMeasurementService.process,
+    "card_width": _card_width,
+    "glasses": GlassesService.detect,
+}
+
+
+# =========================
+# WORKER PROCESS SIDE
+# =========================
+_worker_shm = None
+
+
+def _init_worker(shm_name: str, preload: bool):
+    global _worker_shm
+    # Spawned children share the parent's resource tracker, so the segment
+    # is unlinked exactly once, by the parent, on shutdown
+    _worker_shm = SharedMemory(name=shm_name)
+
+    # One inference at a time per process: keep native libraries single-threaded
+    try:
+        import cv2
+        cv2.setNumThreads(1)
+    except ImportError:
+        pass
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+    if preload:
+        from app.services.model_registry import face_landmarker_pool, glasses_detector, registry
+        face_landmarker_pool()   # registers the landmarker
+        registry.load_all()
+        glasses_detector()
+
+
+def _run_in_worker(task: str, offset: int, shape: tuple, digest: str) -> dict:
+    # Zero-copy view of the frame the parent wrote into our slot
+    rgb = np.ndarray(shape, dtype=np.uint8, buffer=_worker_shm.buf, offset=offset)
+    rgb.flags.writeable = False
+    try:
+        return TASKS[task](DecodedImage.from_rgb(rgb, digest=digest))
+    finally:
+        del rgb
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+# =========================
+# PARENT SIDE
+# =========================
+class InferenceWorkers:
+    """
+    Process pool for CPU-bound inference, free of the parent's GIL.
+
+    Decoded RGB frames go through a shared-memory ring of fixed-size
+    slots: the parent copies the decoded frame into a slot and the worker
+    wraps it in a zero-copy ndarray view, so only the task name, slot
+    offset and shape are pickled, and only the small result comes back.
+    """
+
+    def __init__(self, workers: int, slots: int, slot_bytes: int, slot_timeout: float):
+        self.workers = workers
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.slot_timeout = slot_timeout
+
+        self._shm = None
+        self._executor = None
+        self._free = None
+        self._completed = 0
+        self._fallbacks = 0
+        self._rejected = 0
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    def start(self):
+        if self.started:
+            return
+        # The segment is sparse: an undersized /dev/shm (Docker's default is
+        # 64 MB) only shows up later, as SIGBUS when a frame is written
+        size = self.slots * self.slot_bytes
+        free = shm_free()
+        if free is not None and size > free:
+            raise Exception(
+                f"Inference workers need {size // MB} MB of shared memory but /dev/shm has "
+                f"{free // MB} MB free. Give the container more (docker run --shm-size={size // MB + 64}m) "
+                f"or lower INFERENCE_SHM_SLOTS / INFERENCE_SHM_SLOT_MB."
+            )
+        self._shm = SharedMemory(create=True, size=size)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            # spawn: forking a process that already holds model / BLAS threads is unsafe
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self._shm.name, settings.MODEL_PRELOAD)
+        )
+        # Start every worker now so models load before traffic arrives
+        for _ in range(self.workers):
+            self._executor.submit(_ping)
+        logger.info("Inference workers: %d processes, %d x %d MB slots",
+                    self.workers, self.slots, self.slot_bytes // MB)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def _free_slots(self) -> asyncio.Queue:
+        if self._free is None:
+            self._free = asyncio.Queue()
+            for slot in range(self.slots):
+                self._free.put_nowait(slot)
+        return self._free
+
+    def _write(self, slot: int, decoded: DecodedImage) -> tuple:
+        rgb = decoded.rgb
+        view = np.ndarray(rgb.shape, dtype=np.uint8, buffer=self._shm.buf, offset=slot * self.slot_bytes)
+        np.copyto(view, rgb)
+        del view
+        return rgb.shape
+
+    async def run(self, task: str, image: bytes | DecodedImage) -> dict:
+        decoded = as_decoded(image)
+        w, h = decoded.size
+        if w * h * 3 > self.slot_bytes:
+            # Too big for a slot: run on the thread pool instead
+            self._fallbacks += 1
+            return await run_cpu(TASKS[task], decoded)
+
+        free = self._free_slots()
+        try:
+            slot = await asyncio.wait_for(free.get(), self.slot_timeout)
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            raise ExecutorBusyError("Inference workers are saturated, try again later")
+
+        loop = asyncio.get_running_loop()
+        pending = None
+        try:
+            # Decode + copy into shared memory off the event loop
+            pending = cpu_executor.submit(self._write, slot, decoded)
+            shape = await asyncio.wrap_future(pending)
+
+            pending = self._executor.submit(
+                _run_in_worker, task, slot * self.slot_bytes, shape, decoded.digest
+            )
+            result = await asyncio.wrap_future(pending)
+            self._completed += 1
+            return result
+        finally:
+            if pending is None or pending.done():
+                free.put_nowait(slot)
+            else:
+                # Cancelled mid-flight: the slot is still being read or written
+                pending.add_done_callback(lambda _: loop.call_soon_threadsafe(free.put_nowait, slot))
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "slots": self.slots,
+            "slots_free": self._free.qsize() if self._free is not None else self.slots,
+            "completed": self._completed,
+            "fallbacks": self._fallbacks,
+            "rejected": self._rejected
+        }
+
+
+inference_workers = InferenceWorkers(
+    workers=settings.INFERENCE_PROCESS_WORKERS,
+    slots=settings.INFERENCE_SHM_SLOTS or settings.INFERENCE_PROCESS_WORKERS * 2,
+    slot_bytes=settings.INFERENCE_SHM_SLOT_MB * MB,
+    slot_timeout=settings.INFERENCE_SLOT_TIMEOUT
+) if settings.INFERENCE_PROCESS_WORKERS > 0 else None
+
+
+async def run_inference(task: str, image: bytes | DecodedImage) -> dict:
+    """Run a task on the process workers if enabled, else on the CPU thread pool."""
+    if inference_workers is not None and inference_workers.started:
+        return await inference_workers.run(task, image)
+    return await run_cpu(TASKS[task], as_decoded(image))
+
+
+async def detect_landmarks(image: bytes | DecodedImage) -> dict:
+    """IrisLandmarkService.detect_landmarks, cached in this process, computed by a worker."""
+    decoded = as_decoded(image)
+    return await result_cache.get_or_compute_async(
+        "landmarks.detect",
+        IrisLandmarkService.CACHE_VERSION,
+        decoded.digest,
+        lambda: run_inference("landmarks", decoded)
+    )
@@ -123,200 +123,112 @@
 #         }
 
 
-import io
+import asyncio
 import numpy as np
-from PIL import Image
-import mediapipe as mp
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
+from app.services import face_geometry
+from app.services.face_geometry import FaceMeasurement
+from app.services.model_registry import face_landmarker_pool
+from app.services.result_cache import result_cache
+from app.utils.executors import run_cpu
+from app.utils.preprocessing import DecodedImage, as_decoded
 
 
 class IrisLandmarkService:
-    # Reference iris diameters (mm)
-    IRIS_MM_SMALL = 10.5
-    IRIS_MM_MEDIUM = 11.7
-    IRIS_MM_LARGE = 12.5
-
-    # Initialize FaceMesh using the new Tasks API
-    # You'll need to ensure the model file exists at this path
-    _model_path = "app/models/face_landmarker.task"
-    _base_options = python.BaseOptions(model_asset_path=_model_path)
-    _options = vision.FaceLandmarkerOptions(
-        base_options=_base_options,
-        output_face_blendshapes=True,
-        output_facial_transformation_matrixes=True,
-        num_faces=1)
-    _detector = vision.FaceLandmarker.create_from_options(_options)
-
-    # Iris landmarks (may need adjustment for Tasks API landmark indices)
-    LEFT_IRIS = [474, 475, 476, 477]
-    RIGHT_IRIS = [469, 470, 471, 472]
-
-    LEFT_IRIS_CENTER = 468
-    RIGHT_IRIS_CENTER = 473
+    # Bump when landmark model or measurement math changes
+    CACHE_VERSION = "face_landmarker/v1"
 
     @staticmethod
-    def _dist(p1, p2):
-        return ((p1[0] - p2[0]) ** 2 + (p1[1] - p2[1]) ** 2) ** 0.5
+    def to_response(m: FaceMeasurement) -> dict:
+        # Monocular PD is measured from the midpoint between the iris centers
+        pd_half = m.pd_horizontal / 2
 
-    @staticmethod
-    def classify_face_class(face_width_px):
-        if face_width_px < 120:
-            return "small"
-        elif face_width_px < 160:
-            return "medium"
-        return "large"
+        return {
+            "scale": {
+                "mm_per_pixel": round(m.mm_per_pixel, 4),
+                "iris_diameter_px": round(m.iris_diameter_px, 2)
+            },
+            "mm": {
+                "pd": round(m.pd_horizontal, 1),
+                "pd_left": round(pd_half, 1),
+                "pd_right": round(pd_half, 1),
 
-    @staticmethod
-    def classify_face_shape(width, height, jaw_width, chin_width):
-        ratio = width / height
-        if ratio > 0.90:
-            return "round"
-        elif 0.85 <= ratio <= 0.90:
-            return "square"
-        elif 0.75 <= ratio < 0.85:
-            return "oval"
-        elif ratio < 0.75:
-            return "rectangle"
-        if chin_width < jaw_width * 0.7:
-            return "heart"
-        return "oval"
+                "face_width": round(m.face_width, 1),
+                "face_height": round(m.face_height, 1),
+                "face_ratio": round(m.face_ratio, 2),
+
+                "nose_bridge_left": round(m.nose_bridge_left, 1),
+                "nose_bridge_right": round(m.nose_bridge_right, 1)
+            },
+            "face_shape": m.face_shape
+        }
 
     @staticmethod
-    def detect_landmarks(image_bytes: bytes):
-        # =========================
-        # LOAD IMAGE
-        # =========================
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        img = np.array(image)
-        h, w, _ = img.shape
-        
-        # Convert to MediaPipe Image object
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=img)
-
-        # Detect landmarks
-        result = IrisLandmarkService._detector.detect(mp_image)
-        
+    def detect_points(image: bytes | DecodedImage):
+        """(478, 2) float32 landmark pixel coordinates for the first face."""
+        decoded = as_decoded(image)
+        w, h = decoded.size
+
+        with face_landmarker_pool().detector() as detector:
+            result = detector.detect(decoded.mp_image)
+
         if not result.face_landmarks:
             raise Exception("No face detected")
 
-        face = result.face_landmarks[0]
         # Landmarks in Tasks API are normalized (0.0 to 1.0)
-        points = [(int(l.x * w), int(l.y * h)) for l in face]
-
-        # =========================
-        # FACE SIZE (PX)
-        # =========================
-        jaw_left = points[234]
-        jaw_right = points[454]
-        chin = points[152]
-        forehead = points[10]
-
-        face_width_px = IrisLandmarkService._dist(jaw_left, jaw_right)
-        face_height_px = IrisLandmarkService._dist(chin, forehead)
-
-        face_class = IrisLandmarkService.classify_face_class(face_width_px)
-
-        # =========================
-        # IRIS SIZE SELECTION
-        # =========================
-        if face_class == "small":
-            iris_mm = IrisLandmarkService.IRIS_MM_SMALL
-        elif face_class == "medium":
-            iris_mm = IrisLandmarkService.IRIS_MM_MEDIUM
-        else:
-            iris_mm = IrisLandmarkService.IRIS_MM_LARGE
-
-        # =========================
-        # IRIS SCALE
-        # =========================
-        left_iris = [points[i] for i in IrisLandmarkService.LEFT_IRIS]
-        right_iris = [points[i] for i in IrisLandmarkService.RIGHT_IRIS]
-
-        left_diam_px = IrisLandmarkService._dist(left_iris[0], left_iris[2])
-        right_diam_px = IrisLandmarkService._dist(right_iris[0], right_iris[2])
-
-        iris_diameter_px = (left_diam_px + right_diam_px) / 2
-        if iris_diameter_px <= 0:
-            raise Exception("Invalid iris detection")
-
-        mm_per_pixel = iris_mm / iris_diameter_px
-
-        # =========================
-        # IRIS CENTERS
-        # =========================
-        left_eye = points[IrisLandmarkService.LEFT_IRIS_CENTER]
-        right_eye = points[IrisLandmarkService.RIGHT_IRIS_CENTER]
-
-        # =========================
-        # TOTAL PD (HORIZONTAL)
-        # =========================
-        eye_dx_px = abs(left_eye[0] - right_eye[0])
-        pd_mm = eye_dx_px * mm_per_pixel
-
-        # =========================
-        # CORRECT MONOCULAR PD
-        # =========================
-        mid_x = (left_eye[0] + right_eye[0]) / 2
-
-        left_pd_mm = abs(mid_x - left_eye[0]) * mm_per_pixel
-        right_pd_mm = abs(right_eye[0] - mid_x) * mm_per_pixel
-
-        # =========================
-        # FACE DIMENSIONS (MM)
-        # =========================
-        face_width_mm = face_width_px * mm_per_pixel
-        face_height_mm = face_height_px * mm_per_pixel
-        face_ratio = face_width_mm / face_height_mm
-
-        # =========================
-        # NOSE BRIDGE
-        # =========================
-        nose_center = points[1]
-        nose_left = points[94]
-        nose_right = points[331]
-
-        nose_bridge_left_mm = (
-            IrisLandmarkService._dist(nose_center, nose_left) * mm_per_pixel
-        )
-        nose_bridge_right_mm = (
-            IrisLandmarkService._dist(nose_center, nose_right) * mm_per_pixel
-        )
+        return face_geometry.landmarks_to_array(result.face_landmarks[0], w, h)
 
-        # =========================
-        # FACE SHAPE
-        # =========================
-        jaw_width_mm = face_width_mm
-        chin_width_mm = (
-            IrisLandmarkService._dist(points[132], points[361]) * mm_per_pixel
+    @staticmethod
+    def detect_landmarks(image: bytes | DecodedImage):
+        decoded = as_decoded(image)
+        return result_cache.get_or_compute(
+            "landmarks.detect",
+            IrisLandmarkService.CACHE_VERSION,
+            decoded.digest,
+            lambda: IrisLandmarkService.to_response(
+                face_geometry.measure(IrisLandmarkService.detect_points(decoded))
+            )
         )
 
-        face_shape = IrisLandmarkService.classify_face_shape(
-            face_width_mm,
-            face_height_mm,
-            jaw_width_mm,
-            chin_width_mm
+    @staticmethod
+    async def detect_landmarks_batch(images: list[bytes], detect=None) -> dict:
+        """
+        Several photos of the same face -> one robust measurement.
+        Landmarking runs in parallel across the landmarker pool (or through
+        `detect`, an async image -> points callable); the measurements are
+        combined by median after MAD outlier rejection.
+        """
+        if detect is None:
+            detect = lambda image: run_cpu(IrisLandmarkService.detect_points, image)
+
+        outcomes = await asyncio.gather(
+            *(detect(image) for image in images),
+            return_exceptions=True
         )
 
-        # =========================
-        # FINAL RESPONSE
-        # =========================
-        return {
-            "scale": {
-                "mm_per_pixel": round(mm_per_pixel, 4),
-                "iris_diameter_px": round(iris_diameter_px, 2)
-            },
-            "mm": {
-                "pd": round(pd_mm, 1),
-                "pd_left": round(left_pd_mm, 1),
-                "pd_right": round(right_pd_mm, 1),
+        ok = [i for i, outcome in enumerate(outcomes) if not isinstance(outcome, BaseException)]
+        if not ok:
+            raise Exception(f"No face detected in any image ({outcomes[0]})")
+
+        stack = face_geometry.measure(np.stack([outcomes[i] for i in ok]))
+        m, inliers = face_geometry.aggregate(stack)
 
-                "face_width": round(face_width_mm, 1),
-                "face_height": round(face_height_mm, 1),
-                "face_ratio": round(face_ratio, 2),
+        per_image = [{"index": i, "error": str(outcome)} for i, outcome in enumerate(outcomes) if i not in ok]
+        for row, i in enumerate(ok):
+            per_image.append({
+                "index": i,
+                "pd": round(float(stack.pd_horizontal[row]), 1),
+                "face_width": round(float(stack.face_width[row]), 1),
+                "inlier": bool(inliers[row])
+            })
+        per_image.sort(key=lambda item: item["index"])
 
-                "nose_bridge_left": round(nose_bridge_left_mm, 1),
-                "nose_bridge_right": round(nose_bridge_right_mm, 1)
+        return {
+            **IrisLandmarkService.to_response(m),
+            "images": {
+                "received": len(images),
+                "measured": len(ok),
+                "used": int(inliers.sum())
             },
-            "face_shape": face_shape
+            "per_image": per_image
         }
+
@@ -2,6 +2,7 @@ import io
 import dlib
 import numpy as np
 from PIL import Image
+from app.services.face_geometry import pair_distances
 
 class LandmarkService:
     detector = dlib.get_frontal_face_detector()
@@ -22,15 +23,11 @@ class LandmarkService:
     # Average adult face width for scale calibration
     FACE_WIDTH_MM_AVG = 145.0
 
-    @staticmethod
-    def dist(p1, p2):
-        return ((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)**0.5
-
-    @staticmethod
-    def mean_point(points):
-        xs = [p[0] for p in points]
-        ys = [p[1] for p in points]
-        return (sum(xs)/len(xs), sum(ys)/len(ys))
+    # dlib 68-point index pairs measured in one vectorized pass
+    PAIRS = np.array([
+        [0, 16],   # face width (jaw corners)
+        [8, 27],   # face height (chin - nose bridge)
+    ], dtype=np.intp)
 
     @staticmethod
     def detect_landmarks(image_bytes: bytes):
@@ -46,26 +43,32 @@ class LandmarkService:
         face = faces[0]
         shape = LandmarkService.predictor(np_img, face)
 
-        # Extract all landmark points
-        pts = [(shape.part(i).x, shape.part(i).y) for i in range(68)]
+        # Extract all landmark points as one (68, 2) array
+        pts = np.array([(p.x, p.y) for p in shape.parts()], dtype=np.float32)
 
         # PIXEL MEASUREMENTS
-        face_width_px = LandmarkService.dist(pts[0], pts[16])
+        face_width_px, face_height_to_bridge_px = pair_distances(pts, LandmarkService.PAIRS).tolist()
         face_height_px = face.bottom() - face.top()
 
         # SCALE: mm per pixel from average adult face width
         mm_per_pixel = LandmarkService.FACE_WIDTH_MM_AVG / face_width_px
 
         # === EYE CENTERS ===
-        left_eye = LandmarkService.mean_point(pts[42:48])
-        right_eye = LandmarkService.mean_point(pts[36:42])
+        left_eye = pts[42:48].mean(axis=0)
+        right_eye = pts[36:42].mean(axis=0)
 
         # === CORRECT NOSE BRIDGE POINT ===
         nose_bridge = pts[27]
 
+        # Eye-to-nose distances in one shot:
+        # left eye - bridge, right eye - bridge, left eye - left nostril, right eye - right nostril
+        eye_nose_px = np.linalg.norm(
+            np.stack([left_eye, right_eye, left_eye, right_eye]) - pts[[27, 27, 31, 35]],
+            axis=1
+        )
+        raw_pd_left, raw_pd_right, nose_left_mm, nose_right_mm = (eye_nose_px * mm_per_pixel).tolist()
+
         # === RAW PD CALCULATIONS (mm) ===
-        raw_pd_left = LandmarkService.dist(left_eye, nose_bridge) * mm_per_pixel
-        raw_pd_right = LandmarkService.dist(right_eye, nose_bridge) * mm_per_pixel
         raw_pd_total = raw_pd_left + raw_pd_right
 
         # -----------------------------
@@ -86,28 +89,22 @@ class LandmarkService:
             pd_total = raw_pd_total
 
         # === NOSE MEASUREMENTS (UNMODIFIED) ===
-        nose_left = pts[31]
-        nose_right = pts[35]
-
-        nose_left_mm = LandmarkService.dist(left_eye, nose_left) * mm_per_pixel
-        nose_right_mm = LandmarkService.dist(right_eye, nose_right) * mm_per_pixel
         nose_total_mm = nose_left_mm + nose_right_mm
 
         # === FITTING HEIGHT ===
-        eye_center_y = (left_eye[1] + right_eye[1]) / 2
-        fitting_height_mm = abs(eye_center_y - nose_bridge[1]) * mm_per_pixel
+        eye_center_y = float(left_eye[1] + right_eye[1]) / 2
+        fitting_height_mm = abs(eye_center_y - float(nose_bridge[1])) * mm_per_pixel
 
         # === FACE DIMENSIONS ===
-        chin = pts[8]
-        forehead = pts[27]
-        face_height_mm = LandmarkService.dist(chin, forehead) * mm_per_pixel
+        face_height_mm = face_height_to_bridge_px * mm_per_pixel
         face_width_mm = face_width_px * mm_per_pixel
 
         face_shape_ratio = face_width_mm / face_height_mm
 
         # REGION POINTS
+        int_pts = pts.astype(int).tolist()
         region_points = {
-            name: [pts[i] for i in idxs]
+            name: [tuple(int_pts[i]) for i in idxs]
             for name, idxs in LandmarkService.regions.items()
         }
 
@@ -0,0 +1,133 @@
+import math
+import time
+from app.services import face_geometry
+from app.services.model_registry import video_face_landmarker
+from app.utils.preprocessing import as_decoded
+from app.utils.settings import settings
+
+# Smoothed per frame; face_shape is re-derived from the smoothed values
+TRACKED = (
+    "pd", "face_width", "face_height", "chin_width",
+    "nose_bridge_left", "nose_bridge_right", "mm_per_pixel"
+)
+
+
+class RobustEstimate:
+    """
+    Incremental robust location estimate (exponentially weighted Huber
+    M-estimator). Samples more than `k` scaled deviations away are
+    down-weighted, so blinks or a turned head don't yank the readout.
+    """
+
+    def __init__(self, alpha: float, k: float = 2.0):
+        self.alpha = alpha
+        self.k = k
+        self.value = None
+        self.spread = 0.0   # EW mean absolute deviation
+        self.count = 0
+
+    def update(self, x: float) -> float:
+        if x is None or not math.isfinite(x):
+            return self.value
+        self.count += 1
+        if self.value is None:
+            self.value = x
+            return x
+
+        residual = x - self.value
+        scale = max(self.spread, 1e-6)
+        weight = min(1.0, self.k * scale / abs(residual)) if residual else 1.0
+        # Warm-up: trust early samples more so the estimate converges fast
+        alpha = max(self.alpha, 1.0 / self.count)
+
+        self.value += alpha * weight * residual
+        clipped = abs(residual) if self.count <= 5 else min(abs(residual), 2 * self.k * scale)
+        self.spread += alpha * (clipped - self.spread)
+        return self.value
+
+
+class LiveMeasurementSession:
+    """One WebSocket stream: a VIDEO-mode landmarker plus smoothed measurements."""
+
+    def __init__(self):
+        self.landmarker = video_face_landmarker()
+        self.estimates = {name: RobustEstimate(settings.LIVE_SMOOTHING_ALPHA) for name in TRACKED}
+        self._started = time.monotonic()
+        self._last_ts = -1
+        self.frames = 0
+        self.faces = 0
+
+    def _timestamp_ms(self) -> int:
+        # VIDEO mode needs strictly increasing timestamps
+        ts = max(int((time.monotonic() - self._started) * 1000), self._last_ts + 1)
+        self._last_ts = ts
+        return ts
+
+    def process_frame(self, frame: bytes) -> dict:
+        decoded = as_decoded(frame)
+        w, h = decoded.size
+        self.frames += 1
+
+        result = self.landmarker.detect_for_video(decoded.mp_image, self._timestamp_ms())
+        if not result.face_landmarks:
+            return {"type": "no_face", "frame": self.frames}
+        self.faces += 1
+
+        points = face_geometry.landmarks_to_array(result.face_landmarks[0], w, h)
+        m = face_geometry.measure(points)
+
+        raw = {
+            "pd": m.pd_horizontal,
+            "face_width": m.face_width,
+            "face_height": m.face_height,
+            "chin_width": m.chin_width,
+            "nose_bridge_left": m.nose_bridge_left,
+            "nose_bridge_right": m.nose_bridge_right,
+            "mm_per_pixel": m.mm_per_pixel
+        }
+        for name, value in raw.items():
+            self.estimates[name].update(float(value))
+
+        return {
+            "type": "measurement",
+            "frame": self.frames,
+            "stable": self.stable,
+            "raw": {name: round(float(value), 1) for name, value in raw.items() if name != "mm_per_pixel"},
+            **self.smoothed()
+        }
+
+    @property
+    def stable(self) -> bool:
+        pd = self.estimates["pd"]
+        return (
+            pd.count >= settings.LIVE_STABLE_MIN_FRAMES
+            and pd.value is not None
+            and pd.spread / pd.value <= settings.LIVE_STABLE_MAX_SPREAD
+        )
+
+    def smoothed(self) -> dict:
+        """Current smoothed measurements in the /landmarks/detect response shape."""
+        e = {name: estimate.value for name, estimate in self.estimates.items()}
+        if e["pd"] is None:
+            return {}
+
+        pd_half = e["pd"] / 2
+        face_shape = str(face_geometry.classify_face_shape(e["face_width"], e["face_height"], e["chin_width"]))
+
+        return {
+            "scale": {"mm_per_pixel": round(e["mm_per_pixel"], 4)},
+            "mm": {
+                "pd": round(e["pd"], 1),
+                "pd_left": round(pd_half, 1),
+                "pd_right": round(pd_half, 1),
+                "face_width": round(e["face_width"], 1),
+                "face_height": round(e["face_height"], 1),
+                "face_ratio": round(e["face_width"] / e["face_height"], 2),
+                "nose_bridge_left": round(e["nose_bridge_left"], 1),
+                "nose_bridge_right": round(e["nose_bridge_right"], 1)
+            },
+            "face_shape": face_shape
+        }
+
+    def close(self):
+        self.landmarker.close()
@@ -0,0 +1,283 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.services.detector_pool import DetectorPool
+from app.utils.executors import cpu_executor
+from app.utils.settings import settings
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), "..", "models")
+FACE_LANDMARKER_PATH = os.path.join(MODELS_DIR, "face_landmarker.task")
+GLASSES_DETECTOR_PATH = os.path.join(MODELS_DIR, "glasses_detector_resnet18.pth")
+
+
+class ModelRegistry:
+    """
+    Loads each model once, on first use or in the background at startup,
+    runs a warmup inference, and tracks readiness for the /ready probe.
+    """
+
+    def __init__(self):
+        self._entries = {}   # name -> (loader, warmup)
+        self._models = {}
+        self._errors = {}
+        self._load_seconds = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._preload_started = False
+        self._cold = set()   # loaded before fork, warmup still pending
+
+    def register(self, name: str, loader, warmup=None):
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = (loader, warmup)
+                self._locks[name] = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def peek(self, name: str):
+        """Return the model if it is already loaded, without triggering a load."""
+        return self._models.get(name)
+
+    def get(self, name: str):
+        if name in self._models and name not in self._cold:
+            return self._models[name]
+
+        with self._locks[name]:
+            loader, warmup = self._entries[name]
+            if name in self._cold:
+                if warmup is not None and self._models[name] is not None:
+                    warmup(self._models[name])
+                self._cold.discard(name)
+            if name in self._models:
+                return self._models[name]
+
+            started = time.perf_counter()
+            try:
+                model = loader()
+                if warmup is not None and model is not None:
+                    warmup(model)
+            except Exception as e:
+                self._errors[name] = str(e)
+                raise
+
+            self._errors.pop(name, None)
+            self._load_seconds[name] = round(time.perf_counter() - started, 3)
+            self._models[name] = model
+            return model
+
+    def load_cold(self, name: str):
+        """
+        Load a model without its warmup inference, for the pre-fork launcher:
+        weights loaded in the master are shared copy-on-write by every worker,
+        but warmup would start native thread pools that do not survive fork(),
+        so each worker warms its inherited copy on first get().
+        """
+        with self._locks[name]:
+            if name in self._models:
+                return
+            loader, _ = self._entries[name]
+            started = time.perf_counter()
+            self._models[name] = loader()
+            self._load_seconds[name] = round(time.perf_counter() - started, 3)
+            self._cold.add(name)
+
+    def load_all(self):
+        """Load every registered model in parallel; errors are recorded, not raised."""
+        names = list(self._entries)
+
+        def _load(name):
+            try:
+                self.get(name)
+            except Exception:
+                pass
+
+        with ThreadPoolExecutor(max_workers=max(len(names), 1), thread_name_prefix="model-load") as pool:
+            list(pool.map(_load, names))
+
+    def start_background_load(self):
+        with self._lock:
+            if self._preload_started:
+                return
+            self._preload_started = True
+
+        threading.Thread(target=self.load_all, name="model-preload", daemon=True).start()
+
+    def is_ready(self) -> bool:
+        return all(name in self._models and name not in self._cold for name in self._entries)
+
+    def status(self) -> dict:
+        models = {}
+        for name in self._entries:
+            if name in self._cold:
+                models[name] = {"state": "loaded", "load_seconds": self._load_seconds.get(name)}
+            elif name in self._models:
+                models[name] = {"state": "ready", "load_seconds": self._load_seconds.get(name)}
+            elif name in self._errors:
+                models[name] = {"state": "error", "error": self._errors[name]}
+            else:
+                models[name] = {"state": "loading" if self._preload_started else "pending"}
+        return models
+
+
+registry = ModelRegistry()
+
+
+# =========================
+# FACE LANDMARKER
+# =========================
+_face_landmarker_asset = None
+_face_landmarker_asset_lock = threading.Lock()
+
+
+def _load_face_landmarker_asset() -> bytes:
+    # Read the .task file once; every landmarker instance builds from this buffer
+    global _face_landmarker_asset
+    with _face_landmarker_asset_lock:
+        if _face_landmarker_asset is None:
+            with open(FACE_LANDMARKER_PATH, "rb") as f:
+                _face_landmarker_asset = f.read()
+    return _face_landmarker_asset
+
+
+def _build_face_landmarker_pool(output_face_blendshapes: bool, output_facial_transformation_matrixes: bool):
+    from mediapipe.tasks import python
+    from mediapipe.tasks.python import vision
+
+    options = vision.FaceLandmarkerOptions(
+        base_options=python.BaseOptions(model_asset_buffer=_load_face_landmarker_asset()),
+        output_face_blendshapes=output_face_blendshapes,
+        output_facial_transformation_matrixes=output_facial_transformation_matrixes,
+        num_faces=1)
+
+    pool = DetectorPool(
+        name="face_landmarker",
+        factory=lambda: vision.FaceLandmarker.create_from_options(options),
+        size=settings.LANDMARKER_POOL_SIZE or cpu_executor.max_workers,
+        timeout=settings.LANDMARKER_POOL_TIMEOUT
+    )
+    pool.prefill(1)
+    return pool
+
+
+def _warmup_face_landmarker_pool(pool: DetectorPool):
+    import numpy as np
+    import mediapipe as mp
+
+    blank = np.full((256, 256, 3), 128, dtype=np.uint8)
+    with pool.detector() as detector:
+        detector.detect(mp.Image(image_format=mp.ImageFormat.SRGB, data=blank))
+
+
+def face_landmarker_pool(
+    output_face_blendshapes: bool = False,
+    output_facial_transformation_matrixes: bool = False
+) -> DetectorPool:
+    """
+    Shared FaceLandmarker pool. Consumers that need blendshapes or
+    transformation matrices get their own pool built from the same asset.
+    """
+    name = "face_landmarker"
+    if output_face_blendshapes or output_facial_transformation_matrixes:
+        name += f"[blendshapes={output_face_blendshapes},matrixes={output_facial_transformation_matrixes}]"
+
+    if name not in registry:
+        registry.register(
+            name,
+            loader=lambda: _build_face_landmarker_pool(
+                output_face_blendshapes, output_facial_transformation_matrixes
+            ),
+            warmup=_warmup_face_landmarker_pool
+        )
+    return registry.get(name)
+
+
+def video_face_landmarker():
+    """
+    A new FaceLandmarker in VIDEO mode, for one live stream: it tracks the
+    face from frame to frame instead of running full detection each time.
+    Not pooled (it holds per-stream state); the caller must close() it.
+    """
+    from mediapipe.tasks import python
+    from mediapipe.tasks.python import vision
+
+    options = vision.FaceLandmarkerOptions(
+        base_options=python.BaseOptions(model_asset_buffer=_load_face_landmarker_asset()),
+        running_mode=vision.RunningMode.VIDEO,
+        num_faces=1)
+    return vision.FaceLandmarker.create_from_options(options)
+
+
+# =========================
+# GLASSES DETECTOR
+# =========================
+def _load_glasses_detector():
+    # Server can start without the weights; GlassesService reports no glasses
+    if not os.path.isfile(GLASSES_DETECTOR_PATH):
+        return None
+
+    from app.glasses.detector import GlassesDetector
+    return GlassesDetector(
+        GLASSES_DETECTOR_PATH,
+        backend=settings.GLASSES_BACKEND,
+        preprocessing=settings.GLASSES_PREPROCESSING,
+        calibration_dir=settings.GLASSES_CALIBRATION_DIR
+    )
+
+
+def _warmup_glasses_detector(detector):
+    from PIL import Image
+    detector.predict(Image.new("RGB", (224, 224), (128, 128, 128)))
+
+
+def glasses_detector():
+    return registry.get("glasses_detector")
+
+
+def _load_glasses_batcher():
+    detector = glasses_detector()
+    if detector is None or settings.GLASSES_BATCH_MAX_SIZE <= 1:
+        return None
+
+    from app.glasses.batcher import GlassesBatcher
+    return GlassesBatcher(
+        detector,
+        max_batch_size=settings.GLASSES_BATCH_MAX_SIZE,
+        max_wait_ms=settings.GLASSES_BATCH_MAX_WAIT_MS
+    )
+
+
+def glasses_batcher():
+    """Micro-batching front for the glasses detector (None when disabled)."""
+    return registry.get("glasses_batcher")
+
+
+registry.register(
+    "face_landmarker",
+    loader=lambda: _build_face_landmarker_pool(False, False),
+    warmup=_warmup_face_landmarker_pool
+)
+registry.register(
+    "glasses_detector",
+    loader=_load_glasses_detector,
+    warmup=_warmup_glasses_detector
+)
+registry.register(
+    "glasses_batcher",
+    loader=_load_glasses_batcher
+)
+
+
+def load_shared():
+    """
+    Pre-fork preload: import the inference libraries, read the landmarker
+    asset and load the glasses weights (without warmup) so forked workers
+    share them copy-on-write. MediaPipe graphs and the batcher own threads,
+    so each worker builds those after the fork.
+    """
+    from mediapipe.tasks.python import vision  # noqa: F401
+
+    if os.path.isfile(FACE_LANDMARKER_PATH):
+        _load_face_landmarker_asset()
+    registry.load_cold("glasses_detector")
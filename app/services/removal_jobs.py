@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+from app.db.job_store import TERMINAL, job_store
+from app.db.virtual_tryon_repo import update_tryon
+from app.services.gcs_service import upload_image_async
+from app.services.glasses_removal import remove_glasses_service
+from app.services.signed_url_service import signed_url_service
+from app.utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RemovalQueueFull(Exception):
+    pass
+
+
+async def run_removal(image_bytes: bytes, guest_id: str, session_id: str, on_stage=None) -> dict:
+    """
+    Remove glasses -> upload result -> point the session at it.
+    Shared by POST /glasses/remove and the job workers.
+    """
+    async def stage(name):
+        if on_stage is not None:
+            await on_stage(name)
+
+    await stage("removing")
+    edited_bytes = await remove_glasses_service(image_bytes)
+
+    await stage("uploading")
+    removed_upload = await upload_image_async(
+        file_bytes=edited_bytes,
+        guest_id=guest_id,
+        session_id=session_id,
+        stage="glasses_removed",
+        ext="jpg"
+    )
+
+    await stage("saving")
+    await update_tryon(
+        guest_id=guest_id,
+        session_id=session_id,
+        update_data={
+            "images.glasses_removed.bucket_path": removed_upload["bucket_path"]
+        }
+    )
+
+    return {"edited_bytes": edited_bytes, "bucket_path": removed_upload["bucket_path"]}
+
+
+class RemovalJobs:
+    """
+    Background glasses removal.
+
+    submit() stores a job and queues the upload; REMOVAL_JOB_WORKERS
+    tasks run the pipeline, so removal throughput is sized independently
+    of request handling. State lives in the job store (memory or Mongo);
+    local subscribers are pushed every state change, others re-check the
+    store every REMOVAL_JOB_POLL_SECONDS.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+
+        self._queue = None
+        self._tasks = []
+        self._watchers = {}  # job_id -> set of asyncio.Queue
+        self._reserved = 0   # submits past the capacity check, not yet queued
+        self._running = set()  # job_ids a worker has taken off the queue
+        self._completed = 0
+        self._failed = 0
+
+    def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the workers and fail every job they will never finish."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        abandoned = list(self._running)
+        self._running.clear()
+        while self._queue is not None and not self._queue.empty():
+            abandoned.append(self._queue.get_nowait()[0])
+        for job_id in abandoned:
+            try:
+                job = await job_store.get(job_id)
+                if job is not None and job["status"] not in TERMINAL:
+                    await self._update(job_id, status="failed", error="Server shutting down")
+                    self._failed += 1
+            except Exception:
+                logger.exception("Recording shutdown of job %s failed", job_id)
+
+    async def submit(self, image_bytes: bytes, guest_id: str, session_id: str) -> dict:
+        self.start()
+        # Reserve the slot before awaiting the store, so concurrent submits
+        # can't all pass the check and then overflow the queue
+        if self.max_pending and self._queue.qsize() + self._reserved >= self.max_pending:
+            raise RemovalQueueFull("Removal queue is full, retry shortly")
+        self._reserved += 1
+
+        now = datetime.utcnow()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "guest_id": guest_id,
+            "session_id": session_id,
+            "status": "queued",
+            "stage": "queued",
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        try:
+            await job_store.create(job)
+        finally:
+            self._reserved -= 1
+        self._queue.put_nowait((job["job_id"], image_bytes, guest_id, session_id))
+        return job
+
+    async def _update(self, job_id: str, **fields):
+        fields["updated_at"] = datetime.utcnow()
+        await job_store.update(job_id, fields)
+        for watcher in self._watchers.get(job_id, ()):
+            watcher.put_nowait(fields)
+
+    async def _worker(self):
+        while True:
+            job_id, image_bytes, guest_id, session_id = await self._queue.get()
+            self._running.add(job_id)
+            try:
+                await self._update(job_id, status="running")
+                result = await run_removal(
+                    image_bytes, guest_id, session_id,
+                    on_stage=lambda stage: self._update(job_id, stage=stage)
+                )
+                await self._update(job_id, status="done", stage="done", result={"bucket_path": result["bucket_path"]})
+                self._completed += 1
+                self._running.discard(job_id)
+            except asyncio.CancelledError:
+                # Left in _running: stop() records it as failed
+                raise
+            except Exception as e:
+                self._running.discard(job_id)
+                logger.exception("Removal job %s failed", job_id)
+                self._failed += 1
+                try:
+                    await self._update(job_id, status="failed", error=str(e))
+                except Exception:
+                    logger.exception("Recording failure of job %s failed", job_id)
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    async def public(job: dict) -> dict:
+        """JSON-ready view of a job; the result image is signed on read."""
+        job = dict(job)
+        for key in ("created_at", "updated_at"):
+            if isinstance(job.get(key), datetime):
+                job[key] = job[key].isoformat()
+        if job.get("result"):
+            job["result"] = {
+                **job["result"],
+                "image_url": await signed_url_service.sign_async(job["result"]["bucket_path"])
+            }
+        return job
+
+    async def get(self, job_id: str) -> dict | None:
+        job = await job_store.get(job_id)
+        return await self.public(job) if job is not None else None
+
+    async def events(self, job_id: str):
+        """Yield the job on subscribe and on every change until it finishes; None = keepalive."""
+        watcher = asyncio.Queue()
+        self._watchers.setdefault(job_id, set()).add(watcher)
+        try:
+            last = None
+            while True:
+                job = await job_store.get(job_id)
+                if job is None:
+                    return
+                state = (job["status"], job["stage"])
+                if state != last:
+                    last = state
+                    yield await self.public(job)
+                elif state[0] not in TERMINAL:
+                    yield None
+                if state[0] in TERMINAL:
+                    return
+                try:
+                    await asyncio.wait_for(watcher.get(), settings.REMOVAL_JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            watchers = self._watchers.get(job_id)
+            watchers.discard(watcher)
+            if not watchers:
+                self._watchers.pop(job_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "completed": self._completed,
+            "failed": self._failed,
+            "subscribers": sum(len(w) for w in self._watchers.values())
+        }
+
+
+removal_jobs = RemovalJobs(
+    workers=settings.REMOVAL_JOB_WORKERS,
+    max_pending=settings.REMOVAL_JOB_MAX_PENDING
+)
@@ -0,0 +1,298 @@
+import asyncio
+import copy
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from app.utils.executors import run_io
+from app.utils.settings import settings
+
+_MISSING = object()
+
+
+class ResultCache:
+    """
+    Content-addressed cache for inference / Gemini results.
+
+    Keys are (endpoint, model version, image digest). A size-bounded
+    in-memory LRU sits in front of an optional on-disk tier. Concurrent
+    misses for the same key (client retries) share one computation.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: str | None = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._inflight = {}            # key -> Future
+        self._inflight_async = {}      # key -> asyncio.Future
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_writes = 0
+
+        self._hits_memory = 0
+        self._hits_disk = 0
+        self._misses = 0
+        self._shared = 0
+        self._evictions = 0
+        self._endpoints = {}           # endpoint -> {"hits", "misses"}
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 or bool(self.disk_dir)
+
+    @staticmethod
+    def make_key(endpoint: str, version: str, digest: str) -> str:
+        return hashlib.blake2b(f"{endpoint}|{version}|{digest}".encode(), digest_size=16).hexdigest()
+
+    # =========================
+    # MEMORY TIER
+    # =========================
+    def _memory_get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _memory_set(self, key, value, size: int):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    # =========================
+    # DISK TIER
+    # =========================
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _disk_get(self, key):
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return _MISSING, 0
+        except OSError:
+            return _MISSING, 0
+        try:
+            return pickle.loads(payload), len(payload)
+        except Exception:
+            return _MISSING, 0
+
+    def _disk_set(self, key, payload: bytes):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+        with self._disk_lock:
+            self._disk_writes += 1
+            prune = self.disk_max_bytes and self._disk_writes % 100 == 0
+        if prune:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        # Drop oldest files until the tier fits its budget again
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    # =========================
+    # PUBLIC API
+    # =========================
+    def _count(self, endpoint: str, hit: bool):
+        counts = self._endpoints.setdefault(endpoint, {"hits": 0, "misses": 0})
+        counts["hits" if hit else "misses"] += 1
+
+    def get(self, endpoint: str, version: str, digest: str):
+        """Cached value or None."""
+        key = self.make_key(endpoint, version, digest)
+        value = self._lookup(endpoint, key)
+        return None if value is _MISSING else value
+
+    def _lookup(self, endpoint: str, key: str):
+        value = self._memory_get(key)
+        if value is not _MISSING:
+            with self._lock:
+                self._hits_memory += 1
+                self._count(endpoint, True)
+            return copy.deepcopy(value)
+
+        if self.disk_dir:
+            value, size = self._disk_get(key)
+            if value is not _MISSING:
+                self._memory_set(key, value, size)
+                with self._lock:
+                    self._hits_disk += 1
+                    self._count(endpoint, True)
+                return copy.deepcopy(value)
+
+        return _MISSING
+
+    def set(self, endpoint: str, version: str, digest: str, value):
+        self._store(self.make_key(endpoint, version, digest), value)
+
+    def _store(self, key: str, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.max_bytes > 0:
+            self._memory_set(key, value, len(payload))
+        if self.disk_dir:
+            try:
+                self._disk_set(key, payload)
+            except OSError:
+                pass  # the disk tier is best-effort
+
+    def get_or_compute(self, endpoint: str, version: str, digest: str, compute):
+        """
+        Return the cached result or call `compute()` and cache it.
+        Exceptions are never cached.
+        """
+        if not self.enabled:
+            return compute()
+
+        key = self.make_key(endpoint, version, digest)
+        value = self._lookup(endpoint, key)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                future = Future()
+                self._inflight[key] = future
+                self._misses += 1
+                self._count(endpoint, False)
+            else:
+                self._shared += 1
+
+        if pending is not None:
+            return copy.deepcopy(pending.result())
+
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            # Hand the value to waiters first: a failed store must not strand them
+            future.set_result(value)
+            self._store(key, value)
+            return copy.deepcopy(value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def get_or_compute_async(self, endpoint: str, version: str, digest: str, compute):
+        """
+        Async variant of get_or_compute: `compute()` returns an awaitable.
+        The disk tier is read and written on the IO executor.
+        """
+        if not self.enabled:
+            return await compute()
+
+        key = self.make_key(endpoint, version, digest)
+        if self.disk_dir:
+            value = await run_io(self._lookup, endpoint, key)
+        else:
+            value = self._lookup(endpoint, key)
+        if value is not _MISSING:
+            return value
+
+        while (pending := self._inflight_async.get(key)) is not None:
+            with self._lock:
+                self._shared += 1
+            try:
+                return copy.deepcopy(await asyncio.shield(pending))
+            except asyncio.CancelledError:
+                # The leader was cancelled (e.g. its client went away), not us:
+                # take over the computation, or join whoever already did
+                if pending.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight_async[key] = future
+        with self._lock:
+            self._misses += 1
+            self._count(endpoint, False)
+
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        else:
+            # Resolve before the (awaited) store: if the leader is cancelled or
+            # the store raises there, waiters already have their value
+            future.set_result(value)
+            if self.disk_dir:
+                await run_io(self._store, key, value)
+            else:
+                self._store(key, value)
+            return copy.deepcopy(value)
+        finally:
+            self._inflight_async.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self._hits_memory + self._hits_disk
+            lookups = hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk": bool(self.disk_dir),
+                "hits_memory": self._hits_memory,
+                "hits_disk": self._hits_disk,
+                "misses": self._misses,
+                "shared_inflight": self._shared,
+                "evictions": self._evictions,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "endpoints": copy.deepcopy(self._endpoints)
+            }
+
+
+result_cache = ResultCache(
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    disk_dir=settings.RESULT_CACHE_DISK_DIR,
+    disk_max_bytes=settings.RESULT_CACHE_DISK_MAX_BYTES
+)
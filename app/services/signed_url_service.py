@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from app.services.gcs_service import get_bucket
+from app.utils.executors import run_io
+from app.utils.settings import settings
+
+
+class SignedUrlService:
+    """
+    Sign-on-read for GCS objects.
+
+    Mongo stores only blob paths. A V4 URL is signed when a client needs
+    it and reused per blob until `refresh_margin` seconds before it
+    expires, so clients never receive a URL that is about to die and we
+    never sign on the upload path.
+    """
+
+    def __init__(self, ttl_minutes: int, refresh_margin_seconds: int, max_entries: int):
+        self.ttl = timedelta(minutes=ttl_minutes)
+        self.refresh_margin = refresh_margin_seconds
+        self.max_entries = max_entries
+
+        self._cache = OrderedDict()  # blob_path -> (url, expires_at)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._signed = 0
+
+    def _cached(self, blob_path: str):
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(blob_path)
+            if entry is None:
+                return None
+            url, expires_at = entry
+            if expires_at - now <= self.refresh_margin:
+                del self._cache[blob_path]
+                return None
+            self._cache.move_to_end(blob_path)
+            self._hits += 1
+            return url
+
+    def _sign(self, blob_path: str) -> str:
+        expires_at = time.time() + self.ttl.total_seconds()
+        url = get_bucket().blob(blob_path).generate_signed_url(
+            version="v4",
+            expiration=self.ttl,
+            method="GET"
+        )
+        with self._lock:
+            self._cache[blob_path] = (url, expires_at)
+            self._cache.move_to_end(blob_path)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            self._signed += 1
+        return url
+
+    def sign(self, blob_path: str) -> str:
+        return self._cached(blob_path) or self._sign(blob_path)
+
+    def _split(self, blob_paths):
+        urls = {}
+        missing = []
+        for path in dict.fromkeys(blob_paths):
+            url = self._cached(path)
+            if url is None:
+                missing.append(path)
+            else:
+                urls[path] = url
+        return urls, missing
+
+    def _sign_all(self, urls: dict, missing: list) -> dict:
+        for path in missing:
+            urls[path] = self._sign(path)
+        return urls
+
+    def sign_many(self, blob_paths) -> dict:
+        """Sign a batch; only paths without a fresh cached URL are signed."""
+        return self._sign_all(*self._split(blob_paths))
+
+    async def sign_async(self, blob_path: str) -> str:
+        url = self._cached(blob_path)
+        if url is not None:
+            return url
+        return await run_io(self._sign, blob_path)
+
+    async def sign_many_async(self, blob_paths) -> dict:
+        urls, missing = self._split(blob_paths)
+        if not missing:
+            return urls
+        # One executor hop for the whole batch
+        return await run_io(self._sign_all, urls, missing)
+
+    async def sign_session(self, doc: dict) -> dict:
+        """
+        Add signed URLs to a virtual_tryons document:
+        images.<stage>.signed_url and selected_frame.frame_image_url.
+        Legacy documents that stored a URL instead of a path are left as-is.
+        """
+        targets = []  # (container, url_key, blob_path)
+
+        for image in (doc.get("images") or {}).values():
+            path = image.get("bucket_path") if isinstance(image, dict) else None
+            if path and not _is_url(path):
+                targets.append((image, "signed_url", path))
+
+        frame = doc.get("selected_frame")
+        if isinstance(frame, dict) and frame.get("frame_image_path"):
+            targets.append((frame, "frame_image_url", frame["frame_image_path"]))
+
+        if targets:
+            urls = await self.sign_many_async(path for _, _, path in targets)
+            for container, key, path in targets:
+                container[key] = urls[path]
+        return doc
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "hits": self._hits,
+                "signed": self._signed
+            }
+
+
+def _is_url(value: str) -> bool:
+    return value.startswith(("http://", "https://"))
+
+
+signed_url_service = SignedUrlService(
+    ttl_minutes=settings.SIGNED_URL_TTL_MINUTES,
+    refresh_margin_seconds=settings.SIGNED_URL_REFRESH_MARGIN_SECONDS,
+    max_entries=settings.SIGNED_URL_CACHE_SIZE
+)
@@ -0,0 +1,129 @@
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+from app.utils.executors import run_cpu, run_io
+
+
+@dataclass
+class Stage:
+    """
+    One step of a StageGraph.
+
+    `fn(results)` receives the results of earlier stages by name.
+    `needs` must succeed before this stage runs; `after` only has to finish
+    (success or failure). `executor` is "cpu" or "io" for blocking
+    functions, ignored for coroutine functions. A failed `optional` stage
+    is reported but doesn't fail the run.
+    """
+    name: str
+    fn: Callable
+    needs: tuple = ()
+    after: tuple = ()
+    executor: str = "cpu"
+    optional: bool = False
+
+
+@dataclass
+class GraphRun:
+    results: dict = field(default_factory=dict)
+    errors: dict = field(default_factory=dict)
+    timings_ms: dict = field(default_factory=dict)
+    required: set = field(default_factory=set)
+
+    @property
+    def ok(self) -> bool:
+        """True when every non-optional stage that ran succeeded."""
+        return not any(name in self.required for name in self.errors)
+
+
+class StageGraph:
+    """
+    Runs stages as soon as their dependencies are done, so independent
+    stages (e.g. GCS upload vs. inference) overlap. Intermediates are
+    shared through the results dict instead of being recomputed.
+    """
+
+    def __init__(self, stages: list[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            for dep in stage.needs + stage.after:
+                if dep not in self.stages:
+                    raise Exception(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise Exception(f"Stage graph has a cycle through '{name}'")
+            visiting.add(name)
+            stage = self.stages[name]
+            for dep in stage.needs + stage.after:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    async def _call(self, stage: Stage, results: dict):
+        if inspect.iscoroutinefunction(stage.fn):
+            return await stage.fn(results)
+        runner = run_io if stage.executor == "io" else run_cpu
+        return await runner(stage.fn, results)
+
+    async def run(self, initial: dict | None = None, skip: set = frozenset()) -> GraphRun:
+        """
+        Run every stage not in `skip` (stages needing a skipped stage are
+        skipped too). `initial` seeds the results dict.
+        """
+        run = GraphRun(results=dict(initial or {}))
+        started = time.perf_counter()
+        tasks = {}
+
+        skipped = set(skip)
+        changed = True
+        while changed:
+            changed = False
+            for stage in self.stages.values():
+                if stage.name not in skipped and any(dep in skipped for dep in stage.needs):
+                    skipped.add(stage.name)
+                    changed = True
+
+        active = [stage for stage in self.stages.values() if stage.name not in skipped]
+        run.required = {stage.name for stage in active if not stage.optional}
+
+        async def execute(stage: Stage):
+            await asyncio.gather(
+                *(tasks[dep] for dep in stage.needs + stage.after if dep in tasks),
+                return_exceptions=True
+            )
+            failed = [dep for dep in stage.needs if dep in run.errors]
+            if failed:
+                run.errors[stage.name] = f"skipped: {', '.join(failed)} failed"
+                return
+
+            stage_started = time.perf_counter()
+            try:
+                run.results[stage.name] = await self._call(stage, run.results)
+            except Exception as e:
+                run.errors[stage.name] = str(e)
+            finally:
+                run.timings_ms[stage.name] = round((time.perf_counter() - stage_started) * 1000, 1)
+
+        for stage in active:
+            tasks[stage.name] = asyncio.ensure_future(execute(stage))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        run.timings_ms["total"] = round((time.perf_counter() - started) * 1000, 1)
+        return run
@@ -0,0 +1,6 @@
+import hashlib
+
+
+def content_hash(data: bytes) -> str:
+    """Fast 128-bit digest of raw bytes (cache keys, ETags)."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
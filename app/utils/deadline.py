@@ -0,0 +1,40 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+# Absolute time.monotonic() by which the current request must answer.
+# Copied into executor threads with the rest of the context (see executors.py).
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def remaining() -> float | None:
+    """Seconds left for the current request, or None if it has no deadline."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check():
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """Run the block under a deadline `seconds` from now (never extends an outer one)."""
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
@@ -0,0 +1,120 @@
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.settings import settings
+
+
+class ExecutorBusyError(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a cap on outstanding work.
+    Routes await `run(...)` so blocking calls never run on the event loop.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"{name}-worker"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0     # submitted, not finished
+        self._running = 0     # currently on a worker thread
+        self._completed = 0
+        self._rejected = 0
+
+    def _call(self, ctx, fn, args, kwargs):
+        with self._lock:
+            self._running += 1
+        try:
+            return ctx.run(fn, *args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _on_done(self, _future):
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    def submit(self, fn, *args, **kwargs):
+        """Submit from sync code; returns a concurrent.futures.Future."""
+        with self._lock:
+            if self.max_pending and self._pending >= self.max_pending:
+                self._rejected += 1
+                raise ExecutorBusyError(
+                    f"{self.name} pool is saturated ({self._pending} pending), try again later"
+                )
+            self._pending += 1
+
+        ctx = contextvars.copy_context()
+        try:
+            future = self._executor.submit(self._call, ctx, fn, args, kwargs)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(self._on_done)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "completed": self._completed,
+                "rejected": self._rejected
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+# =========================
+# POOLS
+# =========================
+# cpu: model inference, OpenCV / NumPy work (sized to cores)
+# io:  blocking network calls (Gemini, GCS) that mostly wait
+cpu_executor = BoundedExecutor(
+    "cpu",
+    max_workers=settings.CPU_WORKERS or os.cpu_count() or 1,
+    max_pending=settings.CPU_MAX_PENDING
+)
+io_executor = BoundedExecutor(
+    "io",
+    max_workers=settings.IO_WORKERS,
+    max_pending=settings.IO_MAX_PENDING
+)
+
+
+async def run_cpu(fn, *args, **kwargs):
+    return await cpu_executor.run(fn, *args, **kwargs)
+
+
+async def run_io(fn, *args, **kwargs):
+    return await io_executor.run(fn, *args, **kwargs)
+
+
+def executor_stats() -> dict:
+    return {
+        "cpu": cpu_executor.stats(),
+        "io": io_executor.stats()
+    }
+
+
+def shutdown_executors(wait: bool = True):
+    cpu_executor.shutdown(wait=wait)
+    io_executor.shutdown(wait=wait)
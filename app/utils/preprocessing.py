@@ -0,0 +1,181 @@
+import io
+import threading
+import numpy as np
+from PIL import Image
+from app.utils.common import content_hash
+
+CLASSIFIER_SIZE = 224
+# How classifier_image is produced; part of the glasses result-cache version
+CLASSIFIER_DECODE = "draft+bilinear"
+
+
+class DecodedImage:
+    """
+    One upload, decoded at most once per resolution.
+
+    Every view (RGB array, grayscale, classifier tensor, MediaPipe image,
+    pyramid levels) is computed on first access and cached, so services
+    that share a DecodedImage never repeat the same decode or conversion.
+    Small views of a JPEG use PIL's draft mode (DCT scaling), which never
+    decodes the full-resolution image.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self._views = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_rgb(cls, rgb: np.ndarray, digest: str | None = None) -> "DecodedImage":
+        """
+        Wrap an already-decoded HxWx3 uint8 array (e.g. a shared-memory
+        view) without copying it. `digest` stands in for the content hash
+        of the original upload; without one the pixels (and shape) are
+        hashed on first use, so distinct arrays never share a cache key.
+        """
+        decoded = cls(b"")
+        decoded._views["rgb"] = rgb
+        decoded._views["size"] = (rgb.shape[1], rgb.shape[0])
+        if digest is not None:
+            decoded._views["digest"] = digest
+        return decoded
+
+    def _cached(self, key, build):
+        try:
+            return self._views[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._views:
+                self._views[key] = build()
+            return self._views[key]
+
+    def _open(self) -> Image.Image:
+        return Image.open(io.BytesIO(self.data))
+
+    @property
+    def digest(self) -> str:
+        """Content hash of the raw upload (result cache key)."""
+        return self._cached("digest", self._hash_content)
+
+    def _hash_content(self) -> str:
+        if self.data or "rgb" not in self._views:
+            return content_hash(self.data)
+        # Wrapped array (from_rgb without a digest): hash the pixels and shape
+        rgb = np.ascontiguousarray(self._views["rgb"])
+        return content_hash(repr(rgb.shape).encode() + rgb.tobytes())
+
+    # =========================
+    # HEADER (no pixel decode)
+    # =========================
+    @property
+    def size(self) -> tuple[int, int]:
+        """(width, height) of the full-resolution image."""
+        return self._cached("size", lambda: self._open().size)
+
+    @property
+    def format(self) -> str | None:
+        return self._cached("format", lambda: self._open().format if self.data else None)
+
+    # =========================
+    # FULL RESOLUTION
+    # =========================
+    @property
+    def pil(self) -> Image.Image:
+        if not self.data:
+            return self._cached("pil", lambda: Image.fromarray(self._views["rgb"]))
+        return self._cached("pil", lambda: self._open().convert("RGB"))
+
+    @property
+    def rgb(self) -> np.ndarray:
+        """HxWx3 uint8, full resolution."""
+        return self._cached("rgb", lambda: np.asarray(self.pil))
+
+    @property
+    def gray(self) -> np.ndarray:
+        import cv2
+        return self._cached("gray", lambda: cv2.cvtColor(self.rgb, cv2.COLOR_RGB2GRAY))
+
+    @property
+    def mp_image(self):
+        import mediapipe as mp
+        return self._cached(
+            "mp_image",
+            lambda: mp.Image(image_format=mp.ImageFormat.SRGB, data=np.ascontiguousarray(self.rgb))
+        )
+
+    # =========================
+    # REDUCED RESOLUTION
+    # =========================
+    def _decode_at_least(self, width: int, height: int) -> Image.Image:
+        """
+        Smallest RGB image with both sides >= (width, height).
+        Uses the cached full decode if there is one, else JPEG draft mode.
+        """
+        if "pil" in self._views:
+            return self._views["pil"]
+        if not self.data:
+            return Image.fromarray(self._views["rgb"])
+
+        image = self._open()
+        if image.format == "JPEG":
+            image.draft("RGB", (width, height))
+        return image.convert("RGB")
+
+    def pyramid(self, level: int) -> np.ndarray:
+        """RGB array downscaled by 2**level (level 0 = full resolution)."""
+        if level <= 0:
+            return self.rgb
+
+        def build():
+            import cv2
+            full_w, full_h = self.size
+            w, h = max(full_w >> level, 1), max(full_h >> level, 1)
+            if "rgb" in self._views:
+                source = self._views["rgb"]
+            else:
+                source = np.asarray(self._decode_at_least(w, h))
+            if source.shape[1] == w and source.shape[0] == h:
+                return source
+            return cv2.resize(source, (w, h), interpolation=cv2.INTER_AREA)
+
+        return self._cached(("pyramid", level), build)
+
+    def level_for(self, min_side: int) -> int:
+        """Deepest pyramid level whose short side is still >= min_side."""
+        short_side = min(self.size)
+        level = 0
+        while (short_side >> (level + 1)) >= min_side:
+            level += 1
+        return level
+
+    @property
+    def classifier_image(self) -> Image.Image:
+        """
+        224x224 RGB, bilinear like transforms.Resize((224, 224)). JPEGs are
+        resized from a DCT-scaled draft decode rather than the full image,
+        so pixels can differ from the full-decode path by a few levels
+        (measured up to 2/255, mean ~0.4/255); other formats match exactly.
+        """
+        def build():
+            image = self._decode_at_least(CLASSIFIER_SIZE, CLASSIFIER_SIZE)
+            return image.resize((CLASSIFIER_SIZE, CLASSIFIER_SIZE), Image.BILINEAR)
+
+        return self._cached("classifier_image", build)
+
+    @property
+    def classifier_tensor(self):
+        """3x224x224 float tensor in [0, 1] (ToTensor of classifier_image)."""
+        def build():
+            import torch
+            array = np.asarray(self.classifier_image)
+            return torch.from_numpy(array.copy()).permute(2, 0, 1).float().div_(255.0)
+
+        return self._cached("classifier_tensor", build)
+
+
+def as_decoded(image) -> DecodedImage:
+    """Accept raw upload bytes or an existing DecodedImage."""
+    if isinstance(image, DecodedImage):
+        return image
+    return DecodedImage(image)
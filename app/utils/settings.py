@@ -18,6 +18,120 @@ class Settings(BaseSettings):
     # Gemini
     GEMINI_API_KEY: str | None = None
     GOOGLE_API_KEY: str | None = None
+    GEMINI_MAX_CONNECTIONS: int = 64
+    GEMINI_MAX_CONCURRENCY: int = 32        # in-flight calls per worker, all models
+    GEMINI_MODEL_CONCURRENCY: int = 16      # in-flight calls per model
+    GEMINI_MODEL_LIMITS: str = ""           # per-model overrides: "gemini-2.5-flash-image=8,..."
+    GEMINI_TIMEOUT_SECONDS: float = 45.0    # cap per call, even when the request budget is larger
+    GEMINI_MAX_RETRIES: int = 2
+    GEMINI_RETRY_BASE_MS: int = 250
+    GEMINI_RETRY_MAX_MS: int = 4000
+    GEMINI_HEDGE_ENABLED: bool = False      # send a second request once a call passes the p95 latency
+    GEMINI_HEDGE_QUANTILE: float = 0.95
+    GEMINI_HEDGE_MIN_SAMPLES: int = 20
+    GEMINI_BREAKER_WINDOW: int = 20         # last N calls per model
+    GEMINI_BREAKER_MIN_CALLS: int = 10
+    GEMINI_BREAKER_ERROR_RATE: float = 0.5
+    GEMINI_BREAKER_COOLDOWN_SECONDS: float = 30.0
+    GEMINI_LOCAL_FALLBACK: bool = True      # /gemini-analyze falls back to MediaPipe while the circuit is open
+
+    # Pre-send image stage for Gemini: face crop, downscale, re-encode (long edge 0 = send upload as-is)
+    GEMINI_IMAGE_LONG_EDGE: int = 1024
+    GEMINI_IMAGE_FORMAT: str = "jpeg"       # jpeg | webp | png
+    GEMINI_IMAGE_QUALITY: int = 85
+    GEMINI_CROP_MARGIN: float = 0.35        # padding around the landmark box, x face size
+    GEMINI_PASTE_QUALITY: int = 92          # JPEG quality of the pasted-back removal result
+
+    # /landmarks/detect-batch
+    LANDMARK_BATCH_MAX_IMAGES: int = 10
+
+    # Live measurement over WebSocket (/landmarks/live)
+    LIVE_MAX_SESSIONS: int = 16             # per process; each holds its own landmarker
+    LIVE_SMOOTHING_ALPHA: float = 0.15
+    LIVE_STABLE_MIN_FRAMES: int = 15
+    LIVE_STABLE_MAX_SPREAD: float = 0.01    # PD mean abs deviation / PD
+
+    # Async glasses-removal jobs
+    REMOVAL_JOB_WORKERS: int = 4            # removals running at once per process
+    REMOVAL_JOB_MAX_PENDING: int = 100      # queued jobs before submit is refused
+    REMOVAL_JOB_STORE: str = "memory"       # memory | mongo (forced with several server workers)
+    REMOVAL_JOB_TTL_SECONDS: float = 3600.0
+    REMOVAL_JOB_POLL_SECONDS: float = 1.0   # SSE re-check interval for jobs owned by other workers
+
+    # Per-request deadline (clients may shorten it with X-Request-Timeout-Ms)
+    REQUEST_DEADLINE_SECONDS: float = 60.0
+
+    # Read-through session cache (0 entries = off)
+    SESSION_CACHE_TTL_SECONDS: float = 30.0
+    SESSION_CACHE_MAX_ENTRIES: int = 10000
+    SESSION_CACHE_CHANGE_STREAM: bool = False  # cross-worker invalidation; needs a replica set
+
+    # virtual_tryons index management at startup
+    MONGO_MANAGE_INDEXES: bool = True
+    MONGO_EXPLAIN_CHECK: bool = False  # refuse to start if a repository query COLLSCANs
+    SESSION_TTL_DAYS: int = 30
+
+    # Write-behind buffer for virtual_tryons updates (off by default)
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_FLUSH_MS: int = 200
+    WRITE_BEHIND_MAX_OPS: int = 500
+
+    # GCS uploads
+    GCS_HTTP_POOL_SIZE: int = 32
+    GCS_RESUMABLE_THRESHOLD: int = 8 * 1024 * 1024
+    GCS_CHUNK_SIZE: int = 4 * 1024 * 1024  # multiple of 256 KB
+
+    # Signed URLs (signed on read, reused until REFRESH_MARGIN before expiry)
+    SIGNED_URL_TTL_MINUTES: int = 60
+    SIGNED_URL_REFRESH_MARGIN_SECONDS: int = 600
+    SIGNED_URL_CACHE_SIZE: int = 10000
+
+    # Executors (0 workers = one per CPU core)
+    CPU_WORKERS: int = 0
+    CPU_MAX_PENDING: int = 64
+    IO_WORKERS: int = 32
+    IO_MAX_PENDING: int = 256
+
+    # Process-pool inference workers (0 = off: inference runs on the CPU thread pool)
+    INFERENCE_PROCESS_WORKERS: int = 0
+    INFERENCE_SHM_SLOTS: int = 0            # shared-memory frame slots (0 = 2 per worker)
+    INFERENCE_SHM_SLOT_MB: int = 48         # fits a 16 MP RGB frame; bigger frames use threads
+    # slots x slot MB per server worker must fit in /dev/shm (Docker: --shm-size)
+    INFERENCE_SLOT_TIMEOUT: float = 10.0
+
+    # FaceLandmarker pool (0 = match CPU_WORKERS)
+    LANDMARKER_POOL_SIZE: int = 0
+    LANDMARKER_POOL_TIMEOUT: float = 10.0
+
+    # Glasses detector inference
+    # backend: eager | torchscript | quantized_dynamic | quantized_static | onnx
+    # (quantized_dynamic only quantizes the fc head; use quantized_static for int8 convs)
+    # preprocessing: pil (torchvision transforms) | numpy (OpenCV resize)
+    GLASSES_BACKEND: str = "eager"
+    GLASSES_PREPROCESSING: str = "pil"
+    # Face crops (jpg/png/webp) used to calibrate int8 and verify non-eager
+    # backends against eager; without them those backends fall back to eager
+    GLASSES_CALIBRATION_DIR: str | None = None
+
+    # Glasses detector micro-batching (max size 1 = disabled)
+    GLASSES_BATCH_MAX_SIZE: int = 8
+    GLASSES_BATCH_MAX_WAIT_MS: float = 5.0
+
+    # Content-hash result cache (0 bytes = memory tier off; disk tier off unless a dir is set)
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESULT_CACHE_DISK_DIR: str | None = None
+    RESULT_CACHE_DISK_MAX_BYTES: int = 1024 * 1024 * 1024
+
+    # Load + warm all models in the background at startup (else on first use)
+    MODEL_PRELOAD: bool = True
+
+    # Pre-fork launcher (python -m app.server)
+    SERVER_WORKERS: int = 0                 # 0 = derive from CPU quota and memory limit
+    SERVER_SHARED_MEMORY_MB: int = 700      # libraries + weights loaded once in the master
+    SERVER_WORKER_MEMORY_MB: int = 450      # private memory per worker (see the memory report)
+    SERVER_MEMORY_RESERVE_MB: int = 256
+    SERVER_MEMORY_REPORT_SECONDS: float = 300.0
+    SERVER_GRACEFUL_TIMEOUT: float = 30.0
 
     class Config:
         env_file = BASE_DIR / ".env"
@@ -0,0 +1,81 @@
+import math
+import os
+
+_UNLIMITED = 1 << 60   # cgroup v1 reports "no limit" as a huge page-aligned number
+
+
+def _read(path: str) -> str | None:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_count() -> int:
+    """CPUs this process may use: affinity mask capped by the cgroup CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    v2 = _read("/sys/fs/cgroup/cpu.max")            # "max 100000" | "200000 100000"
+    if v2:
+        limit, _, period = v2.partition(" ")
+        if limit != "max":
+            quota = int(limit) / int(period)
+    else:
+        limit = _read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+        period = _read("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if limit and period and int(limit) > 0:
+            quota = int(limit) / int(period)
+
+    if quota is not None:
+        cpus = min(cpus, max(math.ceil(quota), 1))
+    return cpus
+
+
+def memory_limit() -> int:
+    """Bytes this process may use: the cgroup memory limit, else physical RAM."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        value = _read(path)
+        if value and value != "max" and int(value) < _UNLIMITED:
+            return int(value)
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def shm_free(path: str = "/dev/shm") -> int | None:
+    """Bytes free in the shared-memory filesystem; None where it doesn't exist."""
+    try:
+        stat = os.statvfs(path)
+    except OSError:
+        return None
+    return stat.f_bavail * stat.f_frsize
+
+
+def process_memory(pid: int | str = "self") -> dict | None:
+    """
+    RSS split into shared and private pages (MB), from /proc/<pid>/smaps_rollup.
+    PSS charges each shared page 1/n to each of the n processes mapping it,
+    so the PSS of all workers sums to what they really cost together.
+    None where smaps_rollup is unavailable (non-Linux, exited process).
+    """
+    text = _read(f"/proc/{pid}/smaps_rollup")
+    if text is None:
+        return None
+
+    kb = {}
+    for line in text.splitlines()[1:]:
+        key, _, value = line.partition(":")
+        kb[key] = int(value.split()[0])
+
+    def mb(*keys):
+        return round(sum(kb.get(key, 0) for key in keys) / 1024, 1)
+
+    return {
+        "rss_mb": mb("Rss"),
+        "pss_mb": mb("Pss"),
+        "shared_mb": mb("Shared_Clean", "Shared_Dirty"),
+        "private_mb": mb("Private_Clean", "Private_Dirty")
+    }
@@ -0,0 +1,122 @@
+"""
+Benchmark the pre-send image stage for Gemini calls.
+
+For each image, compares the raw upload with the prepared payload (face
+crop + downscale + re-encode): bytes sent, preparation time, and the
+estimated upload time at a given uplink. With --live it also calls the
+glasses-removal model both ways and reports end-to-end latency
+(needs GOOGLE_API_KEY; costs one Gemini call per image per mode).
+
+Usage:
+    python scripts/benchmark_gemini_payload.py --images path/to/faces
+    python scripts/benchmark_gemini_payload.py --images path/to/faces --long-edge 768 --format webp
+    python scripts/benchmark_gemini_payload.py --images path/to/faces --live
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.utils.settings import settings
+
+
+def load_images(images_dir):
+    images = []
+    for name in sorted(os.listdir(images_dir)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
+            with open(os.path.join(images_dir, name), "rb") as f:
+                images.append((name, f.read()))
+    if not images:
+        raise SystemExit(f"No images found in {images_dir}")
+    return images
+
+
+def ms(seconds):
+    return f"{seconds * 1000:8.1f}"
+
+
+async def live_removal(image_bytes, prepared, paste_back):
+    from app.services.gemini_gateway import gemini_gateway
+    from app.services.glasses_removal import REMOVAL_MODEL, REMOVAL_PROMPT
+    from app.services.gemini_image_prep import mime_type_of
+
+    async def call(data, mime_type):
+        response = await gemini_gateway.generate_content(
+            model=REMOVAL_MODEL,
+            contents=[REMOVAL_PROMPT, gemini_gateway.image_part(data, mime_type)],
+            api_key=settings.GOOGLE_API_KEY
+        )
+        return gemini_gateway.first_image(response)
+
+    start = time.perf_counter()
+    await call(image_bytes, mime_type_of(image_bytes))
+    before = time.perf_counter() - start
+
+    start = time.perf_counter()
+    edited = await call(prepared.data, prepared.mime_type)
+    paste_back(prepared, edited)
+    after = time.perf_counter() - start
+    return before, after
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", required=True, help="directory of face photos")
+    parser.add_argument("--long-edge", type=int, default=settings.GEMINI_IMAGE_LONG_EDGE)
+    parser.add_argument("--format", default=settings.GEMINI_IMAGE_FORMAT, choices=["jpeg", "webp", "png"])
+    parser.add_argument("--quality", type=int, default=settings.GEMINI_IMAGE_QUALITY)
+    parser.add_argument("--no-crop", action="store_true")
+    parser.add_argument("--uplink-mbps", type=float, default=10.0, help="for the estimated upload time")
+    parser.add_argument("--live", action="store_true", help="also time real Gemini removal calls")
+    args = parser.parse_args()
+
+    settings.GEMINI_IMAGE_LONG_EDGE = args.long_edge
+    settings.GEMINI_IMAGE_FORMAT = args.format
+    settings.GEMINI_IMAGE_QUALITY = args.quality
+
+    from app.services.gemini_image_prep import paste_back, prepare_for_gemini
+
+    images = load_images(args.images)
+    bytes_per_ms = args.uplink_mbps * 1e6 / 8 / 1000
+
+    print(f"long edge {args.long_edge}, {args.format} q{args.quality}, crop {'off' if args.no_crop else 'on'}, "
+          f"uplink {args.uplink_mbps} Mbit/s\n")
+    print(f"{'image':<28}{'before KB':>10}{'after KB':>10}{'ratio':>7}{'prep ms':>9}{'upload ms before/after':>25}")
+
+    rows = []
+    prepared_images = []
+    for name, data in images:
+        prepare_for_gemini(data, crop=not args.no_crop)  # warm the landmarker
+        start = time.perf_counter()
+        prepared = prepare_for_gemini(data, crop=not args.no_crop)
+        prep = time.perf_counter() - start
+
+        before, after = len(data), len(prepared.data)
+        rows.append((before, after, prep))
+        print(f"{name[:27]:<28}{before / 1024:>10.1f}{after / 1024:>10.1f}{after / before:>7.2f}{ms(prep):>9}"
+              f"{before / bytes_per_ms:>13.0f} / {after / bytes_per_ms:<9.0f}")
+
+        prepared_images.append((name, data, prepared))
+
+    total_before = sum(r[0] for r in rows)
+    total_after = sum(r[1] for r in rows)
+    print(f"\ntotal {total_before / 1024:.1f} KB -> {total_after / 1024:.1f} KB "
+          f"({total_after / total_before:.2f}x), median prep {statistics.median(r[2] for r in rows) * 1000:.1f} ms")
+
+    if args.live:
+        asyncio.run(run_live(prepared_images, paste_back))
+
+
+async def run_live(prepared_images, paste_back):
+    print(f"\n{'image':<28}{'removal ms before':>18}{'after':>10}")
+    for name, data, prepared in prepared_images:
+        before, after = await live_removal(data, prepared, paste_back)
+        print(f"{name[:27]:<28}{ms(before):>18}{ms(after):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark the glasses classifier backends on CPU.
+
+Reports per-backend latency (p50 / p95 per batch) and agreement with the
+eager float32 model (max probability difference, label agreement).
+Agreement and static int8 calibration need real face crops (--images);
+without them inputs are random and only the timings mean anything.
+
+Usage:
+    python scripts/benchmark_glasses_backends.py
+    python scripts/benchmark_glasses_backends.py --images path/to/faces --batch-sizes 1 8
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import torch
+from PIL import Image
+from app.glasses.backends import (
+    DEFAULT_TOLERANCE, EagerBackend, build_backend, face_samples, split_samples, synthetic_batches, verify_backend
+)
+from app.glasses.detector import GlassesDetector
+
+DEFAULT_MODEL = os.path.join(os.path.dirname(__file__), "..", "app", "models", "glasses_detector_resnet18.pth")
+BACKENDS = ["eager", "torchscript", "quantized_dynamic", "quantized_static", "onnx"]
+
+
+def load_inputs(detector, images_dir, count):
+    """(timing batch, calibration batches, held-out verification batch)."""
+    samples = face_samples(images_dir, detector.preprocess) if images_dir else None
+    if images_dir and samples is None:
+        raise SystemExit(f"No images found in {images_dir}")
+    if samples is None:
+        print("No --images: agreement is on random inputs and quantized_static is skipped\n")
+        inputs = next(synthetic_batches(batches=1, batch_size=count))
+        return inputs, None, inputs
+
+    calibration, held_out = split_samples(samples)
+    inputs = samples.repeat((count + len(samples) - 1) // len(samples), 1, 1, 1)[:count]
+    return inputs, calibration, held_out
+
+
+def time_backend(backend, batch, iterations):
+    backend(batch)  # warmup
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        backend(batch)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(0.95 * (len(timings) - 1))]
+
+
+def time_preprocessing(detector, iterations):
+    image = Image.fromarray(np.random.default_rng(0).integers(0, 255, (3024, 4032, 3), dtype=np.uint8))
+    array = np.asarray(image)
+
+    def run(fn, arg):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn(arg)
+        return (time.perf_counter() - started) * 1000 / iterations
+
+    return run(detector.transform, image), run(GlassesDetector.preprocess_array, array)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--images", help="directory of face images (default: synthetic inputs)")
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    detector = GlassesDetector(args.model, backend="eager")
+    eager = EagerBackend(detector.model, detector.device)
+    inputs, calibration, held_out = load_inputs(detector, args.images, max(args.batch_sizes))
+
+    print(f"torch {torch.__version__}, threads={torch.get_num_threads()}, device={detector.device}")
+    print(f"{'backend':<20}{'batch':>6}{'p50 ms':>10}{'p95 ms':>10}{'max |dp|':>12}{'agree':>8}{'ok':>5}")
+
+    for name in args.backends:
+        try:
+            backend = eager if name == "eager" else build_backend(
+                name, detector.model, detector.device, args.model, calibration
+            )
+        except Exception as e:
+            print(f"{name:<20} unavailable: {e}")
+            continue
+
+        report = verify_backend(eager, backend, held_out, DEFAULT_TOLERANCE.get(name))
+        for batch_size in args.batch_sizes:
+            p50, p95 = time_backend(backend, inputs[:batch_size], args.iterations)
+            print(
+                f"{name:<20}{batch_size:>6}{p50:>10.2f}{p95:>10.2f}"
+                f"{report['max_abs_diff']:>12.2e}{report['label_agreement']:>8.1%}{'yes' if report['ok'] else 'NO':>5}"
+            )
+
+    pil_ms, numpy_ms = time_preprocessing(detector, max(args.iterations // 5, 3))
+    print(f"\npreprocessing 12MP -> 224: pil {pil_ms:.1f} ms, numpy/opencv {numpy_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
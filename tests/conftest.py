@@ -0,0 +1,13 @@
+import os
+import sys
+
+# Settings() requires these; tests never reach GCS or Mongo
+os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", "test-credentials.json")
+os.environ.setdefault("BUCKET_NAME", "test-bucket")
+os.environ.setdefault("FOLDER_NAME", "test")
+os.environ.setdefault("GCP_PROJECT_ID", "test-project")
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("MONGODB_DB_NAME", "test")
+os.environ.setdefault("MODEL_PRELOAD", "false")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
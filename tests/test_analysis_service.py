@@ -0,0 +1,27 @@
+import asyncio
+import numpy as np
+from app.services import analysis_service
+from app.services.analysis_service import ANALYSIS_GRAPH, gemini_analyze
+
+
+def test_gemini_stage_waits_for_landmarks():
+    stage = ANALYSIS_GRAPH.stages["gemini"]
+    assert stage.needs == ("decode",)
+    assert "landmarks" in stage.after
+
+
+def test_gemini_stage_reuses_decode_and_landmarks(monkeypatch):
+    calls = []
+
+    async def analyze(image, points=None):
+        calls.append((image, points))
+        return {"ok": True}
+
+    monkeypatch.setattr(analysis_service.GeminiVTOService, "analyze_face_for_vto", analyze)
+    decoded, points = object(), np.zeros((478, 2), dtype=np.float32)
+
+    asyncio.run(gemini_analyze({"decode": decoded, "landmarks": {"points": points}}))
+    asyncio.run(gemini_analyze({"decode": decoded}))   # no face: full-frame crop
+
+    assert calls[0][0] is decoded and calls[0][1] is points
+    assert calls[1] == (decoded, None)
@@ -0,0 +1,72 @@
+import contextlib
+import cv2
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from app.services import credit_card_measurement_service as module
+from app.services.credit_card_measurement_service import CreditCardMeasurementService as svc
+from app.utils.preprocessing import DecodedImage
+
+SIZE = (3000, 2000)
+
+
+def scene(cards=((2000, 1400, 856, 540),), seed=0):
+    """Gray noisy frame with white card rectangles (cx, cy, w, h)."""
+    w, h = SIZE
+    rng = np.random.default_rng(seed)
+    rgb = np.clip(rng.normal(90, 4, (h, w, 3)), 0, 255).astype(np.uint8)
+    for cx, cy, cw, ch in cards:
+        cv2.rectangle(rgb, (cx - cw // 2, cy - ch // 2), (cx + cw // 2, cy + ch // 2), (235, 235, 235), -1)
+    return DecodedImage.from_rgb(rgb)
+
+
+def face(x0, y0, x1, y1):
+    return np.array([[x0, y0], [x1, y0], [x0, y1], [x1, y1]], dtype=np.float32)
+
+
+def test_roi_card_is_measured_at_full_resolution():
+    image = scene()
+    width = svc.detect_card_width(image, face(1700, 400, 2300, 1100))
+    assert width == pytest.approx(svc.detect_credit_card_width_px(None, gray=image.gray), abs=1)
+
+
+def test_card_outside_roi_falls_back_to_full_frame():
+    image = scene(cards=((500, 1600, 856, 540),))
+    width = svc.detect_card_width(image, face(2300, 200, 2700, 700))
+    assert width == pytest.approx(857, abs=3)
+
+
+@pytest.mark.parametrize("points", [
+    face(3500, 200, 3900, 700),     # right of the image
+    face(-900, -900, -400, -300),   # above and left of it
+    face(1000, 2500, 1400, 2900),   # below it
+])
+def test_off_image_landmarks_do_not_break_the_search(points):
+    assert svc.detect_card_width(scene(), points) == pytest.approx(857, abs=3)
+
+
+def test_roi_is_clamped_to_the_image():
+    assert svc.search_roi(face(2800, 1900, 3200, 2300), SIZE) == (2400, 1700, 3000, 2000)
+    assert svc.search_roi(face(3500, 200, 3900, 700), SIZE) is None
+
+
+def test_no_card_raises():
+    with pytest.raises(Exception, match="Credit card not detected"):
+        svc.detect_card_width(scene(cards=()), face(1700, 400, 2300, 1100))
+
+
+@pytest.fixture
+def no_face(monkeypatch):
+    detector = SimpleNamespace(detect=lambda image: SimpleNamespace(face_landmarks=[]))
+    pool = SimpleNamespace(detector=lambda: contextlib.nullcontext(detector))
+    monkeypatch.setattr(module, "face_landmarker_pool", lambda: pool)
+
+
+def test_missing_card_is_reported_before_missing_face(no_face):
+    with pytest.raises(Exception, match="Credit card not detected"):
+        svc.process(scene(cards=()))
+
+
+def test_missing_face_is_reported_when_card_is_present(no_face):
+    with pytest.raises(Exception, match="No face detected"):
+        svc.process(scene())
@@ -0,0 +1,107 @@
+import itertools
+import threading
+import time
+import pytest
+from app.services.detector_pool import DetectorPool, DetectorPoolTimeout
+
+
+class Detector:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(size=2, timeout=0.05):
+    counter = itertools.count()
+    return DetectorPool("test", lambda: Detector(next(counter)), size=size, timeout=timeout)
+
+
+def test_most_recently_returned_detector_is_reused_first():
+    pool = make_pool(size=3)
+    a, b, c = pool.checkout(), pool.checkout(), pool.checkout()
+    pool.checkin(a)
+    pool.checkin(c)
+
+    assert pool.checkout() is c
+    assert pool.checkout() is a
+    pool.checkin(b)
+    assert pool.checkout() is b
+
+
+def test_instances_are_created_on_demand_up_to_size():
+    pool = make_pool(size=2)
+    with pool.detector() as first:
+        assert pool.stats()["created"] == 1
+    with pool.detector() as again:
+        assert again is first
+        with pool.detector():
+            assert pool.stats() == {"size": 2, "created": 2, "in_use": 2, "waits": 0, "timeouts": 0}
+
+
+def test_checkout_times_out_when_every_detector_is_busy():
+    pool = make_pool(size=1, timeout=0.05)
+    with pool.detector():
+        started = time.monotonic()
+        with pytest.raises(DetectorPoolTimeout, match="No test detector available after 0.05s"):
+            pool.checkout()
+        assert time.monotonic() - started >= 0.05
+    assert pool.stats()["timeouts"] == 1
+    assert pool.stats()["in_use"] == 0
+
+
+def test_waiter_gets_the_detector_when_it_is_returned():
+    pool = make_pool(size=1, timeout=2)
+    held = pool.checkout()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.checkout()))
+    waiter.start()
+    time.sleep(0.05)
+    pool.checkin(held)
+    waiter.join(2)
+
+    assert got == [held]
+    assert pool.stats()["waits"] == 1
+
+
+def test_prefill_creates_instances_ahead_of_traffic():
+    pool = make_pool(size=3)
+    pool.prefill(2)
+    assert pool.stats()["created"] == 2
+    pool.prefill()
+    assert pool.stats()["created"] == 3
+    pool.prefill(10)   # never beyond size
+    assert pool.stats()["created"] == 3
+
+
+def test_failed_factory_does_not_use_up_a_slot():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("model file missing")
+        return Detector(len(calls))
+
+    pool = DetectorPool("test", factory, size=1)
+    with pytest.raises(RuntimeError):
+        pool.checkout()
+    assert pool.checkout().number == 2
+
+
+def test_close_closes_idle_detectors():
+    pool = make_pool(size=2)
+    pool.prefill()
+    idle = [pool.checkout(), pool.checkout()]
+    for detector in idle:
+        pool.checkin(detector)
+    pool.close()
+    assert all(detector.closed for detector in idle)
+    assert pool.stats()["created"] == 0
+
+
+def test_size_must_be_positive():
+    with pytest.raises(ValueError):
+        DetectorPool("test", object, size=0)
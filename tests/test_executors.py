@@ -0,0 +1,64 @@
+import asyncio
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from app import main
+from app.utils import deadline
+from app.utils.executors import BoundedExecutor, ExecutorBusyError
+
+
+@pytest.fixture
+def executor():
+    executor = BoundedExecutor("test", max_workers=1, max_pending=2)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def test_submit_beyond_the_pending_cap_is_rejected(executor):
+    gate = threading.Event()
+    running = threading.Event()
+
+    def block():
+        running.set()
+        gate.wait(5)
+
+    first = executor.submit(block)
+    running.wait(5)
+    second = executor.submit(block)
+
+    with pytest.raises(ExecutorBusyError, match="test pool is saturated \\(2 pending\\)"):
+        executor.submit(block)
+    assert executor.stats() == {
+        "workers": 1, "max_pending": 2, "running": 1, "queued": 1, "completed": 0, "rejected": 1
+    }
+
+    gate.set()
+    first.result(5)
+    second.result(5)
+    executor.submit(lambda: None).result(5)   # room again once work finishes
+    stats = executor.stats()
+    assert (stats["running"], stats["queued"], stats["completed"]) == (0, 0, 3)
+
+
+def test_run_awaits_on_a_worker_thread_with_the_request_context(executor):
+    async def scenario():
+        with deadline.deadline_scope(5):
+            return await executor.run(lambda: (threading.current_thread().name, deadline.remaining()))
+
+    name, remaining = asyncio.run(scenario())
+    assert name.startswith("test-worker")
+    assert 0 < remaining <= 5
+
+
+def test_zero_max_pending_means_unbounded():
+    executor = BoundedExecutor("test", max_workers=1, max_pending=0)
+    futures = [executor.submit(lambda: None) for _ in range(50)]
+    assert all(future.result(5) is None for future in futures)
+    assert executor.stats()["rejected"] == 0
+    executor.shutdown()
+
+
+def test_metrics_reports_both_pools():
+    body = TestClient(main.app).get("/metrics").json()
+    for pool in ("cpu", "io"):
+        assert set(body["executors"][pool]) == {"workers", "max_pending", "running", "queued", "completed", "rejected"}
@@ -0,0 +1,138 @@
+"""
+Several photos of one face -> one measurement: median/MAD outlier rejection
+in face_geometry and the /landmarks/detect-batch counts built on it.
+"""
+import asyncio
+import numpy as np
+import pytest
+from app.routes import landmark_detector
+from app.services import face_geometry
+from app.services.iris_landmark_service import IrisLandmarkService
+
+
+def face_points(pd_px=100.0, face_width_px=200.0):
+    """Synthetic landmarks: 20 px irises, eyes pd_px apart, jaw face_width_px wide."""
+    points = np.zeros((478, 2))
+    points[face_geometry.JAW_LEFT] = (100, 300)
+    points[face_geometry.JAW_RIGHT] = (100 + face_width_px, 300)
+    points[face_geometry.CHIN] = (200, 500)
+    points[face_geometry.FOREHEAD] = (200, 100)
+    points[474], points[476] = (140, 250), (160, 250)
+    points[469], points[471] = (140 + pd_px, 250), (160 + pd_px, 250)
+    points[face_geometry.LEFT_IRIS_CENTER] = (150, 250)
+    points[face_geometry.RIGHT_IRIS_CENTER] = (150 + pd_px, 250)
+    points[face_geometry.NOSE_TIP] = (150 + pd_px / 2, 320)
+    points[132], points[361] = (120, 400), (100 + face_width_px - 20, 400)
+    return points
+
+
+def mad_list(values, k=3.0):
+    return face_geometry.mad_inliers(values, k).tolist()
+
+
+def test_mad_inliers_drops_value_beyond_three_mads():
+    values = np.array([62.0, 62.5, 61.8, 62.2, 70.0])
+    assert mad_list(values) == [True, True, True, True, False]
+    # A looser k keeps it
+    assert face_geometry.mad_inliers(values, k=50).all()
+
+
+def test_mad_inliers_ignores_nan_and_keeps_small_samples():
+    assert mad_list([62.0, np.nan, 62.4, 61.9, 75.0]) == [True, False, True, True, False]
+    # Fewer than 3 finite values: nothing to compare against, keep them all
+    assert mad_list([62.0, np.nan, 90.0]) == [True, False, True]
+    assert mad_list([np.nan, np.nan, np.nan]) == [False, False, False]
+
+
+def test_mad_inliers_with_zero_mad_keeps_only_the_median():
+    assert mad_list([62.0, 62.0, 62.0, 63.0]) == [True, True, True, False]
+
+
+def test_aggregate_takes_median_of_inliers():
+    stack = face_geometry.measure(np.stack([face_points(pd) for pd in (99, 100, 100.5, 101, 140)]))
+    m, inliers = face_geometry.aggregate(stack)
+
+    assert inliers.tolist() == [True, True, True, True, False]
+    # large face -> 12.5 mm iris over 20 px
+    assert m.pd_horizontal == pytest.approx(100.25 * 0.625)
+    assert m.face_width == pytest.approx(200 * 0.625)
+    assert m.face_class == "large"
+
+
+def test_aggregate_without_valid_faces_raises():
+    flat = face_points()
+    flat[[474, 476, 469, 471]] = 0  # zero iris diameter -> NaN row
+    stack = face_geometry.measure(np.stack([flat, flat, flat]))
+    with pytest.raises(Exception, match="No consistent measurement across images"):
+        face_geometry.aggregate(stack)
+
+
+def fake_detect(points_by_image):
+    async def detect(image):
+        points = points_by_image[image]
+        if points is None:
+            raise Exception("No face detected")
+        return points
+    return detect
+
+
+def test_detect_landmarks_batch_counts_images():
+    points_by_image = {
+        b"a": face_points(100), b"b": face_points(101), b"c": None,
+        b"d": face_points(99), b"e": face_points(140),
+    }
+    result = asyncio.run(IrisLandmarkService.detect_landmarks_batch(
+        list(points_by_image), detect=fake_detect(points_by_image)
+    ))
+
+    assert result["images"] == {"received": 5, "measured": 4, "used": 3}
+    assert result["per_image"][2] == {"index": 2, "error": "No face detected"}
+    assert [row.get("inlier") for row in result["per_image"]] == [True, True, None, True, False]
+    assert result["mm"]["pd"] == pytest.approx(100 * 0.625, abs=0.1)
+
+
+def test_detect_landmarks_batch_without_any_face_raises():
+    with pytest.raises(Exception, match="No face detected in any image"):
+        asyncio.run(IrisLandmarkService.detect_landmarks_batch(
+            [b"a", b"b"], detect=fake_detect({b"a": None, b"b": None})
+        ))
+
+
+class FakeUpload:
+    def __init__(self, data):
+        self.data = data
+
+    async def read(self):
+        return self.data
+
+
+def test_detect_batch_route_persists_aggregate(monkeypatch):
+    points_by_image = {b"a": face_points(100), b"b": face_points(102), b"c": None}
+    saved = {}
+
+    async def run_inference(kind, image):
+        assert kind == "points"
+        return await fake_detect(points_by_image)(image)
+
+    async def update_measurements(**kwargs):
+        saved.update(kwargs)
+
+    monkeypatch.setattr(landmark_detector, "run_inference", run_inference)
+    monkeypatch.setattr(landmark_detector, "update_measurements", update_measurements)
+
+    response = asyncio.run(landmark_detector.detect_landmarks_batch(
+        [FakeUpload(image) for image in points_by_image], guest_id="g1", session_id="s1"
+    ))
+
+    assert response["success"] is True
+    assert response["landmarks"]["images"] == {"received": 3, "measured": 2, "used": 2}
+    assert saved["guest_id"] == "g1" and saved["session_id"] == "s1"
+    assert saved["mm"] == response["landmarks"]["mm"]
+
+
+def test_detect_batch_route_rejects_too_many_images(monkeypatch):
+    monkeypatch.setattr(landmark_detector.settings, "LANDMARK_BATCH_MAX_IMAGES", 2)
+    response = asyncio.run(landmark_detector.detect_landmarks_batch(
+        [FakeUpload(b"x")] * 3, guest_id="g1", session_id="s1"
+    ))
+    assert response == {"success": False, "error": "At most 2 images per request"}
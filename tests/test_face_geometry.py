@@ -0,0 +1,140 @@
+"""
+face_geometry must reproduce the baseline per-point implementations of
+/landmarks/detect (iris scale) and /landmarks/credit-card exactly.
+"""
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from app.services import face_geometry
+from app.services.credit_card_measurement_service import CreditCardMeasurementService
+from app.services.iris_landmark_service import IrisLandmarkService
+
+
+def _dist(p1, p2):
+    return ((p1[0] - p2[0]) ** 2 + (p1[1] - p2[1]) ** 2) ** 0.5
+
+
+def baseline_iris(face, w, h):
+    points = [(int(l.x * w), int(l.y * h)) for l in face]
+    face_width_px = _dist(points[234], points[454])
+    face_height_px = _dist(points[152], points[10])
+    iris_mm = 10.5 if face_width_px < 120 else 11.7 if face_width_px < 160 else 12.5
+
+    iris_diameter_px = (_dist(points[474], points[476]) + _dist(points[469], points[471])) / 2
+    if iris_diameter_px <= 0:
+        raise Exception("Invalid iris detection")
+    mm_per_pixel = iris_mm / iris_diameter_px
+
+    left_eye, right_eye = points[468], points[473]
+    pd_mm = abs(left_eye[0] - right_eye[0]) * mm_per_pixel
+    mid_x = (left_eye[0] + right_eye[0]) / 2
+    face_width_mm = face_width_px * mm_per_pixel
+    face_height_mm = face_height_px * mm_per_pixel
+
+    ratio = face_width_mm / face_height_mm
+    if ratio > 0.90:
+        shape = "round"
+    elif 0.85 <= ratio <= 0.90:
+        shape = "square"
+    elif 0.75 <= ratio < 0.85:
+        shape = "oval"
+    else:
+        shape = "rectangle"
+
+    return {
+        "scale": {"mm_per_pixel": round(mm_per_pixel, 4), "iris_diameter_px": round(iris_diameter_px, 2)},
+        "mm": {
+            "pd": round(pd_mm, 1),
+            "pd_left": round(abs(mid_x - left_eye[0]) * mm_per_pixel, 1),
+            "pd_right": round(abs(right_eye[0] - mid_x) * mm_per_pixel, 1),
+            "face_width": round(face_width_mm, 1),
+            "face_height": round(face_height_mm, 1),
+            "face_ratio": round(ratio, 2),
+            "nose_bridge_left": round(_dist(points[1], points[94]) * mm_per_pixel, 1),
+            "nose_bridge_right": round(_dist(points[1], points[331]) * mm_per_pixel, 1)
+        },
+        "face_shape": shape
+    }
+
+
+def baseline_card(face, w, h, card_width_px):
+    points = [(int(l.x * w), int(l.y * h)) for l in face]
+    mm_per_pixel = 85.6 / card_width_px
+    left_eye, right_eye, nose = points[468], points[473], points[1]
+    pd_left = _dist(left_eye, nose) * mm_per_pixel
+    pd_right = _dist(right_eye, nose) * mm_per_pixel
+    width = _dist(points[234], points[454]) * mm_per_pixel
+    height = _dist(points[152], points[10]) * mm_per_pixel
+    chin = _dist(points[132], points[361]) * mm_per_pixel
+
+    ratio = width / height
+    if ratio > 0.9:
+        shape = "round"
+    elif 0.85 <= ratio <= 0.9:
+        shape = "square"
+    elif 0.75 <= ratio < 0.85:
+        shape = "oval"
+    elif chin < width * 0.7:
+        shape = "heart"
+    else:
+        shape = "rectangle"
+
+    return {
+        "scale": {"reference": "credit_card", "card_width_px": round(card_width_px, 1),
+                  "mm_per_pixel": round(mm_per_pixel, 4)},
+        "mm": {
+            "pd": round(_dist(left_eye, right_eye) * mm_per_pixel, 1),
+            "pd_left": round(pd_left, 1),
+            "pd_right": round(pd_right, 1),
+            "nose_left": round(pd_left, 1),
+            "nose_right": round(pd_right, 1),
+            "face_width": round(width, 1),
+            "face_height": round(height, 1)
+        },
+        "face_shape": shape
+    }
+
+
+def random_faces(count, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        w, h = int(rng.integers(300, 4000)), int(rng.integers(300, 4000))
+        xy = rng.uniform(-0.05, 1.05, (478, 2))
+        yield [SimpleNamespace(x=float(x), y=float(y)) for x, y in xy], w, h
+
+
+def test_iris_endpoint_matches_baseline():
+    shapes = set()
+    for face, w, h in random_faces(2000):
+        try:
+            expected = baseline_iris(face, w, h)
+        except (Exception, ZeroDivisionError):
+            continue
+        points = face_geometry.landmarks_to_array(face, w, h)
+        assert IrisLandmarkService.to_response(face_geometry.measure(points)) == expected
+        shapes.add(expected["face_shape"])
+    assert "rectangle" in shapes and "heart" not in shapes
+
+
+def test_credit_card_endpoint_matches_baseline():
+    rng = np.random.default_rng(1)
+    shapes = set()
+    for face, w, h in random_faces(2000, seed=1):
+        card_width_px = float(rng.uniform(100, 900))
+        try:
+            expected = baseline_card(face, w, h, card_width_px)
+        except ZeroDivisionError:
+            continue
+        points = face_geometry.landmarks_to_array(face, w, h)
+        assert CreditCardMeasurementService.measure_points(points, card_width_px) == expected
+        shapes.add(expected["face_shape"])
+    assert {"heart", "rectangle"} <= shapes
+
+
+def test_stack_measurement_matches_per_face_measurement():
+    faces = [face_geometry.landmarks_to_array(face, w, h) for face, w, h in random_faces(20, seed=2)]
+    stack = face_geometry.measure(np.stack(faces), mm_per_pixel=0.25)
+    for i, points in enumerate(faces):
+        single = face_geometry.measure(points, mm_per_pixel=0.25)
+        assert single.face_shape == stack.face_shape[i]
+        assert single.pd == pytest.approx(stack.pd[i])
@@ -0,0 +1,41 @@
+import pytest
+from app.services.gemini_image_prep import PREP_SETTINGS
+from app.services.gemini_vto_service import GeminiVTOService
+from app.services.glasses_removal import cache_version
+from app.utils.settings import settings
+
+CHANGED = {
+    "GEMINI_IMAGE_LONG_EDGE": 768,
+    "GEMINI_IMAGE_FORMAT": "webp",
+    "GEMINI_IMAGE_QUALITY": 70,
+    "GEMINI_CROP_MARGIN": 0.5,
+    "GEMINI_PASTE_QUALITY": 80,
+}
+
+
+def test_every_prep_setting_is_covered():
+    assert set(PREP_SETTINGS) <= set(CHANGED)
+
+
+@pytest.mark.parametrize("name", sorted(CHANGED))
+def test_removal_version_changes_with_each_setting(monkeypatch, name):
+    before = cache_version()
+    monkeypatch.setattr(settings, name, CHANGED[name])
+    assert cache_version() != before
+
+
+@pytest.mark.parametrize("name", PREP_SETTINGS)
+def test_analysis_version_changes_with_each_prep_setting(monkeypatch, name):
+    before = GeminiVTOService.cache_version()
+    monkeypatch.setattr(settings, name, CHANGED[name])
+    assert GeminiVTOService.cache_version() != before
+
+
+def test_fields_are_separated(monkeypatch):
+    # "10" + "24jpeg" must not collide with "102" + "4jpeg"
+    monkeypatch.setattr(settings, "GEMINI_IMAGE_LONG_EDGE", 10)
+    monkeypatch.setattr(settings, "GEMINI_IMAGE_FORMAT", "24jpeg")
+    first = cache_version()
+    monkeypatch.setattr(settings, "GEMINI_IMAGE_LONG_EDGE", 102)
+    monkeypatch.setattr(settings, "GEMINI_IMAGE_FORMAT", "4jpeg")
+    assert cache_version() != first
@@ -0,0 +1,195 @@
+import asyncio
+import time
+from collections import deque
+from types import SimpleNamespace
+import httpx
+import pytest
+from app.services import gemini_gateway as module
+from app.services.gemini_gateway import CircuitBreaker, GeminiGateway, GeminiUnavailableError
+from app.utils.deadline import deadline_scope
+
+
+class FakeModels:
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.calls = 0
+
+    async def generate_content(self, model, contents, config):
+        self.calls += 1
+        return await self.behaviour()
+
+    async def generate_content_stream(self, model, contents, config):
+        self.calls += 1
+        return await self.behaviour()
+
+
+def make_gateway(monkeypatch, behaviour, cooldown=0.0):
+    gateway = GeminiGateway(max_concurrency=8, default_model_concurrency=8, model_limits={}, max_connections=8)
+    models = FakeModels(behaviour)
+    monkeypatch.setattr(gateway, "client", lambda api_key=None: SimpleNamespace(models=models))
+    monkeypatch.setattr(gateway, "_breaker", lambda model, b=CircuitBreaker(10, 2, 0.5, cooldown): b)
+    return gateway, models
+
+
+def test_breaker_opens_then_a_half_open_probe_closes_it():
+    breaker = CircuitBreaker(window=10, min_calls=2, error_rate=0.5, cooldown=0.0)
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == "half_open"   # cooldown 0: straight to half-open
+
+    assert breaker.allow()
+    assert not breaker.allow()             # one probe at a time
+    breaker.record(True)
+    assert breaker.state == "closed"
+
+
+def test_cancelled_probe_frees_the_half_open_slot(monkeypatch):
+    async def hang():
+        await asyncio.sleep(10)
+
+    gateway, _ = make_gateway(monkeypatch, hang)
+    breaker = gateway._breaker("m")
+    breaker.record(False)
+    breaker.record(False)
+
+    async def main():
+        probe = asyncio.create_task(gateway.generate_content("m", ["hi"]))
+        await asyncio.sleep(0.01)
+        assert not breaker.allow()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(main())
+    assert breaker.allow()
+
+
+def test_open_circuit_fails_fast(monkeypatch):
+    async def ok():
+        return SimpleNamespace(candidates=[])
+
+    gateway, models = make_gateway(monkeypatch, ok, cooldown=60.0)
+    breaker = gateway._breaker("m")
+    breaker.record(False)
+    breaker.record(False)
+
+    with pytest.raises(GeminiUnavailableError):
+        asyncio.run(gateway.generate_content("m", ["hi"]))
+    assert models.calls == 0
+
+
+def chunk(data=None, text=None):
+    inline = SimpleNamespace(data=data, mime_type="image/png") if data else None
+    part = SimpleNamespace(inline_data=inline, text=text)
+    return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+
+def streaming(*chunks):
+    async def behaviour():
+        async def stream():
+            for item in chunks:
+                yield item
+        return stream()
+    return behaviour
+
+
+def tripped(gateway):
+    breaker = gateway._breaker("m")
+    breaker.record(False)
+    breaker.record(False)
+    return breaker
+
+
+def test_stream_parts_yields_raw_parts_and_closes_the_circuit(monkeypatch):
+    gateway, _ = make_gateway(monkeypatch, streaming(chunk(text="ok"), chunk(data=b"\x89PNG")))
+    breaker = tripped(gateway)
+
+    async def main():
+        return [part async for part in gateway.stream_parts("m", ["hi"])]
+
+    assert asyncio.run(main()) == [("text/plain", "ok"), ("image/png", b"\x89PNG")]
+    assert breaker.state == "closed"
+    assert gateway.stats()["bytes_received"] == 6
+
+
+def test_stream_consumer_stopping_early_frees_the_probe_slot(monkeypatch):
+    gateway, _ = make_gateway(monkeypatch, streaming(chunk(data=b"a"), chunk(data=b"b")))
+    breaker = tripped(gateway)
+
+    async def main():
+        parts = gateway.stream_parts("m", ["hi"])
+        async for _ in parts:
+            break
+        await parts.aclose()
+
+    asyncio.run(main())
+    assert breaker.state == "half_open"   # no outcome recorded
+    assert breaker.allow()                # but the probe slot is free again
+    assert gateway.stats()["in_flight"] == 0
+
+
+def test_retries_back_off_with_jitter_and_stop_inside_the_deadline(monkeypatch):
+    async def unreachable():
+        raise httpx.ConnectError("connection refused")
+
+    gateway, models = make_gateway(monkeypatch, unreachable)
+    monkeypatch.setattr(module.settings, "GEMINI_MAX_RETRIES", 10)
+    monkeypatch.setattr(module.settings, "GEMINI_RETRY_BASE_MS", 300)
+    monkeypatch.setattr(module.settings, "GEMINI_RETRY_MAX_MS", 4000)
+    caps = []
+    monkeypatch.setattr(module.random, "uniform", lambda low, high: caps.append(high) or high)
+
+    async def main():
+        with deadline_scope(2.0):
+            await gateway.generate_content("m", ["hi"])
+
+    started = time.monotonic()
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(main())
+
+    # 0.3 s and 0.6 s backoffs fit; a third (1.2 s) would leave < 1 s for the attempt
+    assert caps == [300, 600, 1200]
+    assert models.calls == 3
+    assert gateway.stats()["retries"] == 2
+    assert time.monotonic() - started < 2.0
+
+
+def test_slow_call_is_hedged_after_p95_and_the_loser_cancelled(monkeypatch):
+    cancelled = []
+
+    async def behaviour():
+        if models.calls == 1:
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        return SimpleNamespace(candidates=[], call=models.calls)
+
+    gateway, models = make_gateway(monkeypatch, behaviour)
+    monkeypatch.setattr(module.settings, "GEMINI_HEDGE_ENABLED", True)
+    monkeypatch.setattr(module.settings, "GEMINI_HEDGE_MIN_SAMPLES", 5)
+    gateway._latencies["m"] = deque([0.01, 0.02, 0.03, 0.04, 0.05, 0.5])
+    assert gateway._hedge_delay("m") == 0.05
+
+    async def main():
+        response = await gateway.generate_content("m", ["hi"])
+        await asyncio.sleep(0.01)   # let the loser's cancellation land
+        return response, list(cancelled)
+
+    started = time.monotonic()
+    response, cancelled_before_shutdown = asyncio.run(main())
+
+    assert response.call == 2
+    assert time.monotonic() - started < 1.0
+    assert cancelled_before_shutdown == [True]
+    stats = gateway.stats()
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 1)
+
+
+def test_no_hedge_without_enough_samples(monkeypatch):
+    gateway, _ = make_gateway(monkeypatch, None)
+    monkeypatch.setattr(module.settings, "GEMINI_HEDGE_ENABLED", True)
+    monkeypatch.setattr(module.settings, "GEMINI_HEDGE_MIN_SAMPLES", 20)
+    gateway._latencies["m"] = deque([0.1] * 5)
+    assert gateway._hedge_delay("m") is None
@@ -0,0 +1,51 @@
+import io
+import numpy as np
+import pytest
+from PIL import Image
+from app.services import gemini_image_prep
+from app.services.gemini_image_prep import face_box, prepare_for_gemini
+from app.utils.preprocessing import DecodedImage
+
+POINTS = np.array([[800, 600], [1200, 600], [800, 1100], [1200, 1100]], dtype=np.float32)
+
+
+def photo(size=(2000, 1500)) -> DecodedImage:
+    rng = np.random.default_rng(0)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)).save(buffer, "JPEG", quality=90)
+    return DecodedImage(buffer.getvalue())
+
+
+@pytest.fixture
+def detections(monkeypatch):
+    calls = []
+
+    def detect_points(decoded):
+        calls.append(decoded)
+        return POINTS
+
+    monkeypatch.setattr(gemini_image_prep.IrisLandmarkService, "detect_points", detect_points)
+    return calls
+
+
+def test_given_points_are_not_detected_again(detections):
+    decoded = photo()
+    assert face_box(decoded, 0.25, POINTS) == face_box(decoded, 0.25)
+    assert len(detections) == 1
+
+
+def test_prepare_for_gemini_crops_to_the_given_points(detections, monkeypatch):
+    monkeypatch.setattr(gemini_image_prep.settings, "GEMINI_IMAGE_LONG_EDGE", 1024)
+    monkeypatch.setattr(gemini_image_prep.settings, "GEMINI_CROP_MARGIN", 0.25)
+
+    prepared = prepare_for_gemini(photo(), points=POINTS)
+    assert prepared.box == (700, 412, 1300, 1225)
+    assert detections == []
+
+
+def test_no_face_sends_the_full_frame(monkeypatch):
+    def no_face(decoded):
+        raise Exception("No face detected")
+
+    monkeypatch.setattr(gemini_image_prep.IrisLandmarkService, "detect_points", no_face)
+    assert face_box(photo(), 0.25) == (0, 0, 2000, 1500)
@@ -0,0 +1,84 @@
+import multiprocessing
+import os
+import numpy as np
+import pytest
+import torch
+import torch.nn as nn
+from PIL import Image
+from torchvision.models import resnet18
+from app.glasses.backends import EagerBackend, QuantizedBackend, export_onnx, face_samples, split_samples
+from app.glasses.detector import GlassesDetector
+from app.services.glasses_service import GlassesService
+
+
+@pytest.fixture(scope="module")
+def model_path(tmp_path_factory):
+    torch.manual_seed(0)
+    model = resnet18(weights=None)
+    model.fc = nn.Linear(512, 2)
+    path = tmp_path_factory.mktemp("model") / "glasses.pth"
+    torch.save(model.state_dict(), path)
+    return str(path)
+
+
+@pytest.fixture
+def crops_dir(tmp_path):
+    rng = np.random.default_rng(0)
+    for i in range(6):
+        # Smooth, photo-like gradients rather than per-pixel noise
+        ramp = np.linspace(0, 255, 160, dtype=np.float32)
+        rgb = np.stack([np.add.outer(ramp, ramp) / 2, np.tile(ramp, (160, 1)), np.full((160, 160), 40.0 * i)], axis=2)
+        rgb += rng.normal(0, 4, rgb.shape)
+        Image.fromarray(np.clip(rgb, 0, 255).astype(np.uint8)).save(tmp_path / f"face_{i}.jpg")
+    return str(tmp_path)
+
+
+def test_static_quantization_refuses_to_calibrate_without_crops(model_path):
+    detector = GlassesDetector(model_path)
+    with pytest.raises(Exception, match="calibration"):
+        QuantizedBackend(detector.model, "static")
+
+
+def test_dynamic_quantization_only_touches_the_fc_head(model_path):
+    backend = QuantizedBackend(GlassesDetector(model_path).model, "dynamic")
+    assert type(backend.model.conv1) is nn.Conv2d
+    assert type(backend.model.fc) is not nn.Linear
+
+
+def test_non_eager_backend_without_crops_falls_back_to_eager(model_path):
+    detector = GlassesDetector(model_path, backend="torchscript")
+    assert isinstance(detector.backend, EagerBackend)
+    # Cached results are keyed by the backend that serves them, not the one configured
+    assert GlassesService.cache_version(detector).startswith("resnet18/eager/")
+
+
+def test_backend_is_verified_on_held_out_crops(model_path, crops_dir):
+    detector = GlassesDetector(model_path, backend="torchscript", calibration_dir=crops_dir)
+    assert detector.backend.name == "torchscript"
+    assert GlassesService.cache_version(detector).startswith("resnet18/torchscript/")
+
+    samples = face_samples(crops_dir, detector.preprocess)
+    calibration, held_out = split_samples(samples)
+    assert samples.shape == (6, 3, 224, 224)
+    assert sum(len(batch) for batch in calibration) + len(held_out) == 6
+
+
+def _export(model, onnx_path):
+    export_onnx(model, onnx_path)
+
+
+def test_concurrent_onnx_exports_do_not_clobber_each_other(model_path, tmp_path):
+    pytest.importorskip("onnx")
+    model = GlassesDetector(model_path).model
+    onnx_path = str(tmp_path / "glasses.onnx")
+
+    # Separate processes, like inference workers exporting on first load
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_export, args=(model, onnx_path)) for _ in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+
+    assert [process.exitcode for process in processes] == [0, 0, 0]
+    assert os.listdir(tmp_path) == ["glasses.onnx"]
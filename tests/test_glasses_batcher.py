@@ -0,0 +1,65 @@
+import threading
+import pytest
+import torch
+from app.glasses.batcher import GlassesBatcher
+
+
+class FakeDetector:
+    """Returns each row's first value as the confidence; records batch sizes."""
+
+    def __init__(self, fail=False):
+        self.batch_sizes = []
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+
+    def predict_tensors(self, batch):
+        self.release.wait()
+        self.batch_sizes.append(len(batch))
+        if self.fail:
+            raise RuntimeError("model exploded")
+        return [{"glasses_detected": True, "confidence": float(row[0])} for row in batch]
+
+
+def submit_all(batcher, values):
+    return [batcher.submit_tensor(torch.tensor([float(v)])) for v in values]
+
+
+def test_concurrent_requests_share_a_forward_pass_and_keep_their_own_results():
+    detector = FakeDetector()
+    detector.release.clear()
+    batcher = GlassesBatcher(detector, max_batch_size=4, max_wait_ms=50)
+    try:
+        # Hold the worker on the first item so the rest queue up behind it
+        first = batcher.submit_tensor(torch.tensor([99.0]))
+        futures = submit_all(batcher, range(6))
+        detector.release.set()
+
+        assert first.result(timeout=5)["confidence"] == 99.0
+        assert [f.result(timeout=5)["confidence"] for f in futures] == [0, 1, 2, 3, 4, 5]
+        assert max(detector.batch_sizes) > 1
+        assert max(detector.batch_sizes) <= 4
+        assert sum(detector.batch_sizes) == 7
+        assert batcher.stats()["items"] == 7
+    finally:
+        batcher.close()
+
+
+def test_model_error_fails_every_caller_in_the_batch():
+    batcher = GlassesBatcher(FakeDetector(fail=True), max_batch_size=8, max_wait_ms=20)
+    try:
+        futures = submit_all(batcher, range(3))
+        for future in futures:
+            with pytest.raises(RuntimeError, match="model exploded"):
+                future.result(timeout=5)
+    finally:
+        batcher.close()
+
+
+def test_close_finishes_queued_work_then_stops():
+    batcher = GlassesBatcher(FakeDetector(), max_batch_size=2, max_wait_ms=1)
+    futures = submit_all(batcher, range(3))
+    batcher.close()
+
+    assert [f.result(timeout=5)["confidence"] for f in futures] == [0, 1, 2]
+    assert not batcher._thread.is_alive()
@@ -0,0 +1,87 @@
+import io
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+from app.routes import glasses_detector
+from app.routes.glasses_detector import negotiate_image_type
+
+
+def jpeg() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (120, 80, 40)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    async def fake_run_removal(image_bytes, guest_id, session_id):
+        calls.append((guest_id, session_id))
+        return {"edited_bytes": jpeg(), "bucket_path": "p"}
+
+    monkeypatch.setattr(glasses_detector, "run_removal", fake_run_removal)
+    return calls
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(glasses_detector.router)
+    return TestClient(app)
+
+
+def remove(client, accept=None, session_id="s1", **headers):
+    if accept:
+        headers["Accept"] = accept
+    return client.post(
+        "/glasses/remove",
+        params={"guest_id": "g", "session_id": session_id},
+        files={"image": ("face.jpg", b"upload", "image/jpeg")},
+        headers=headers
+    )
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("", None),
+    ("*/*", None),
+    ("application/json", None),
+    ("image/png", "image/png"),
+    ("image/webp, application/json;q=0.5", "image/webp"),
+    ("application/json, image/png;q=0.9", None),
+    ("image/avif, image/*;q=0.8", "image/*"),
+    ("image/png;q=0", None),
+])
+def test_negotiate_image_type(accept, expected):
+    assert negotiate_image_type(accept) == expected
+
+
+def test_default_accept_keeps_json_shape(client, calls):
+    body = remove(client).json()
+    assert body["success"] is True
+    assert body["edited_image_base64"]
+
+
+def test_binary_response_is_transcoded_with_etag(client, calls):
+    response = remove(client, "image/png")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["etag"]
+    assert response.headers["vary"] == "Accept"
+    assert Image.open(io.BytesIO(response.content)).format == "PNG"
+
+
+def test_not_modified_still_runs_removal_for_the_new_session(client, calls):
+    etag = remove(client, "image/png", session_id="s1").headers["etag"]
+    response = remove(client, "image/png", session_id="s2", **{"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert calls == [("g", "s1"), ("g", "s2")]
+
+
+def test_etag_differs_per_media_type(client, calls):
+    png = remove(client, "image/png").headers["etag"]
+    webp = remove(client, "image/webp").headers["etag"]
+    assert png != webp
@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from pymongo.errors import OperationFailure
+from app.db import indexes
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+
+class FakeCollection:
+    name = "virtual_tryons"
+
+    def __init__(self, duplicates=False):
+        self.duplicates = duplicates
+        self.created = []
+
+    async def create_indexes(self, models):
+        assert len(models) == 1, "each index is built on its own"
+        name = models[0].document["name"]
+        if name == indexes.UNIQUE_INDEX_NAME and self.duplicates:
+            raise OperationFailure("E11000 duplicate key error", code=11000)
+        self.created.append(name)
+        return [name]
+
+    def aggregate(self, pipeline, **kwargs):
+        return FakeCursor([{"_id": {"guest_id": "g", "session_id": "s"}, "count": 2}])
+
+
+def test_duplicates_do_not_skip_the_other_indexes_and_stop_startup(monkeypatch):
+    collection = FakeCollection(duplicates=True)
+    monkeypatch.setattr(indexes, "virtual_tryons", collection)
+    monkeypatch.setattr(indexes.settings, "MONGO_EXPLAIN_CHECK", False)
+    monkeypatch.setattr(indexes.settings, "REMOVAL_JOB_STORE", "memory")
+
+    with pytest.raises(indexes.DuplicateSessionsError, match="'guest_id': 'g'"):
+        asyncio.run(indexes.manage_indexes())
+    assert collection.created == [indexes.TTL_INDEX_NAME]
+
+
+def test_indexes_are_built(monkeypatch):
+    collection = FakeCollection()
+    monkeypatch.setattr(indexes, "virtual_tryons", collection)
+
+    assert asyncio.run(indexes.ensure_indexes()) == [indexes.UNIQUE_INDEX_NAME, indexes.TTL_INDEX_NAME]
+    assert collection.created == [indexes.UNIQUE_INDEX_NAME, indexes.TTL_INDEX_NAME]
+
@@ -0,0 +1,53 @@
+import asyncio
+import cv2
+import numpy as np
+import pytest
+from app.services import inference_workers as module
+from app.services.credit_card_measurement_service import CreditCardMeasurementService
+from app.services.inference_workers import MB, InferenceWorkers
+from app.utils.preprocessing import DecodedImage
+
+
+def card_scene(w=1200, h=900):
+    rgb = np.full((h, w, 3), 80, dtype=np.uint8)
+    cv2.rectangle(rgb, (300, 300), (728, 570), (235, 235, 235), -1)
+    return DecodedImage.from_rgb(rgb)
+
+
+@pytest.fixture(scope="module")
+def workers():
+    pool = InferenceWorkers(workers=1, slots=2, slot_bytes=4 * MB, slot_timeout=30)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def test_frames_run_in_the_worker_process(workers):
+    image = card_scene()
+
+    async def scenario():
+        return await asyncio.gather(*(workers.run("card_width", image) for _ in range(4)))
+
+    results = asyncio.run(scenario())
+    expected = CreditCardMeasurementService.detect_card_width(image)
+    assert [r["card_width_px"] for r in results] == [expected] * 4
+    stats = workers.stats()
+    assert stats["completed"] == 4
+    assert stats["slots_free"] == 2
+    assert stats["fallbacks"] == 0
+
+
+def test_frames_larger_than_a_slot_use_the_thread_pool(workers):
+    image = card_scene(w=1600, h=1200)   # 5.8 MB of RGB
+    result = asyncio.run(workers.run("card_width", image))
+    assert result["card_width_px"] == CreditCardMeasurementService.detect_card_width(image)
+    assert workers.stats()["fallbacks"] == 1
+
+
+def test_start_fails_fast_when_dev_shm_is_too_small(monkeypatch):
+    monkeypatch.setattr(module, "shm_free", lambda: 64 * MB)
+    pool = InferenceWorkers(workers=2, slots=4, slot_bytes=48 * MB, slot_timeout=1)
+
+    with pytest.raises(Exception, match=r"192 MB .* 64 MB free.*--shm-size=256m"):
+        pool.start()
+    assert not pool.started
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import pytest
+from app.routes import landmark_detector
+
+
+class FakeSession:
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.running = False
+        self.closed_while_running = None
+
+    def __call__(self):
+        return self
+
+    def process_frame(self, frame):
+        self.running = True
+        self.started.set()
+        self.release.wait(5)
+        self.running = False
+        return {"type": "measurement", "mm": {"pd": 62.0}}
+
+    def smoothed(self):
+        return {"mm": {"pd": 62.0}, "face_shape": "oval"}
+
+    def close(self):
+        self.closed_while_running = self.running
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(landmark_detector, "LiveMeasurementSession", session)
+    return session
+
+
+async def wait_until(condition):
+    for _ in range(500):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+def test_cancelled_stream_closes_session_after_the_running_frame(session):
+    async def scenario():
+        websocket = FakeWebSocket()
+        handler = asyncio.create_task(landmark_detector.live_measurement(websocket, "g", "s"))
+        await websocket.incoming.put({"type": "websocket.receive", "bytes": b"frame"})
+        await asyncio.get_running_loop().run_in_executor(None, session.started.wait, 5)
+
+        handler.cancel()
+        await asyncio.gather(handler, return_exceptions=True)
+        assert session.closed_while_running is None   # not closed under the thread
+
+        session.release.set()
+        await wait_until(lambda: session.closed_while_running is not None)
+
+    asyncio.run(scenario())
+    assert session.closed_while_running is False
+
+
+def test_failed_save_sends_an_error_and_keeps_streaming(session, monkeypatch):
+    async def failing_update(**kwargs):
+        raise Exception("Mongo unavailable")
+
+    monkeypatch.setattr(landmark_detector, "update_measurements", failing_update)
+    session.release.set()
+
+    async def scenario():
+        websocket = FakeWebSocket()
+        handler = asyncio.create_task(landmark_detector.live_measurement(websocket, "g", "s"))
+        for message in ({"bytes": b"frame"}, {"text": "save"}, {"bytes": b"frame"}):
+            expected = len(websocket.sent) + 1
+            await websocket.incoming.put({"type": "websocket.receive", **message})
+            await wait_until(lambda: len(websocket.sent) == expected)
+        await websocket.incoming.put({"type": "websocket.disconnect"})
+        await asyncio.wait_for(handler, 5)
+        return websocket.sent
+
+    sent = asyncio.run(scenario())
+    assert [message["type"] for message in sent] == ["measurement", "error", "measurement"]
+    assert sent[1]["error"] == "Mongo unavailable"
+    assert session.closed_while_running is False
@@ -0,0 +1,74 @@
+import pytest
+from fastapi.testclient import TestClient
+from app import main
+from app.services.model_registry import ModelRegistry
+
+
+class Model:
+    def __init__(self):
+        self.warmups = 0
+
+
+def make_registry(*names, fail=()):
+    registry = ModelRegistry()
+    loads = {name: 0 for name in names}
+
+    def loader(name):
+        def load():
+            loads[name] += 1
+            if name in fail:
+                raise RuntimeError(f"{name} weights missing")
+            return Model()
+        return load
+
+    def warmup(model):
+        model.warmups += 1
+
+    for name in names:
+        registry.register(name, loader(name), warmup)
+    return registry, loads
+
+
+def test_get_loads_and_warms_once():
+    registry, loads = make_registry("a")
+    model = registry.get("a")
+    assert registry.get("a") is model
+    assert loads["a"] == 1 and model.warmups == 1
+
+
+def test_load_cold_skips_warmup_until_first_get():
+    registry, loads = make_registry("a")
+    registry.load_cold("a")
+    model = registry.peek("a")
+
+    assert model.warmups == 0
+    assert not registry.is_ready()
+    assert registry.status()["a"]["state"] == "loaded"
+
+    assert registry.get("a") is model   # the inherited copy, now warmed
+    assert model.warmups == 1 and loads["a"] == 1
+    assert registry.is_ready()
+
+
+def test_ready_only_when_every_model_is_loaded():
+    registry, _ = make_registry("a", "b", fail=("b",))
+    registry.load_all()
+
+    assert not registry.is_ready()
+    assert registry.status()["a"]["state"] == "ready"
+    assert registry.status()["b"] == {"state": "error", "error": "b weights missing"}
+
+
+def test_ready_endpoint_switches_from_503_to_200(monkeypatch):
+    registry, _ = make_registry("face_landmarker", "glasses_detector")
+    monkeypatch.setattr(main, "registry", registry)
+    client = TestClient(main.app)   # no lifespan: nothing preloads
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+
+    registry.load_all()
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["models"]["glasses_detector"]["state"] == "ready"
@@ -0,0 +1,59 @@
+import io
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from PIL import Image
+from torchvision import transforms
+from app.services.glasses_service import GlassesService
+from app.utils.preprocessing import CLASSIFIER_DECODE, DecodedImage
+
+REFERENCE = transforms.Compose([transforms.Resize((224, 224)), transforms.ToTensor()])
+
+
+def photo(fmt: str, size=(1600, 1200)) -> bytes:
+    rng = np.random.default_rng(0)
+    w, h = size
+    ramp = np.add.outer(np.linspace(0, 200, h), np.linspace(0, 55, w))
+    rgb = np.stack([ramp, ramp[::-1], np.full((h, w), 90.0)], axis=2) + rng.normal(0, 6, (h, w, 3))
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(rgb, 0, 255).astype(np.uint8)).save(buffer, fmt, quality=90)
+    return buffer.getvalue()
+
+
+def reference_tensor(data: bytes):
+    return REFERENCE(Image.open(io.BytesIO(data)).convert("RGB"))
+
+
+def test_png_classifier_tensor_matches_torchvision_exactly():
+    data = photo("PNG")
+    diff = (DecodedImage(data).classifier_tensor - reference_tensor(data)).abs()
+    assert float(diff.max()) < 1e-6
+
+
+def test_jpeg_draft_decode_stays_within_a_few_levels():
+    data = photo("JPEG")
+    diff = (DecodedImage(data).classifier_tensor - reference_tensor(data)).abs()
+    assert float(diff.max()) <= 3 / 255
+    assert float(diff.mean()) <= 1 / 255
+
+
+def test_decode_path_is_part_of_the_glasses_cache_version():
+    detector = SimpleNamespace(backend=SimpleNamespace(name="eager"), preprocessing="pil")
+    assert GlassesService.cache_version(detector).endswith(CLASSIFIER_DECODE)
+
+
+@pytest.mark.parametrize("level", [1, 2, 3])
+def test_pyramid_levels_have_the_expected_size(level):
+    decoded = DecodedImage(photo("JPEG"))
+    assert decoded.pyramid(level).shape[:2] == (1200 >> level, 1600 >> level)
+
+
+def test_wrapped_arrays_without_digest_get_distinct_digests():
+    rgb = np.zeros((4, 6, 3), dtype=np.uint8)
+    other = rgb.copy()
+    other[0, 0, 0] = 1
+
+    digests = {DecodedImage.from_rgb(array).digest for array in (rgb, other, rgb.reshape(6, 4, 3))}
+    assert len(digests) == 3
+    assert DecodedImage.from_rgb(rgb).digest == DecodedImage.from_rgb(rgb.copy()).digest
+    assert DecodedImage.from_rgb(rgb, digest="upload").digest == "upload"
@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+from app.db.job_store import MemoryJobStore
+from app.services import removal_jobs as module
+from app.services.removal_jobs import RemovalJobs, RemovalQueueFull
+
+
+class SlowStore(MemoryJobStore):
+    """Yields on create, like a Mongo insert."""
+
+    async def create(self, job: dict):
+        await asyncio.sleep(0.01)
+        await super().create(job)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = SlowStore(ttl_seconds=60)
+    monkeypatch.setattr(module, "job_store", store)
+    return store
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    """run_removal blocks until the gate opens; raises for guest 'bad'."""
+    gate = asyncio.Event()
+
+    async def fake_run_removal(image_bytes, guest_id, session_id, on_stage=None):
+        await on_stage("removing")
+        await gate.wait()
+        if guest_id == "bad":
+            raise Exception("Gemini failed")
+        return {"edited_bytes": image_bytes, "bucket_path": f"{guest_id}/{session_id}.jpg"}
+
+    monkeypatch.setattr(module, "run_removal", fake_run_removal)
+    return gate
+
+
+async def wait_for_status(store, job_id, status):
+    for _ in range(200):
+        job = await store.get(job_id)
+        if job["status"] == status:
+            return job
+        await asyncio.sleep(0.005)
+    raise AssertionError(f"job {job_id} stayed {job['status']}")
+
+
+def test_jobs_run_to_done_or_failed(store, gate):
+    async def scenario():
+        jobs = RemovalJobs(workers=2, max_pending=10)
+        ok = await jobs.submit(b"img", "g", "s")
+        bad = await jobs.submit(b"img", "bad", "s")
+        gate.set()
+
+        done = await wait_for_status(store, ok["job_id"], "done")
+        failed = await wait_for_status(store, bad["job_id"], "failed")
+        await jobs.stop()
+        return done, failed, jobs.stats()
+
+    done, failed, stats = asyncio.run(scenario())
+    assert done["result"] == {"bucket_path": "g/s.jpg"}
+    assert failed["error"] == "Gemini failed"
+    assert (stats["completed"], stats["failed"]) == (1, 1)
+
+
+def test_concurrent_submits_never_overflow_the_queue(store, gate):
+    async def scenario():
+        jobs = RemovalJobs(workers=1, max_pending=3)
+        results = await asyncio.gather(
+            *(jobs.submit(b"img", "g", str(i)) for i in range(10)),
+            return_exceptions=True
+        )
+        stored = len(store._jobs)
+        await jobs.stop()
+        return results, stored
+
+    results, stored = asyncio.run(scenario())
+    accepted = [r for r in results if isinstance(r, dict)]
+    refused = [r for r in results if isinstance(r, RemovalQueueFull)]
+    assert len(accepted) + len(refused) == 10
+    assert len(accepted) <= 4   # the queue plus the job the worker took
+    assert stored == len(accepted)
+
+
+def test_stop_fails_running_and_queued_jobs(store, gate):
+    async def scenario():
+        jobs = RemovalJobs(workers=1, max_pending=10)
+        running = await jobs.submit(b"img", "g", "1")
+        queued = await jobs.submit(b"img", "g", "2")
+        await wait_for_status(store, running["job_id"], "running")
+
+        await jobs.stop()
+        return [await store.get(job["job_id"]) for job in (running, queued)], jobs.stats()
+
+    finished, stats = asyncio.run(scenario())
+    assert [job["status"] for job in finished] == ["failed", "failed"]
+    assert all(job["error"] == "Server shutting down" for job in finished)
+    assert stats["failed"] == 2
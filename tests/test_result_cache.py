@@ -0,0 +1,179 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.services.result_cache import ResultCache
+
+
+def make_cache(tmp_path=None):
+    return ResultCache(max_bytes=1024 * 1024, disk_dir=str(tmp_path) if tmp_path else None, disk_max_bytes=1 << 20)
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = make_cache()
+    calls = []
+    gate = threading.Event()
+
+    def compute():
+        calls.append(1)
+        gate.wait(5)
+        return {"value": 42}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("e", "v1", "d", compute)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{"value": 42}] * 5
+    assert cache.stats()["shared_inflight"] == 4
+
+
+def test_results_are_copies_and_exceptions_are_not_cached():
+    cache = make_cache()
+    value = cache.get_or_compute("e", "v1", "d", lambda: {"points": [1, 2]})
+    value["points"].append(3)
+    assert cache.get("e", "v1", "d") == {"points": [1, 2]}
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute("e", "v1", "other", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert cache.get("e", "v1", "other") is None
+    assert cache.get("e", "v2", "d") is None  # version is part of the key
+
+
+def test_disk_tier_survives_a_new_process(tmp_path):
+    make_cache(tmp_path).set("e", "v1", "d", {"ok": True})
+    fresh = ResultCache(max_bytes=1024, disk_dir=str(tmp_path))
+    assert fresh.get("e", "v1", "d") == {"ok": True}
+    assert fresh.stats()["hits_disk"] == 1
+
+
+def test_async_misses_share_one_computation():
+    cache = make_cache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"value": 7}
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_compute_async("e", "v", "d", compute) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{"value": 7}] * 5
+    assert len(calls) == 1
+
+
+def test_waiters_take_over_when_the_leader_is_cancelled():
+    cache = make_cache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"value": len(calls)}
+
+    async def main():
+        leader = asyncio.create_task(cache.get_or_compute_async("e", "v", "d", compute))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(cache.get_or_compute_async("e", "v", "d", compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()   # client disconnect
+
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*waiters)
+
+    # One waiter recomputes; the others join it instead of failing
+    assert asyncio.run(main()) == [{"value": 2}] * 3
+    assert len(calls) == 2
+
+
+def test_cancelling_a_waiter_does_not_cancel_the_leader():
+    cache = make_cache()
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return {"value": 1}
+
+    async def main():
+        leader = asyncio.create_task(cache.get_or_compute_async("e", "v", "d", compute))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_compute_async("e", "v", "d", compute))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader
+
+    assert asyncio.run(main()) == {"value": 1}
+
+
+class SlowStoreCache(ResultCache):
+    def __init__(self, tmp_path, fail=False):
+        super().__init__(max_bytes=1024 * 1024, disk_dir=str(tmp_path), disk_max_bytes=1 << 20)
+        self.fail = fail
+        self.storing = threading.Event()
+
+    def _store(self, key, value):
+        self.storing.set()
+        time.sleep(0.2)
+        if self.fail:
+            raise ValueError("disk full")
+        super()._store(key, value)
+
+
+def test_waiters_get_the_value_when_the_leader_is_cancelled_while_storing(tmp_path):
+    cache = SlowStoreCache(tmp_path)
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        return {"value": 1}
+
+    async def main():
+        leader = asyncio.create_task(cache.get_or_compute_async("e", "v", "d", compute))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_compute_async("e", "v", "d", compute))
+        await asyncio.get_running_loop().run_in_executor(None, cache.storing.wait, 5)
+        leader.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.wait_for(waiter, 3)
+
+    assert asyncio.run(main()) == {"value": 1}
+
+
+def test_waiters_get_the_value_when_the_sync_store_raises(tmp_path):
+    cache = SlowStoreCache(tmp_path, fail=True)
+    gate = threading.Event()
+    results = []
+
+    def compute():
+        gate.wait(5)
+        return {"value": 1}
+
+    def call():
+        try:
+            results.append(cache.get_or_compute("e", "v", "d", compute))
+        except ValueError as e:
+            results.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    gate.set()
+    for thread in threads:
+        thread.join(3)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert sorted(map(str, results)) == sorted(["disk full", "{'value': 1}"])
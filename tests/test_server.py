@@ -0,0 +1,48 @@
+import pytest
+from app.server import configure_workers
+from app.utils.settings import settings
+
+
+@pytest.fixture(autouse=True)
+def restore_settings(monkeypatch):
+    for name in ("CPU_WORKERS", "SESSION_CACHE_TTL_SECONDS", "SESSION_CACHE_CHANGE_STREAM", "REMOVAL_JOB_STORE"):
+        monkeypatch.setattr(settings, name, getattr(settings, name))
+    monkeypatch.setattr(settings, "SESSION_CACHE_TTL_SECONDS", 30.0)
+    monkeypatch.setattr(settings, "REMOVAL_JOB_STORE", "memory")
+
+
+def plan(workers):
+    return {"workers": workers, "threads_per_worker": 2}
+
+
+def test_single_worker_keeps_the_session_cache():
+    configure_workers(plan(1))
+    assert settings.SESSION_CACHE_TTL_SECONDS == 30.0
+
+
+def test_single_worker_keeps_the_memory_job_store():
+    configure_workers(plan(1))
+    assert settings.REMOVAL_JOB_STORE == "memory"
+
+
+def test_multiple_workers_share_removal_jobs_through_mongo():
+    configure_workers(plan(4))
+    assert settings.REMOVAL_JOB_STORE == "mongo"
+
+
+def test_multiple_workers_disable_the_session_cache_without_a_change_stream():
+    settings.SESSION_CACHE_CHANGE_STREAM = False
+    configure_workers(plan(4))
+    assert settings.SESSION_CACHE_TTL_SECONDS == 0
+
+
+def test_change_stream_keeps_the_session_cache_across_workers():
+    settings.SESSION_CACHE_CHANGE_STREAM = True
+    configure_workers(plan(4))
+    assert settings.SESSION_CACHE_TTL_SECONDS == 30.0
+
+
+def test_cpu_pool_is_split_between_workers():
+    settings.CPU_WORKERS = 0
+    configure_workers(plan(4))
+    assert settings.CPU_WORKERS == 2
@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from app.db import session_cache as module
+from app.db import virtual_tryon_repo
+from app.db.session_cache import SessionCache
+
+KEY = ("guest", "session")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_hits_are_copies():
+    cache = SessionCache(ttl_seconds=30, max_entries=10)
+    cache.set(KEY, {"status": {"done": False}}, cache.generation(KEY))
+
+    cache.get(KEY)["status"]["done"] = True
+    assert cache.get(KEY) == {"status": {"done": False}}
+    assert cache.stats()["hits"] == 2
+
+
+def test_invalidate_drops_the_entry():
+    cache = SessionCache(ttl_seconds=30, max_entries=10)
+    cache.set(KEY, {"v": 1}, cache.generation(KEY))
+    cache.invalidate(KEY)
+    assert cache.get(KEY) is None
+
+
+def test_read_that_raced_a_write_is_not_cached():
+    cache = SessionCache(ttl_seconds=30, max_entries=10)
+    generation = cache.generation(KEY)   # miss: read starts
+    cache.invalidate(KEY)                # a write lands meanwhile
+    cache.set(KEY, {"v": "old"}, generation)
+    assert cache.get(KEY) is None
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = SessionCache(ttl_seconds=30, max_entries=10)
+    cache.set(KEY, {"v": 1}, cache.generation(KEY))
+    clock[0] += 29
+    assert cache.get(KEY) == {"v": 1}
+    clock[0] += 2
+    assert cache.get(KEY) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SessionCache(ttl_seconds=30, max_entries=2)
+    for key in ("a", "b"):
+        cache.set(key, {"key": key}, cache.generation(key))
+    cache.get("a")                        # "b" is now least recent
+    cache.set("c", {"key": "c"}, cache.generation("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"key": "a"}
+    assert cache.get("c") == {"key": "c"}
+
+
+def test_missing_sessions_and_disabled_cache_store_nothing():
+    cache = SessionCache(ttl_seconds=30, max_entries=10)
+    cache.set(KEY, None, cache.generation(KEY))
+    assert cache.get(KEY) is None
+
+    disabled = SessionCache(ttl_seconds=0, max_entries=10)
+    disabled.set(KEY, {"v": 1}, disabled.generation(KEY))
+    assert disabled.get(KEY) is None
+
+
+def test_read_through_does_not_cache_a_document_written_during_the_miss(monkeypatch):
+    cache = SessionCache(ttl_seconds=30, max_entries=10)
+    monkeypatch.setattr(virtual_tryon_repo, "session_cache", cache)
+    store = {"v": "old"}
+
+    async def find_session(guest_id, session_id):
+        doc = dict(store)
+        await asyncio.sleep(0.02)        # the write below lands while this read is in flight
+        return doc
+
+    async def write():
+        await asyncio.sleep(0.01)
+        store["v"] = "new"
+        cache.invalidate(KEY)
+
+    monkeypatch.setattr(virtual_tryon_repo, "find_session", find_session)
+
+    async def main():
+        stale, _ = await asyncio.gather(virtual_tryon_repo.get_virtual_tryon_by_session(*KEY), write())
+        return stale, await virtual_tryon_repo.get_virtual_tryon_by_session(*KEY)
+
+    stale, fresh = asyncio.run(main())
+    assert stale == {"v": "old"}   # that request saw the pre-write document...
+    assert fresh == {"v": "new"}   # ...but it was never cached
@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime
+import pytest
+from app.db import session_repository as repo
+from app.db.session_cache import SessionCache
+from app.db.session_repository import SessionUpdate
+
+NOW = datetime(2026, 1, 1)
+
+
+class FakeCollection:
+    def __init__(self, doc=None):
+        self.doc = doc
+        self.calls = []
+
+    async def update_one(self, query, update, upsert=False):
+        self.calls.append(("update_one", query, update, upsert))
+
+    async def find_one(self, query, projection):
+        self.calls.append(("find_one", query, projection))
+        return self.doc
+
+    async def find_one_and_update(self, query, update, projection, upsert, return_document):
+        self.calls.append(("find_one_and_update", query, update, projection))
+        return self.doc
+
+
+class FakeWriteBuffer:
+    def __init__(self, pending=True):
+        self.pending = pending
+        self.flushed = []
+
+    def has_pending(self, guest_id, session_id):
+        return self.pending
+
+    async def flush_key(self, guest_id, session_id):
+        self.flushed.append((guest_id, session_id))
+        self.pending = False
+
+    def overlay(self, guest_id, session_id, doc):
+        return {**(doc or {}), "pending": True}
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    collection = FakeCollection()
+    monkeypatch.setattr(repo, "virtual_tryons", collection)
+    monkeypatch.setattr(repo, "session_cache", SessionCache(ttl_seconds=30, max_entries=10))
+    monkeypatch.setattr(repo, "write_buffer", None)
+    return collection
+
+
+def test_update_collects_set_and_set_on_insert():
+    update = SessionUpdate("g", "s").set({"a": 1}).set({"b": 2}).set_on_insert({"created": NOW, "measurements": {}})
+    update.drop_on_insert("measurements", "missing")
+
+    assert update.key == ("g", "s")
+    assert update.to_update(now=NOW) == {
+        "$set": {"a": 1, "b": 2, "updated_at": NOW},
+        "$setOnInsert": {"created": NOW}
+    }
+    assert not SessionUpdate("g", "s")
+
+
+def test_analysis_with_measurements_does_not_conflict_on_insert(collection):
+    asyncio.run(repo.save_analysis("g", "s", True, 0.9, mm={"pd": 62.0}, face_shape="oval"))
+
+    _, query, update, upsert = collection.calls[0]
+    assert query == {"guest_id": "g", "session_id": "s"} and upsert
+    assert "measurements" not in update["$setOnInsert"]
+    assert update["$set"]["measurements.mm"] == {"pd": 62.0}
+    assert update["$set"]["status.measurements_done"] is True
+
+
+def test_analysis_without_measurements_keeps_the_empty_measurements(collection):
+    asyncio.run(repo.save_analysis("g", "s", False, 0.1))
+    update = collection.calls[0][2]
+    assert update["$setOnInsert"]["measurements"] == {}
+    assert update["$set"]["status.measurements_done"] is False
+
+
+def test_find_session_overlays_pending_writes(collection, monkeypatch):
+    collection.doc = {"status": {}}
+    buffer = FakeWriteBuffer()
+    monkeypatch.setattr(repo, "write_buffer", buffer)
+
+    assert asyncio.run(repo.find_session("g", "s")) == {"status": {}, "pending": True}
+    assert buffer.flushed == []
+
+
+def test_find_session_flushes_before_a_filtered_read(collection, monkeypatch):
+    collection.doc = {"measurements": {"mm": {"face_height": 120.0}}}
+    buffer = FakeWriteBuffer()
+    monkeypatch.setattr(repo, "write_buffer", buffer)
+
+    doc = asyncio.run(repo.find_session("g", "s", {"measurements.mm.face_height": 1}, **{"status.measurements_done": True}))
+    assert doc == collection.doc
+    assert buffer.flushed == [("g", "s")]
+    assert collection.calls == [(
+        "find_one",
+        {"guest_id": "g", "session_id": "s", "status.measurements_done": True},
+        {"_id": 0, "measurements.mm.face_height": 1}
+    )]
+
+
+@pytest.mark.parametrize("doc, expected", [
+    ({"measurements": {"mm": {"face_height": 118.5}}}, 118.5),
+    (None, None),   # measurements not done: the filter matched nothing
+])
+def test_select_frame_only_writes_measured_sessions(collection, doc, expected):
+    collection.doc = doc
+    face_height = asyncio.run(repo.select_frame("g", "s", "f1", "Round", {"width": 140}, 24.0, "frames/f1.png"))
+
+    assert face_height == expected
+    _, query, update, projection = collection.calls[0]
+    assert query == {"guest_id": "g", "session_id": "s", "status.measurements_done": True}
+    assert update["$set"]["selected_frame"]["frame_id"] == "f1"
+    assert update["$set"]["status.frame_selected"] is True
+    assert projection == {"_id": 0, "measurements.mm.face_height": 1}
+
+
+def test_commit_invalidates_the_cached_session(collection):
+    repo.session_cache.set(("g", "s"), {"old": True}, 0)
+    asyncio.run(SessionUpdate("g", "s").set({"a": 1}).commit())
+    assert repo.session_cache.get(("g", "s")) is None
@@ -0,0 +1,94 @@
+import asyncio
+import itertools
+import pytest
+from app.services import signed_url_service as module
+from app.services.signed_url_service import SignedUrlService
+
+
+class FakeBucket:
+    def __init__(self):
+        self.signed = []
+        self.counter = itertools.count(1)
+
+    def blob(self, path):
+        bucket = self
+
+        class Blob:
+            def generate_signed_url(self, version, expiration, method):
+                bucket.signed.append(path)
+                return f"https://signed/{path}?v={next(bucket.counter)}"
+
+        return Blob()
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    bucket = FakeBucket()
+    monkeypatch.setattr(module, "get_bucket", lambda: bucket)
+    return bucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(module.time, "time", lambda: now[0])
+    return now
+
+
+def make_service(max_entries=100):
+    return SignedUrlService(ttl_minutes=60, refresh_margin_seconds=600, max_entries=max_entries)
+
+
+def test_url_is_reused_until_the_refresh_margin(bucket, clock):
+    service = make_service()
+    url = service.sign("a.jpg")
+
+    clock[0] += 3600 - 601           # still more than the margin left
+    assert service.sign("a.jpg") == url
+    clock[0] += 1                    # within 10 min of expiry: re-sign
+    assert service.sign("a.jpg") != url
+
+    assert bucket.signed == ["a.jpg", "a.jpg"]
+    assert service.stats() == {"entries": 1, "hits": 1, "signed": 2}
+
+
+def test_batches_sign_only_missing_paths_once(bucket, clock):
+    service = make_service()
+    service.sign("a.jpg")
+    urls = asyncio.run(service.sign_many_async(["a.jpg", "b.jpg", "b.jpg"]))
+
+    assert set(urls) == {"a.jpg", "b.jpg"}
+    assert bucket.signed == ["a.jpg", "b.jpg"]
+
+
+def test_cache_is_bounded(bucket, clock):
+    service = make_service(max_entries=2)
+    for path in ("a", "b", "c"):
+        service.sign(path)
+    service.sign("a")   # evicted: signed again
+    assert bucket.signed == ["a", "b", "c", "a"]
+
+
+def test_sign_session_fills_image_and_frame_urls(bucket, clock):
+    doc = {
+        "images": {
+            "original": {"bucket_path": "g/s/original.jpg"},
+            "glasses_removed": {"bucket_path": "g/s/removed.jpg"},
+            "legacy": {"bucket_path": "https://storage.example/old.jpg"},
+            "empty": {}
+        },
+        "selected_frame": {"frame_id": "f1", "frame_image_path": "g/s/frame.png"}
+    }
+    signed = asyncio.run(make_service().sign_session(doc))
+
+    assert signed["images"]["original"]["signed_url"].startswith("https://signed/g/s/original.jpg")
+    assert signed["images"]["glasses_removed"]["signed_url"].startswith("https://signed/g/s/removed.jpg")
+    assert "signed_url" not in signed["images"]["legacy"]
+    assert "signed_url" not in signed["images"]["empty"]
+    assert signed["selected_frame"]["frame_image_url"].startswith("https://signed/g/s/frame.png")
+    assert sorted(bucket.signed) == ["g/s/frame.png", "g/s/original.jpg", "g/s/removed.jpg"]
+
+
+def test_sign_session_without_paths_signs_nothing(bucket):
+    assert asyncio.run(make_service().sign_session({"status": {}})) == {"status": {}}
+    assert bucket.signed == []
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.services.stage_graph import Stage, StageGraph
+
+
+def run(graph, **kwargs):
+    return asyncio.run(graph.run(**kwargs))
+
+
+def test_independent_stages_overlap():
+    both_running = asyncio.Event()
+    started = []
+
+    async def step(results):
+        started.append(1)
+        if len(started) == 2:
+            both_running.set()
+        await asyncio.wait_for(both_running.wait(), 1)
+        return len(started)
+
+    result = run(StageGraph([Stage("a", step), Stage("b", step)]))
+    assert result.ok
+    assert result.results == {"a": 2, "b": 2}
+
+
+def test_stages_see_earlier_results_and_initial_input():
+    async def double(results):
+        return results["input"] * 2
+
+    graph = StageGraph([
+        Stage("double", double),
+        Stage("plus_one", lambda results: results["double"] + 1, needs=("double",)),
+    ])
+    result = run(graph, initial={"input": 4})
+    assert result.results["plus_one"] == 9
+    assert set(result.timings_ms) == {"double", "plus_one", "total"}
+
+
+def test_blocking_stage_runs_off_the_event_loop():
+    loop_thread = threading.get_ident()
+    result = run(StageGraph([Stage("blocking", lambda results: threading.get_ident(), executor="io")]))
+    assert result.results["blocking"] != loop_thread
+
+
+def test_failed_need_skips_dependents_but_after_still_runs():
+    def boom(results):
+        raise Exception("no face")
+
+    graph = StageGraph([
+        Stage("landmarks", boom),
+        Stage("measure", lambda results: "mm", needs=("landmarks",)),
+        Stage("persist", lambda results: sorted(results), after=("landmarks",)),
+    ])
+    result = run(graph)
+
+    assert not result.ok
+    assert result.errors == {"landmarks": "no face", "measure": "skipped: landmarks failed"}
+    assert result.results["persist"] == []
+
+
+def test_optional_failure_keeps_the_run_ok():
+    def boom(results):
+        raise Exception("gemini down")
+
+    result = run(StageGraph([Stage("gemini", boom, optional=True), Stage("glasses", lambda results: True)]))
+    assert result.ok
+    assert result.errors == {"gemini": "gemini down"}
+
+
+def test_skip_propagates_through_needs_only():
+    calls = []
+
+    def record(name):
+        return lambda results: calls.append(name)
+
+    graph = StageGraph([
+        Stage("landmarks", record("landmarks")),
+        Stage("card", record("card"), needs=("landmarks",)),
+        Stage("persist", record("persist"), after=("card",)),
+    ])
+    result = run(graph, skip={"landmarks"})
+
+    assert result.ok
+    assert calls == ["persist"]
+
+
+def test_after_waits_for_slow_stage():
+    async def slow(results):
+        await asyncio.sleep(0.05)
+        return time.perf_counter()
+
+    graph = StageGraph([
+        Stage("slow", slow, optional=True),
+        Stage("persist", lambda results: (time.perf_counter(), "slow" in results), after=("slow",)),
+    ])
+    result = run(graph)
+    finished_at, saw_slow = result.results["persist"]
+    assert saw_slow and finished_at >= result.results["slow"]
+
+
+@pytest.mark.parametrize("stages, message", [
+    ([Stage("a", print, needs=("missing",))], "unknown stage 'missing'"),
+    ([Stage("a", print, needs=("b",)), Stage("b", print, after=("a",))], "cycle"),
+])
+def test_invalid_graphs_are_rejected(stages, message):
+    with pytest.raises(Exception, match=message):
+        StageGraph(stages)
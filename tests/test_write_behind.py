@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+from app.db import write_behind as wb
+from app.db.session_cache import SessionCache
+from app.db.write_behind import MAX_FLUSH_ATTEMPTS, WriteBehindBuffer, merge_set
+
+KEY = ("guest", "session")
+
+
+class SlowCollection:
+    """bulk_write blocks until `release` is set; applied $set fields are recorded in order."""
+
+    def __init__(self, fail=False):
+        self.release = asyncio.Event()
+        self.started = asyncio.Event()
+        self.applied = []
+        self.fail = fail
+
+    async def bulk_write(self, requests, ordered):
+        self.started.set()
+        await self.release.wait()
+        if self.fail:
+            raise ConnectionError("mongo down")
+        for request in requests:
+            self.applied.append(request._doc["$set"])
+
+
+def make_buffer(collection):
+    return WriteBehindBuffer(collection, flush_interval_ms=60_000, max_ops=1000)
+
+
+def test_flush_key_waits_for_an_in_flight_batch():
+    async def main():
+        collection = SlowCollection()
+        buffer = make_buffer(collection)
+        buffer.enqueue(*KEY, {"status.measurements_done": True}, upsert=True)
+
+        async def periodic_flush():
+            async with buffer._flush_lock:
+                await buffer.flush()
+
+        flusher = asyncio.create_task(periodic_flush())
+        await collection.started.wait()
+
+        # Swapped out of _pending but not written yet: still pending for readers
+        assert buffer.has_pending(*KEY)
+        assert buffer.overlay(*KEY, None)["status"]["measurements_done"] is True
+
+        flush_key = asyncio.create_task(buffer.flush_key(*KEY))
+        await asyncio.sleep(0.01)
+        assert not flush_key.done()
+
+        collection.release.set()
+        await asyncio.gather(flusher, flush_key)
+        assert collection.applied == [{"status.measurements_done": True}]
+        assert not buffer.has_pending(*KEY)
+        await buffer.close()
+
+    asyncio.run(main())
+
+
+def test_newer_updates_overlay_older_in_flight_ones():
+    async def main():
+        collection = SlowCollection()
+        buffer = make_buffer(collection)
+        buffer.enqueue(*KEY, {"a": 1, "b": 1}, upsert=True)
+
+        async def periodic_flush():
+            async with buffer._flush_lock:
+                await buffer.flush()
+
+        flusher = asyncio.create_task(periodic_flush())
+        await collection.started.wait()
+        buffer.enqueue(*KEY, {"b": 2})
+
+        doc = buffer.overlay(*KEY, {"guest_id": "guest", "session_id": "session"})
+        assert (doc["a"], doc["b"]) == (1, 2)
+
+        collection.release.set()
+        await flusher
+        await buffer.flush_key(*KEY)
+        assert collection.applied == [{"a": 1, "b": 1}, {"b": 2}]
+        await buffer.close()
+
+    asyncio.run(main())
+
+
+def test_dropped_batch_invalidates_the_session_cache(monkeypatch):
+    cache = SessionCache(ttl_seconds=60, max_entries=10)
+    monkeypatch.setattr(wb, "session_cache", cache)
+
+    async def main():
+        collection = SlowCollection(fail=True)
+        collection.release.set()
+        buffer = make_buffer(collection)
+        buffer.enqueue(*KEY, {"images.glasses_removed": "path"}, upsert=True)
+
+        # A read caches the overlaid (never written) document
+        cache.set(KEY, buffer.overlay(*KEY, None), cache.generation(KEY))
+        assert cache.get(KEY) is not None
+
+        for _ in range(MAX_FLUSH_ATTEMPTS):
+            async with buffer._flush_lock:
+                await buffer.flush()
+
+        assert not buffer.has_pending(*KEY)
+        assert cache.get(KEY) is None
+        buffer._closed = True
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("older, newer, expected", [
+    ({"a.b": 1}, {"a": {"c": 2}}, {"a": {"c": 2}}),
+    ({"a": {"b": 1}}, {"a.c": 2}, {"a": {"b": 1, "c": 2}}),
+    ({"x": 1}, {"x": 2, "y": 3}, {"x": 2, "y": 3}),
+])
+def test_merge_set_keeps_a_valid_set(older, newer, expected):
+    target = dict(older)
+    merge_set(target, newer)
+    assert target == expected